@@ -4,16 +4,33 @@ Flask Application - Email/SMS Marketing Platform
 CRC: crc-CampaignManager.md
 Spec: phase-2-campaign-management.md
 """
-from flask import Flask, render_template, request, redirect, url_for, flash, render_template_string
+from flask import Flask, render_template, request, redirect, url_for, flash, render_template_string, jsonify, g, send_file, abort
 from werkzeug.utils import secure_filename
 import os
+import hmac
 from datetime import datetime
+from sqlalchemy import func
 
 from backend.database import init_db, get_db
-from backend.models import Customer, Campaign
-from backend.csv_importer import import_csv
-from backend.email_service import send_test_email, render_email_template, send_email
+from backend.encryption import start_decryption_memo, end_decryption_memo
+from backend.models import Customer, Campaign, SendJob, SendPartition, ImportJob
+from backend.import_worker import enqueue_import, get_active_import
+from backend.email_service import (send_test_email, render_email_template, send_email, QR_PLACEHOLDER_BASE64,
+                                   build_qr_template_vars)
+from backend.qr_generator import load_qr_image, QR_IMAGE_MAX_AGE
+from backend.qr_redemption import (check_code, redeem_code, issue_codes, calculate_expiration,
+                                   VALID, REDEEMED, ALREADY_REDEEMED, EXPIRED, UNKNOWN)
+from backend.config import Config
 from backend.sms_service import send_test_sms
+from backend.send_worker import enqueue_campaign_send, segment_channels
+from backend.rate_limiter import get_current_rate, get_rate_snapshot
+from backend.subscriber_stats import subscriber_stats
+from backend.contact_browser import list_contacts
+from backend.contact_search import search_contacts
+from backend.segment_manager import validate_segment
+from backend.campaign_analytics import (
+    get_send_metrics, get_failure_reasons, calculate_send_rate, list_deliveries, DELIVERY_STATUSES
+)
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -29,41 +46,71 @@ os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 # Initialize database on startup
 init_db()
 
+@app.before_request
+def open_decryption_memo():
+    """Decrypt each email / phone at most once per request"""
+    g.decryption_memo_token = start_decryption_memo()
+
+@app.teardown_request
+def close_decryption_memo(exc):
+    end_decryption_memo(g.pop('decryption_memo_token', None))
+
 @app.route('/')
 def dashboard():
     """Dashboard with statistics"""
     db = get_db()
     try:
-        total_contacts = db.query(Customer).count()
-        subscribed = db.query(Customer).filter_by(subscribed=True).count()
-        unsubscribed = db.query(Customer).filter_by(subscribed=False).count()
-
-        # SMS stats
-        sms_subscribed = db.query(Customer).filter_by(sms_subscribed=True).count()
-        sms_unsubscribed = db.query(Customer).filter_by(sms_subscribed=False).filter(Customer.phone.isnot(None)).count()
+        # One aggregate query, cached for STATS_CACHE_TTL seconds
+        stats = subscriber_stats.get(db)
 
         return render_template('dashboard.html',
-                             total_contacts=total_contacts,
-                             subscribed=subscribed,
-                             unsubscribed=unsubscribed,
-                             sms_subscribed=sms_subscribed,
-                             sms_unsubscribed=sms_unsubscribed)
+                             total_contacts=stats['total_contacts'],
+                             subscribed=stats['subscribed'],
+                             unsubscribed=stats['unsubscribed'],
+                             sms_subscribed=stats['sms_subscribed'],
+                             sms_unsubscribed=stats['sms_unsubscribed'])
     finally:
         db.close()
 
 @app.route('/contacts')
 def contacts():
-    """View all contacts"""
+    """
+    Browse contacts one keyset page at a time, or search them
+
+    Query params: sort ('joined' / 'name'), dir ('asc' / 'desc'),
+    per_page, after / before (page cursors), q (search)
+    """
     db = get_db()
     try:
-        customers = db.query(Customer).order_by(Customer.created_at.desc()).all()
-        return render_template('contacts.html', customers=customers)
+        query = request.args.get('q', '').strip()
+        if query:
+            results = search_contacts(db, query)
+            return render_template('contacts.html',
+                                 total_contacts=subscriber_stats.get(db)['total_contacts'],
+                                 customers=results['customers'],
+                                 query=results['query'],
+                                 truncated=results['truncated'],
+                                 sort=None,
+                                 direction=None,
+                                 per_page=None)
+
+        page = list_contacts(
+            db,
+            sort=request.args.get('sort'),
+            direction=request.args.get('dir'),
+            after=request.args.get('after'),
+            before=request.args.get('before'),
+            per_page=request.args.get('per_page')
+        )
+        return render_template('contacts.html',
+                             total_contacts=subscriber_stats.get(db)['total_contacts'],
+                             **page)
     finally:
         db.close()
 
 @app.route('/import', methods=['GET', 'POST'])
 def import_contacts():
-    """Import contacts from CSV"""
+    """Import contacts from CSV (queued for the background worker)"""
     if request.method == 'POST':
         if 'csvfile' not in request.files:
             return render_template('import.html',
@@ -78,32 +125,44 @@ def import_contacts():
 
         if file and file.filename.endswith('.csv'):
             filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
+            segment = request.form.get('segment', '').strip()
 
+            db = get_db()
             try:
-                segment = request.form.get('segment', '').strip()
-                stats = import_csv(filepath, segment if segment else None)
-
-                # Clean up uploaded file
-                os.remove(filepath)
-
-                return render_template('import.html',
-                                     stats=stats,
-                                     message_type='success')
-
+                job = enqueue_import(db, file.read(), filename, validate_segment(segment) if segment else None)
+                return redirect(url_for('import_contacts', job=job.id))
             except Exception as e:
-                if os.path.exists(filepath):
-                    os.remove(filepath)
+                db.rollback()
                 return render_template('import.html',
                                      message=f'Import failed: {str(e)}',
                                      message_type='error')
+            finally:
+                db.close()
         else:
             return render_template('import.html',
                                  message='Please upload a CSV file',
                                  message_type='error')
 
-    return render_template('import.html')
+    # Show progress for a specific import, or whichever one is still running
+    db = get_db()
+    try:
+        job_id = request.args.get('job', type=int)
+        job = db.query(ImportJob).filter_by(id=job_id).first() if job_id else get_active_import(db)
+        return render_template('import.html', job=job.to_dict() if job else None)
+    finally:
+        db.close()
+
+@app.route('/import/status/<int:job_id>')
+def import_status(job_id):
+    """JSON progress of a background CSV import"""
+    db = get_db()
+    try:
+        job = db.query(ImportJob).filter_by(id=job_id).first()
+        if not job:
+            return jsonify({'error': 'Import job not found'}), 404
+        return jsonify(job.to_dict())
+    finally:
+        db.close()
 
 @app.route('/preview', methods=['GET', 'POST'])
 def preview_email():
@@ -188,12 +247,7 @@ def unsubscribe():
 
     db = get_db()
     try:
-        # Debug: Check what's in the database
-        all_customers = db.query(Customer).all()
-        print(f"DEBUG UNSUBSCRIBE: Total customers in DB: {len(all_customers)}")
-        if all_customers:
-            print(f"DEBUG UNSUBSCRIBE: First customer email: '{all_customers[0].email}'")
-
+        # Indexed blind-index lookup - no table scan or bulk decryption
         customer = Customer.find_by_email(db, email)
         print(f"DEBUG UNSUBSCRIBE: Customer found: {customer is not None}")
 
@@ -213,6 +267,7 @@ def unsubscribe():
         customer.subscribed = False
         customer.unsubscribed_date = datetime.now()
         db.commit()
+        subscriber_stats.invalidate()
 
         return render_template('unsubscribe.html',
                              title='Unsubscribed',
@@ -296,6 +351,7 @@ def sms_optout():
                     customer.sms_subscribed = False
                     customer.sms_unsubscribed_date = datetime.now()
                     db.commit()
+                    subscriber_stats.invalidate()
 
                     # Twilio expects TwiML response
                     return '<?xml version="1.0" encoding="UTF-8"?><Response></Response>', 200
@@ -332,6 +388,7 @@ def sms_optout():
         customer.sms_subscribed = False
         customer.sms_unsubscribed_date = datetime.now()
         db.commit()
+        subscriber_stats.invalidate()
 
         return render_template('unsubscribe.html',
                              title='Unsubscribed from SMS',
@@ -340,6 +397,93 @@ def sms_optout():
     finally:
         db.close()
 
+@app.route('/qr/<digest>.png')
+def qr_image(digest):
+    """
+    Hosted QR code image, as linked from emails under the external image strategy
+
+    Images are content-addressed, so the URL never changes meaning: clients
+    and proxies may cache it for a year without revalidating, and the ETag
+    (the digest itself) answers any conditional request with a 304.
+
+    CRC: crc-QRCodeGenerator.md
+    """
+    path = load_qr_image(digest, request.args.get('r'))
+    if not path:
+        abort(404)
+    response = send_file(path, mimetype='image/png', etag=digest, conditional=True, max_age=QR_IMAGE_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+# HTTP status per validate/redeem outcome
+QR_STATUS_CODES = {VALID: 200, REDEEMED: 200, ALREADY_REDEEMED: 409, EXPIRED: 410, UNKNOWN: 404}
+
+def scanner_denied():
+    """
+    Check the scanner's bearer token
+
+    Without QR_SCANNER_TOKEN the API is only open in development; anywhere
+    else it fails closed rather than letting anyone check or redeem codes.
+
+    Returns:
+        tuple or None: (JSON error, HTTP status) to return, or None if allowed
+    """
+    if not Config.QR_SCANNER_TOKEN:
+        if Config.is_development():
+            return None
+        return jsonify({'error': 'QR scanner API disabled: set QR_SCANNER_TOKEN'}), 503
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {Config.QR_SCANNER_TOKEN}"):
+        return jsonify({'error': 'Unauthorized'}), 401
+    return None
+
+def scanned_code():
+    """Code from a JSON body or form field (never the query string, which ends up in logs)"""
+    payload = request.get_json(silent=True) or {}
+    return str(payload.get('code') or request.form.get('code') or '')
+
+@app.route('/api/qr/validate', methods=['POST'])
+def qr_validate():
+    """
+    Check a scanned QR code without redeeming it
+
+    JSON status: valid, already_redeemed, expired or unknown (HTTP 200,
+    409, 410, 404), with the customer's name and usage for known codes.
+
+    CRC: crc-QRCode.md
+    Sequence: seq-qr-validate.md
+    """
+    denied = scanner_denied()
+    if denied:
+        return denied
+    db = get_db()
+    try:
+        result = check_code(db, scanned_code())
+        return jsonify(result), QR_STATUS_CODES[result['status']]
+    finally:
+        db.close()
+
+@app.route('/api/qr/redeem', methods=['POST'])
+def qr_redeem():
+    """
+    Redeem a scanned QR code
+
+    JSON status: redeemed, already_redeemed, expired or unknown (HTTP 200,
+    409, 410, 404). Concurrent scans of a single-use code redeem it once.
+
+    CRC: crc-QRCode.md
+    Sequence: seq-qr-validate.md
+    """
+    denied = scanner_denied()
+    if denied:
+        return denied
+    db = get_db()
+    try:
+        result = redeem_code(db, scanned_code())
+        return jsonify(result), QR_STATUS_CODES[result['status']]
+    finally:
+        db.close()
+
 @app.route('/test-template')
 def test_template():
     """Test the Monday special email template"""
@@ -443,6 +587,7 @@ def campaign_new():
                 subject=subject,
                 template_name=template,
                 html_content=html_content,
+                sms_content=request.form.get('sms_content', '').strip() or None,
                 has_qr_code=has_qr_code,
                 status='draft'
             )
@@ -491,17 +636,14 @@ def campaign_new():
 
         # GET request - show form
         templates = get_available_templates()
-        total_subscribers = db.query(Customer).filter_by(subscribed=True).count()
-        email_only = db.query(Customer).filter_by(subscribed=True, sms_subscribed=False).count()
-        sms_only = db.query(Customer).filter_by(sms_subscribed=True, subscribed=False).count()
-        both = db.query(Customer).filter_by(subscribed=True, sms_subscribed=True).count()
+        stats = subscriber_stats.get(db)
 
         return render_template('campaign_create.html',
                              templates=templates,
-                             total_subscribers=total_subscribers,
-                             email_only=email_only,
-                             sms_only=sms_only,
-                             both=both)
+                             total_subscribers=stats['subscribed'],
+                             email_only=stats['email_only'],
+                             sms_only=stats['sms_only'],
+                             both=stats['both'])
     finally:
         db.close()
 
@@ -544,6 +686,7 @@ def campaign_edit(campaign_id):
             # Update campaign
             campaign.name = request.form.get('name')
             campaign.subject = request.form.get('subject')
+            campaign.sms_content = request.form.get('sms_content', '').strip() or None
             template = request.form.get('template')
             action = request.form.get('action')
 
@@ -597,18 +740,15 @@ def campaign_edit(campaign_id):
 
         # GET request - show form with existing data
         templates = get_available_templates()
-        total_subscribers = db.query(Customer).filter_by(subscribed=True).count()
-        email_only = db.query(Customer).filter_by(subscribed=True, sms_subscribed=False).count()
-        sms_only = db.query(Customer).filter_by(sms_subscribed=True, subscribed=False).count()
-        both = db.query(Customer).filter_by(subscribed=True, sms_subscribed=True).count()
+        stats = subscriber_stats.get(db)
 
         return render_template('campaign_edit.html',
                              campaign=campaign,
                              templates=templates,
-                             total_subscribers=total_subscribers,
-                             email_only=email_only,
-                             sms_only=sms_only,
-                             both=both)
+                             total_subscribers=stats['subscribed'],
+                             email_only=stats['email_only'],
+                             sms_only=stats['sms_only'],
+                             both=stats['both'])
     finally:
         db.close()
 
@@ -655,17 +795,14 @@ def campaign_send_confirm(campaign_id):
             return redirect('/campaigns')
 
         # Get audience counts
-        total_subscribers = db.query(Customer).filter_by(subscribed=True).count()
-        email_only = db.query(Customer).filter_by(subscribed=True, sms_subscribed=False).count()
-        sms_only = db.query(Customer).filter_by(sms_subscribed=True, subscribed=False).count()
-        both = db.query(Customer).filter_by(subscribed=True, sms_subscribed=True).count()
+        stats = subscriber_stats.get(db)
 
         return render_template('campaign_send_confirm.html',
                              campaign=campaign,
-                             total_subscribers=total_subscribers,
-                             email_only=email_only,
-                             sms_only=sms_only,
-                             both=both)
+                             total_subscribers=stats['subscribed'],
+                             email_only=stats['email_only'],
+                             sms_only=stats['sms_only'],
+                             both=stats['both'])
     finally:
         db.close()
 
@@ -674,8 +811,11 @@ def campaign_send(campaign_id):
     """
     Send a campaign based on confirmation form
 
+    Test mode sends one email inline; live sends are queued for the
+    background worker so the request returns immediately.
+
     CRC: crc-CampaignManager.md
-    Sequence: seq-campaign-send.md
+    Sequence: seq-campaign-send.md, seq-email-process.md
     """
     db = get_db()
     try:
@@ -735,9 +875,15 @@ def campaign_send(campaign_id):
                     print(f"DEBUG: logo_url = {template_vars['logo_url']}")
                     print(f"DEBUG: hero_image_url = {template_vars['hero_image_url']}")
 
-                # Only include QR code if campaign has it enabled
+                # Only include QR code if campaign has it enabled - the customer's
+                # real code when the test address belongs to one
                 if campaign.has_qr_code:
-                    template_vars['qr_code_base64'] = 'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=='
+                    if test_customer:
+                        template_vars.update(build_qr_template_vars(campaign, test_customer))
+                        issue_codes(db, campaign.id, [test_customer.id], calculate_expiration())
+                        db.commit()
+                    else:
+                        template_vars['qr_code_base64'] = QR_PLACEHOLDER_BASE64
 
                 print(f"DEBUG: Template vars keys: {list(template_vars.keys())}")
 
@@ -774,66 +920,37 @@ def campaign_send(campaign_id):
                 flash(f'Error sending test email: {str(e)}', 'error')
                 return redirect('/campaigns')
 
-        # Get subscribers based on segment
-        if segment == 'email_only':
-            subscribers = db.query(Customer).filter_by(subscribed=True, sms_subscribed=False).all()
-        elif segment == 'sms_only':
-            subscribers = db.query(Customer).filter_by(sms_subscribed=True, subscribed=False).all()
-        elif segment == 'both':
-            subscribers = db.query(Customer).filter_by(subscribed=True, sms_subscribed=True).all()
-        else:  # 'all'
-            subscribers = db.query(Customer).filter_by(subscribed=True).all()
-
-        sent_count = 0
-        failed_count = 0
-
-        # Import here to avoid circular imports
-        from backend.config import Config
-        from backend.image_handler import ImageHandler
-
-        for customer in subscribers:
-            # Generate personalized content
-            template_vars = {
-                'customer_name': customer.name or 'Valued Customer',
-                'unsubscribe_link': url_for('unsubscribe',
-                                           email=customer.email,
-                                           token=customer.get_unsubscribe_token(),
-                                           _external=True)
-            }
-
-            # Add image URLs based on environment
-            if Config.is_development():
-                template_vars['logo_base64'] = ImageHandler.get_image_url('FNFWebLogo200x50.png').replace('data:image/png;base64,', '')
-                template_vars['hero_image_base64'] = ImageHandler.get_image_url('FNFFront600x300.png').replace('data:image/png;base64,', '')
-            else:
-                template_vars['logo_url'] = url_for('static', filename='images/FNFWebLogo200x50.png', _external=True)
-                template_vars['hero_image_url'] = url_for('static', filename='images/FNFFront600x300.png', _external=True)
-
-            # Only include QR code if campaign has it enabled
-            if campaign.has_qr_code:
-                # TODO: Generate unique QR code per customer
-                template_vars['qr_code_base64'] = 'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=='
-
-            # Render fresh from template file with all variables
-            personalized_html = render_template(
-                campaign.template_name,
-                **template_vars
-            )
-
-            # Send email
-            result = send_email(customer.email, customer.name or 'Valued Customer', campaign.subject, personalized_html)
-
-            if result.get('success'):
-                sent_count += 1
-            else:
-                failed_count += 1
+        # Live send - queue it for the background worker (worker.py)
+        channels = segment_channels(segment)
+        if 'sms' in channels and not campaign.sms_content:
+            if channels == ['sms']:
+                flash('This campaign has no SMS message. Add one on the edit page first.', 'error')
+                return redirect(f'/campaign/send-confirm/{campaign_id}')
+            flash('No SMS message on this campaign - sending email only.', 'warning')
+            channels = ['email']
+
+        # Claim the campaign with one conditional UPDATE so a double-submitted
+        # send can't queue the audience twice: the loser matches no row
+        active_job = db.query(SendJob.id).filter(
+            SendJob.campaign_id == Campaign.id,
+            SendJob.status.in_(SendJob.ACTIVE_STATUSES)
+        ).exists()
+        claimed = db.query(Campaign).filter(
+            Campaign.id == campaign.id,
+            Campaign.status != 'sending',
+            ~active_job
+        ).update({'status': 'sending'}, synchronize_session=False)
+        if claimed != 1:
+            db.rollback()
+            flash('This campaign is already being sent.', 'error')
+            return redirect('/campaigns')
 
-        # Update campaign status
-        campaign.status = 'sent'
-        campaign.sent_date = datetime.now()
-        db.commit()
+        queued = []
+        for channel in channels:
+            job = enqueue_campaign_send(db, campaign, segment, channel=channel)
+            queued.append(f"{job.total_count} {'emails' if channel == 'email' else 'SMS'}")
 
-        flash(f'✓ Campaign sent! {sent_count} emails sent successfully, {failed_count} failed.', 'success')
+        flash(f'✓ Campaign queued! {" and ".join(queued)} will be sent in the background.', 'success')
         return redirect('/campaigns')
 
     except Exception as e:
@@ -842,6 +959,99 @@ def campaign_send(campaign_id):
     finally:
         db.close()
 
+def send_job_status(db, job):
+    """Progress of one send job with its current velocity and partitions"""
+    status = job.to_dict()
+    status['velocity_per_minute'] = round(get_current_rate(job.channel, job.campaign_id), 1) \
+        if job.is_active() else 0.0
+    partitions = db.query(SendPartition).filter_by(job_id=job.id).order_by(SendPartition.position).all()
+    if partitions:
+        status['partitions'] = [partition.to_dict() for partition in partitions]
+    return status
+
+@app.route('/campaign/send-status/<int:campaign_id>')
+def campaign_send_status(campaign_id):
+    """
+    JSON progress of a campaign's background sends
+
+    'jobs' holds the most recent job of each channel, so both halves of an
+    Email + SMS send are visible; the top-level fields repeat the most recent
+    of those. ?channel=email|sms limits the response to one channel.
+
+    CRC: crc-CampaignAnalytics.md
+    Sequence: seq-campaign-send.md
+    """
+    db = get_db()
+    try:
+        latest = db.query(func.max(SendJob.id)).filter(SendJob.campaign_id == campaign_id)
+        channel = request.args.get('channel')
+        if channel:
+            latest = latest.filter(SendJob.channel == channel)
+        jobs = db.query(SendJob).filter(
+            SendJob.id.in_(latest.group_by(SendJob.channel).scalar_subquery())
+        ).order_by(SendJob.id.desc()).all()
+        if not jobs:
+            return jsonify({'error': 'No send job for this campaign'}), 404
+        statuses = [send_job_status(db, job) for job in jobs]
+        return jsonify(dict(statuses[0], jobs=statuses))
+    finally:
+        db.close()
+
+@app.route('/campaign/results/<int:campaign_id>')
+def campaign_results(campaign_id):
+    """
+    Per-recipient results of a campaign from the delivery ledger
+
+    Query params: channel, status (drill-down filters), before (page cursor)
+
+    CRC: crc-CampaignAnalytics.md
+    Sequence: seq-campaign-analytics.md
+    UI: ui-campaign-analytics.md
+    """
+    db = get_db()
+    try:
+        campaign = db.query(Campaign).filter_by(id=campaign_id).first()
+        if not campaign:
+            flash('Campaign not found', 'error')
+            return redirect('/campaigns')
+
+        channel = request.args.get('channel') or None
+        status = request.args.get('status') or None
+        if status not in DELIVERY_STATUSES:
+            status = None
+        before_id = request.args.get('before', type=int)
+
+        metrics = get_send_metrics(db, campaign_id)
+        send_rates = {ch: calculate_send_rate(db, campaign_id, ch) for ch in metrics}
+        deliveries, next_before = list_deliveries(db, campaign_id, channel=channel, status=status,
+                                                  before_id=before_id)
+
+        return render_template('campaign_results.html',
+                             campaign=campaign,
+                             metrics=metrics,
+                             send_rates=send_rates,
+                             failure_reasons=get_failure_reasons(db, campaign_id, channel=channel),
+                             deliveries=deliveries,
+                             next_before=next_before,
+                             channel=channel,
+                             status=status,
+                             statuses=DELIVERY_STATUSES)
+    finally:
+        db.close()
+
+@app.route('/send-rates')
+def send_rates():
+    """
+    JSON send velocity and headroom of every shared rate bucket
+
+    CRC: crc-RateLimiter.md
+    """
+    db = get_db()
+    try:
+        return jsonify({'buckets': get_rate_snapshot(db)})
+    finally:
+        db.close()
+
 @app.route('/signup', methods=['GET', 'POST'])
 def signup():
     """
@@ -884,6 +1094,16 @@ def signup():
             if email:
                 existing_customer = Customer.find_by_email(db, email)
 
+            # Phone numbers are unique across customers (blind index)
+            if normalized_phone and Customer.phone_in_use(
+                    db, normalized_phone,
+                    exclude_id=existing_customer.id if existing_customer else None):
+                return render_template('signup.html',
+                                     error='This phone number is already registered to another subscriber.',
+                                     email=email,
+                                     phone=phone,
+                                     name=name)
+
             if existing_customer:
                 # Update existing customer
                 if name:
@@ -897,6 +1117,7 @@ def signup():
                     existing_customer.sms_subscribed = True
                     existing_customer.sms_opted_in_date = datetime.now()
                 db.commit()
+                subscriber_stats.invalidate()
                 return render_template('signup.html',
                                      success=True,
                                      message='Thank you! Your subscription has been updated.')
@@ -916,6 +1137,7 @@ def signup():
 
                 db.add(customer)
                 db.commit()
+                subscriber_stats.invalidate()
 
                 return render_template('signup.html',
                                      success=True,
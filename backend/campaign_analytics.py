@@ -0,0 +1,110 @@
+"""
+Campaign results from the CampaignDelivery ledger
+
+Every query here is shaped to the ledger's composite indexes: counts and
+failure reasons filter on (campaign_id, channel, status), and the
+drill-down pages backwards through ids with a keyset instead of OFFSET,
+so each page costs the same however deep into a large send it is.
+
+CRC: crc-CampaignAnalytics.md
+Spec: phase-2-campaign-management.md
+Sequence: seq-campaign-analytics.md
+"""
+from sqlalchemy import func
+from backend.models import CampaignDelivery, Customer
+
+DELIVERY_STATUSES = ('pending', 'sending', 'retry', 'sent', 'failed', 'skipped')
+
+# Drill-down page size
+DELIVERIES_PER_PAGE = 100
+
+
+def get_send_metrics(db, campaign_id):
+    """
+    Delivery counts per channel and status
+
+    Returns:
+        dict: channel -> {status: count, ..., 'total': count}
+    """
+    rows = db.query(
+        CampaignDelivery.channel, CampaignDelivery.status, func.count()
+    ).filter(
+        CampaignDelivery.campaign_id == campaign_id
+    ).group_by(CampaignDelivery.channel, CampaignDelivery.status).all()
+
+    metrics = {}
+    for channel, status, count in rows:
+        counts = metrics.setdefault(channel, dict.fromkeys(DELIVERY_STATUSES + ('total',), 0))
+        counts[status] = count
+        counts['total'] += count
+    return metrics
+
+
+def get_failure_reasons(db, campaign_id, channel=None, limit=10):
+    """
+    Most common errors among failed deliveries
+
+    Returns:
+        list[tuple]: (error, count), most frequent first
+    """
+    query = db.query(CampaignDelivery.error, func.count().label('count')).filter(
+        CampaignDelivery.campaign_id == campaign_id,
+        CampaignDelivery.status == 'failed'
+    )
+    if channel:
+        query = query.filter(CampaignDelivery.channel == channel)
+    return query.group_by(CampaignDelivery.error).order_by(func.count().desc()).limit(limit).all()
+
+
+def calculate_send_rate(db, campaign_id, channel):
+    """
+    Achieved send rate from the first to the last accepted message
+
+    Returns:
+        float or None: Messages per minute, None until two messages were sent
+    """
+    first, last, sent = db.query(
+        func.min(CampaignDelivery.sent_at), func.max(CampaignDelivery.sent_at), func.count()
+    ).filter(
+        CampaignDelivery.campaign_id == campaign_id,
+        CampaignDelivery.channel == channel,
+        CampaignDelivery.status == 'sent'
+    ).one()
+
+    if not first or not last or sent < 2:
+        return None
+    seconds = (last - first).total_seconds()
+    return sent / seconds * 60 if seconds > 0 else None
+
+
+def list_deliveries(db, campaign_id, channel=None, status=None, before_id=None, limit=DELIVERIES_PER_PAGE):
+    """
+    One page of a campaign's ledger, newest first
+
+    Args:
+        db: Database session
+        campaign_id (int): Campaign to list
+        channel (str): Optional 'email' / 'sms' filter
+        status (str): Optional status filter (e.g. 'failed')
+        before_id (int): Keyset cursor - only rows with a smaller id
+        limit (int): Page size
+
+    Returns:
+        tuple: (list of (CampaignDelivery, Customer or None), next before_id or None)
+    """
+    query = db.query(CampaignDelivery, Customer).outerjoin(
+        Customer, Customer.id == CampaignDelivery.customer_id
+    ).filter(CampaignDelivery.campaign_id == campaign_id)
+
+    if channel:
+        query = query.filter(CampaignDelivery.channel == channel)
+    if status:
+        query = query.filter(CampaignDelivery.status == status)
+    if before_id:
+        query = query.filter(CampaignDelivery.id < before_id)
+
+    rows = query.order_by(CampaignDelivery.id.desc()).limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, rows[-1][0].id
+    return rows, None
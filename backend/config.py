@@ -26,14 +26,30 @@ class Config:
 
     # Email Service
     SENDGRID_API_KEY = os.getenv('SENDGRID_API_KEY')
+    SENDGRID_API_HOST = os.getenv('SENDGRID_API_HOST', 'https://api.sendgrid.com')
     SENDER_EMAIL = os.getenv('SENDER_EMAIL')
     SENDER_NAME = os.getenv('BUSINESS_NAME', os.getenv('SENDER_NAME', 'Your Business'))
     BUSINESS_ADDRESS = os.getenv('BUSINESS_ADDRESS', '')
+    EMAIL_SEND_CONCURRENCY = int(os.getenv('EMAIL_SEND_CONCURRENCY', '8'))  # Parallel SendGrid requests
+    EMAIL_RATE_LIMIT = int(os.getenv('EMAIL_RATE_LIMIT', '600'))  # Emails per minute (0 = unlimited)
+    EMAIL_SEND_MODE = os.getenv('EMAIL_SEND_MODE', 'batch')  # 'batch' (personalizations) or 'individual'
+    EMAIL_PERSONALIZATIONS_PER_REQUEST = min(int(os.getenv('EMAIL_PERSONALIZATIONS_PER_REQUEST', '1000')), 1000)
 
     # SMS Service
     TWILIO_ACCOUNT_SID = os.getenv('TWILIO_ACCOUNT_SID')
     TWILIO_AUTH_TOKEN = os.getenv('TWILIO_AUTH_TOKEN')
     TWILIO_PHONE_NUMBER = os.getenv('TWILIO_PHONE_NUMBER')
+    TWILIO_API_HOST = os.getenv('TWILIO_API_HOST', 'https://api.twilio.com')
+    # Sender pool for campaigns (comma-separated); defaults to TWILIO_PHONE_NUMBER
+    TWILIO_PHONE_NUMBERS = [n.strip() for n in os.getenv('TWILIO_PHONE_NUMBERS', TWILIO_PHONE_NUMBER or '').split(',') if n.strip()]
+    TWILIO_MPS_PER_NUMBER = float(os.getenv('TWILIO_MPS_PER_NUMBER', '1'))  # Messages/second per sender (long code: 1)
+    SMS_SEND_CONCURRENCY = int(os.getenv('SMS_SEND_CONCURRENCY', '4'))  # Parallel Twilio requests
+    SMS_RATE_LIMIT = int(os.getenv('SMS_RATE_LIMIT', '0'))  # Account-wide SMS per minute (0 = per-number MPS only)
+
+    # Shared Rate Limits (token buckets in the database, shared by all processes)
+    EMAIL_CAMPAIGN_RATE_LIMIT = int(os.getenv('EMAIL_CAMPAIGN_RATE_LIMIT', '0'))  # Per campaign, per minute (0 = unlimited)
+    SMS_CAMPAIGN_RATE_LIMIT = int(os.getenv('SMS_CAMPAIGN_RATE_LIMIT', '0'))  # Per campaign, per minute (0 = unlimited)
+    RATE_LIMIT_BURST_SECONDS = float(os.getenv('RATE_LIMIT_BURST_SECONDS', '1'))  # Burst allowance, in seconds of rate
 
     # Encryption
     ENCRYPTION_KEY = os.getenv('ENCRYPTION_KEY')
@@ -41,6 +57,44 @@ class Config:
     # Image Strategy
     IMAGE_STRATEGY = os.getenv('IMAGE_STRATEGY', 'base64' if ENV == 'development' else 'external')
 
+    # Encoded base64 images kept in memory (LRU, bytes of data URI text)
+    IMAGE_CACHE_MAX_BYTES = int(os.getenv('IMAGE_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+
+    # Dashboard / campaign page audience counts cached in memory (seconds)
+    STATS_CACHE_TTL = float(os.getenv('STATS_CACHE_TTL', '30'))
+
+    # Compiled email templates kept in memory (LRU)
+    TEMPLATE_CACHE_SIZE = int(os.getenv('TEMPLATE_CACHE_SIZE', '32'))
+
+    # PII Decryption
+    DECRYPT_PROCESSES = int(os.getenv('DECRYPT_PROCESSES', '0'))  # Process pool for large decrypt batches (0 = in-process)
+
+    # QR Codes
+    QR_RENDER_PROCESSES = int(os.getenv('QR_RENDER_PROCESSES', str(os.cpu_count() or 1)))  # Process pool for QR batches (0/1 = in-process)
+    QR_CACHE_MAX_BYTES = int(os.getenv('QR_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))  # Rendered QR PNGs kept in memory (LRU)
+    QR_STORE_DIR = os.getenv('QR_STORE_DIR', 'qr_codes')  # Hosted QR images (content-addressed, write-once)
+    QR_EXPIRATION_DAYS = int(os.getenv('QR_EXPIRATION_DAYS', '30'))  # Days from send start until codes expire (0 = never)
+    QR_BLOOM_ERROR_RATE = float(os.getenv('QR_BLOOM_ERROR_RATE', '0.001'))  # Unknown codes let through to the database
+    QR_SCANNER_TOKEN = os.getenv('QR_SCANNER_TOKEN')  # Bearer token for the validate/redeem API (unset = open in development only)
+
+    # Contact Browsing
+    CONTACTS_PER_PAGE = int(os.getenv('CONTACTS_PER_PAGE', '50'))  # Default /contacts page size
+
+    # Contact Import
+    IMPORT_CHUNK_SIZE = int(os.getenv('IMPORT_CHUNK_SIZE', '1000'))  # CSV rows per bulk upsert
+
+    # Background Send Worker
+    SEND_BATCH_SIZE = int(os.getenv('SEND_BATCH_SIZE', '50'))  # Recipients claimed per checkpoint
+    SEND_WORKER_POLL_SECONDS = float(os.getenv('SEND_WORKER_POLL_SECONDS', '5'))
+    SEND_JOB_LEASE_SECONDS = int(os.getenv('SEND_JOB_LEASE_SECONDS', '300'))  # Stale worker takeover
+    SEND_PROCESSES = int(os.getenv('SEND_PROCESSES', '1'))  # Processes per large send job (0/1 = in-process; opt-in)
+    SEND_PARTITION_MIN = int(os.getenv('SEND_PARTITION_MIN', '5000'))  # Pending deliveries before a job is split across processes
+
+    # Send Retries (429 / 5xx / network errors; other failures are permanent)
+    SEND_MAX_ATTEMPTS = int(os.getenv('SEND_MAX_ATTEMPTS', '4'))  # First try + 3 retries
+    SEND_RETRY_BASE_SECONDS = float(os.getenv('SEND_RETRY_BASE_SECONDS', '30'))  # Doubles each attempt, jittered
+    SEND_RETRY_MAX_SECONDS = float(os.getenv('SEND_RETRY_MAX_SECONDS', '900'))
+
     # App Settings
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
     UPLOAD_FOLDER = 'uploads'
@@ -0,0 +1,133 @@
+"""
+Keyset-paginated contact browsing
+
+/contacts used to load and decrypt every customer on each visit. Pages
+are now fetched with a keyset cursor on (sort value, id): each page is an
+index range scan of per_page + 1 rows wherever it sits in the list, and
+only the rows on screen are ever decrypted (Customer.email / .phone).
+
+Email and phone are stored encrypted, so they cannot be sorted in SQL;
+the sortable columns are join date and name.
+
+CRC: crc-Customer.md
+Spec: phase-2-campaign-management.md
+"""
+import base64
+import json
+from sqlalchemy import String, func, or_, and_, type_coerce, bindparam
+from sqlalchemy.orm import selectinload
+from backend.models import Customer
+from backend.encryption import prefetch_decryption
+from backend.config import Config
+
+# sort name -> key expression; each is backed by an index on (expression, id)
+CONTACT_SORTS = {
+    'joined': Customer.created_at,
+    'name': func.coalesce(Customer.name, ''),
+}
+DEFAULT_SORT = 'joined'
+DEFAULT_DIRECTION = {'joined': 'desc', 'name': 'asc'}
+
+MIN_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(sort_value, row_id):
+    """Opaque URL-safe cursor for a row's position in the sort order"""
+    raw = json.dumps([None if sort_value is None else str(sort_value), row_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Returns:
+        tuple or None: (sort value as text, id), None for a missing or malformed cursor
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+        return sort_value, int(row_id)
+    except (ValueError, TypeError):
+        return None
+
+
+def clamp_page_size(per_page):
+    """Page size from the query string, bounded to MIN..MAX_PAGE_SIZE"""
+    try:
+        per_page = int(per_page)
+    except (TypeError, ValueError):
+        return Config.CONTACTS_PER_PAGE
+    return max(MIN_PAGE_SIZE, min(MAX_PAGE_SIZE, per_page))
+
+
+def list_contacts(db, sort=None, direction=None, after=None, before=None, per_page=None):
+    """
+    One page of contacts in the requested order
+
+    Args:
+        db: Database session
+        sort (str): Key of CONTACT_SORTS (default 'joined')
+        direction (str): 'asc' or 'desc' (default depends on the sort)
+        after (str): Cursor - page starts just after this row
+        before (str): Cursor - page ends just before this row (Previous link)
+        per_page (int): Page size
+
+    Returns:
+        dict: customers, next_cursor, prev_cursor, sort, direction, per_page
+    """
+    sort = sort if sort in CONTACT_SORTS else DEFAULT_SORT
+    direction = direction if direction in ('asc', 'desc') else DEFAULT_DIRECTION[sort]
+    per_page = clamp_page_size(per_page) if per_page is not None else Config.CONTACTS_PER_PAGE
+
+    key = CONTACT_SORTS[sort]
+    # The cursor keeps the key exactly as stored and compares it as text.
+    # SQLite keeps timestamps as text and func.now() rows have no
+    # microseconds, so a re-bound datetime would not match its own row.
+    # PostgreSQL casts the text literal back to the column type.
+    key_text = type_coerce(key, String)
+
+    after_key = decode_cursor(after)
+    before_key = decode_cursor(before)
+    backwards = before_key is not None and after_key is None
+    cursor = before_key if backwards else after_key
+
+    # Walking backwards flips the comparison and ordering, then the page is reversed
+    ascending = (direction == 'asc') != backwards
+    query = db.query(Customer, key_text.label('sort_key')).options(selectinload(Customer.segments))
+    if cursor:
+        value = bindparam(None, cursor[0], type_=String)
+        beyond = (key > value) if ascending else (key < value)
+        beyond_id = (Customer.id > cursor[1]) if ascending else (Customer.id < cursor[1])
+        query = query.filter(or_(beyond, and_(key == value, beyond_id)))
+
+    order = (key.asc(), Customer.id.asc()) if ascending else (key.desc(), Customer.id.desc())
+    rows = query.order_by(*order).limit(per_page + 1).all()
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    customers = [customer for customer, _ in rows]
+    prefetch_decryption([customer._email_encrypted for customer in customers] +
+                        [customer._phone_encrypted for customer in customers])
+    first = encode_cursor(rows[0].sort_key, rows[0][0].id) if rows else None
+    last = encode_cursor(rows[-1].sort_key, rows[-1][0].id) if rows else None
+
+    if backwards:
+        next_cursor = last
+        prev_cursor = first if has_more else None
+    else:
+        next_cursor = last if has_more else None
+        prev_cursor = first if cursor else None
+
+    return {
+        'customers': customers,
+        'next_cursor': next_cursor,
+        'prev_cursor': prev_cursor,
+        'sort': sort,
+        'direction': direction,
+        'per_page': per_page
+    }
@@ -0,0 +1,204 @@
+"""
+Contact search over encrypted emails and phone numbers
+
+Email and phone are Fernet-encrypted, so they can't be matched in SQL and
+scanning would mean decrypting every customer. Each customer instead keeps
+search tokens (customer_search_tokens): blind indexes of the email's
+local-part and domain prefixes and of the phone's trailing digits, written
+wherever email / phone are set. A query is turned into the same tokens and
+answered from the (token, customer_id) index; only the matched customers
+are decrypted, to display them and to confirm queries that fall between
+two stored token lengths. Names are stored in plain text and matched
+directly.
+
+CRC: crc-Customer.md
+Spec: phase-2-campaign-management.md
+"""
+import re
+from sqlalchemy import delete, insert, func, or_
+from sqlalchemy.orm import selectinload
+from backend.models import Customer, CustomerSearchToken
+from backend.encryption import (blind_index, email_blind_index, phone_blind_index, normalize_email,
+                                normalize_phone, email_search_tokens, phone_search_tokens, token_length,
+                                prefetch_decryption, SEARCH_PREFIX_LENGTHS, PHONE_SUFFIX_LENGTHS)
+
+SEARCH_RESULTS = 100
+
+# Most customers one token lookup may return before results are cut off
+MAX_CANDIDATES = 1000
+
+PHONE_QUERY = re.compile(r'^\+?[\d\s().-]+$')
+
+TOKENIZERS = {'email': email_search_tokens, 'phone': phone_search_tokens}
+
+
+def index_search_tokens(db, field, values):
+    """
+    Rewrite search tokens for customers written without the ORM (bulk import)
+
+    Args:
+        db: Database session
+        field (str): 'email' or 'phone'
+        values (dict): customer_id -> plaintext value (None clears the tokens)
+    """
+    if not values:
+        return
+    tokenize = TOKENIZERS[field]
+    tokens = CustomerSearchToken.__table__
+    db.execute(delete(tokens).where(
+        tokens.c.customer_id.in_(list(values)),
+        tokens.c.field == field
+    ))
+    rows = [
+        {'customer_id': customer_id, 'field': field, 'token': token}
+        for customer_id, value in values.items()
+        for token in tokenize(value)
+    ]
+    if rows:
+        db.execute(insert(tokens), rows)
+
+
+def token_matches(db, *tokens):
+    """
+    Ids of customers holding every given token, newest first
+
+    Returns:
+        list[int]: At most MAX_CANDIDATES + 1 ids
+    """
+    query = db.query(CustomerSearchToken.customer_id).filter(CustomerSearchToken.token.in_(tokens))
+    if len(tokens) > 1:
+        query = query.group_by(CustomerSearchToken.customer_id).having(
+            func.count(func.distinct(CustomerSearchToken.token)) == len(tokens))
+    else:
+        query = query.distinct()
+    rows = query.order_by(CustomerSearchToken.customer_id.desc()).limit(MAX_CANDIDATES + 1)
+    return [row[0] for row in rows]
+
+
+def stored_prefix(value, purpose):
+    """
+    Token for the longest stored prefix of value
+
+    Returns:
+        tuple: (token or None if value is too short, True if the token covers all of value)
+    """
+    length = token_length(len(value), SEARCH_PREFIX_LENGTHS)
+    if length is None:
+        return None, False
+    return blind_index(value[:length], purpose), length == len(value)
+
+
+def plan_email_query(db, text):
+    """
+    Candidates and check for a query containing '@'
+
+    The part before '@' must be the whole local part; the part after is a
+    domain prefix ('jane@', '@gmail', 'jane@gmail.c').
+    """
+    local, _, domain = text.partition('@')
+    tokens = [token for token, _ in (stored_prefix(local, 'email_local'),
+                                     stored_prefix(domain, 'email_domain')) if token]
+
+    ids = token_matches(db, *tokens) if tokens else []
+    exact = db.query(Customer.id).filter(Customer.email_hash == email_blind_index(text)).first()
+    if exact and exact[0] not in ids:
+        ids.append(exact[0])
+
+    def check(customer):
+        email_local, _, email_domain = (normalize_email(customer.email) or '').partition('@')
+        return (not local or email_local == local) and email_domain.startswith(domain)
+
+    return ids, check
+
+
+def plan_phone_query(db, digits):
+    """Candidates and check for the trailing digits of a phone number"""
+    if len(digits) > PHONE_SUFFIX_LENGTHS[-1]:
+        found = db.query(Customer.id).filter(Customer.phone_hash == phone_blind_index(digits)).first()
+        return ([found[0]] if found else []), None
+
+    length = token_length(len(digits), PHONE_SUFFIX_LENGTHS)
+    ids = token_matches(db, blind_index(digits[-length:], 'phone_suffix'))
+    if length == len(digits):
+        return ids, None
+    return ids, lambda customer: (normalize_phone(customer.phone) or '').endswith(digits)
+
+
+def plan_text_query(db, text):
+    """Candidates and check for a bare word: email local-part or domain prefix, or name"""
+    ids = set()
+    covered = True
+    for purpose in ('email_local', 'email_domain'):
+        token, covered = stored_prefix(text, purpose)
+        if token:
+            ids.update(token_matches(db, token))
+    named = set(name_matches(db, text))
+
+    if covered:
+        check = None  # The token is for the whole query, so every match is exact
+    else:
+        def check(customer):
+            if customer.id in named:
+                return True
+            email_local, _, email_domain = (normalize_email(customer.email) or '').partition('@')
+            return email_local.startswith(text) or email_domain.startswith(text)
+
+    return sorted(ids | named, reverse=True), check
+
+
+def name_matches(db, text):
+    """Ids of customers whose name, or a word in it, starts with text"""
+    escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    rows = db.query(Customer.id).filter(or_(
+        Customer.name.ilike(f'{escaped}%', escape='\\'),
+        Customer.name.ilike(f'% {escaped}%', escape='\\')
+    )).order_by(Customer.id.desc()).limit(MAX_CANDIDATES + 1)
+    return [row[0] for row in rows]
+
+
+def search_contacts(db, query, limit=SEARCH_RESULTS):
+    """
+    Find contacts by email, phone or name
+
+    Args:
+        db: Database session
+        query (str): 'jane', 'jane@', '@gmail.com', 'jane@example.com',
+                     '4567', '555-123-4567', 'Jane Do', ...
+        limit (int): Most contacts to return
+
+    Returns:
+        dict: customers (newest first), query, truncated (more matched than shown)
+    """
+    query = (query or '').strip()
+    result = {'customers': [], 'query': query, 'truncated': False}
+    text = query.lower()
+    digits = ''.join(filter(str.isdigit, query))
+
+    check = None  # Confirms candidates against decrypted values when tokens can't
+    if '@' in text:
+        ids, check = plan_email_query(db, text)
+    elif PHONE_QUERY.match(query) and len(digits) >= PHONE_SUFFIX_LENGTHS[0]:
+        ids, check = plan_phone_query(db, digits)
+    elif len(text) >= SEARCH_PREFIX_LENGTHS[0]:
+        ids, check = plan_text_query(db, text)
+    else:
+        return result
+
+    if len(ids) > MAX_CANDIDATES:
+        ids = ids[:MAX_CANDIDATES]
+        result['truncated'] = True
+    if not ids:
+        return result
+
+    customers = db.query(Customer).options(selectinload(Customer.segments)).filter(
+        Customer.id.in_(ids)).order_by(Customer.id.desc()).all()
+    prefetch_decryption([customer._email_encrypted for customer in customers] +
+                        [customer._phone_encrypted for customer in customers])
+    if check:
+        customers = [customer for customer in customers if check(customer)]
+
+    if len(customers) > limit:
+        customers = customers[:limit]
+        result['truncated'] = True
+    result['customers'] = customers
+    return result
@@ -1,127 +1,365 @@
+import numpy as np
 import pandas as pd
-from backend.database import SessionLocal
+from sqlalchemy import update, bindparam
+from backend.database import SessionLocal, insert_ignoring_conflicts
 from backend.models import Customer
+from backend.contact_search import index_search_tokens
+from backend.segment_manager import SegmentManager, validate_segment
 from backend.sms_service import format_phone_number, validate_phone_number
+from backend.encryption import encrypt_string, email_blind_index, phone_blind_index
+from backend.config import Config
 import re
 from datetime import datetime
 
+# Map Square column names to our expected names
+COLUMN_MAPPING = {
+    'Email Address': 'email',
+    'Phone Number': 'phone',
+    'First Name': 'first_name',
+    'Last Name': 'last_name'
+}
+
+# Only these columns are parsed - Square exports carry ~20 more we never use
+IMPORT_COLUMNS = set(COLUMN_MAPPING) | {'email', 'phone', 'name', 'first_name', 'last_name'}
+
+EMAIL_PATTERN = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+
+# Per-row reasons reported by normalize_contacts
+REASON_MISSING_EMAIL = 'missing_email'
+REASON_INVALID_EMAIL = 'invalid_email'
+REASON_INVALID_PHONE = 'invalid_phone'  # Contact still imported, without the phone
+REJECT_REASONS = (REASON_MISSING_EMAIL, REASON_INVALID_EMAIL)
+
 def is_valid_email(email):
     """Basic email validation"""
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(pattern, email) is not None
+    return re.match(EMAIL_PATTERN, email) is not None
+
+def read_csv_chunks(file_path, chunk_size):
+    """
+    Stream a CSV as DataFrames of at most chunk_size rows
+
+    Everything is read as text so phone numbers keep their digits
+    (a numeric column with blanks would otherwise parse as 5551234567.0).
+    """
+    return pd.read_csv(
+        file_path,
+        chunksize=chunk_size,
+        dtype=str,
+        keep_default_na=False,
+        usecols=lambda column: column in IMPORT_COLUMNS
+    )
+
+def clean_phone(phone_raw):
+    """Format an imported phone number, or None if it isn't usable"""
+    if not phone_raw or phone_raw == 'nan':
+        return None
+    formatted = format_phone_number(phone_raw)
+    if formatted and validate_phone_number(formatted):
+        return formatted
+    return None
 
-def import_csv(file_path, segment_tag=None):
+def normalize_phones(phones):
+    """
+    Column version of clean_phone, computed on a byte matrix
+
+    Matches format_phone_number + validate_phone_number exactly: strip every
+    non-digit, then 10 digits, or 11 digits starting with 1, become
+    +1XXXXXXXXXX and anything else is None. The column is laid out as a
+    (rows x width) uint8 array so filtering, counting and assembling digits
+    are numpy ops instead of a Python call per row. str.isdigit accepts
+    non-ASCII digits too, so a column with any non-ASCII text goes through
+    clean_phone instead.
+
+    Args:
+        phones (pd.Series): Raw phone strings
+
+    Returns:
+        pd.Series: E.164 numbers, None where unusable
+    """
+    values = phones.tolist()
+    if not values or not ''.join(values).isascii():
+        return phones.map(clean_phone).astype(object)
+
+    width = max(1, max(map(len, values)))
+    chars = np.array(values, dtype=f'S{width}').view(np.uint8).reshape(len(values), width)
+    is_digit = (chars >= ord('0')) & (chars <= ord('9'))
+
+    count = is_digit.sum(axis=1)
+    first = chars[np.arange(len(values)), is_digit.argmax(axis=1)]
+    valid = (count == 10) | ((count == 11) & (first == ord('1')))
+
+    # Rank digits from the right - the last ten are the national number
+    rank = np.cumsum(is_digit[:, ::-1], axis=1)[:, ::-1]
+    rows, cols = np.nonzero(is_digit & (rank <= 10) & valid[:, None])
+
+    e164 = np.zeros((len(values), 12), dtype=np.uint8)
+    e164[:, 0] = ord('+')
+    e164[:, 1] = ord('1')
+    e164[rows, 12 - rank[rows, cols]] = chars[rows, cols]
+
+    formatted = e164.view('S12').ravel().astype(str).astype(object)
+    formatted[~valid] = None
+    return pd.Series(formatted, index=phones.index)
+
+def normalize_contacts(df):
+    """
+    Normalize and validate email/phone columns in whole-column passes
+
+    Args:
+        df (pd.DataFrame): Text columns 'email', 'phone' (others kept as-is)
+
+    Returns:
+        pd.DataFrame: Copy with email lowercased and trimmed, phone in E.164
+                      (None if unusable) and a 'reason' column: None for a
+                      clean row, otherwise one of missing_email,
+                      invalid_email (row rejected) or invalid_phone (row
+                      kept, phone dropped)
+    """
+    df = df.copy()
+    phone_raw = df['phone'].str.strip()
+
+    df['email'] = df['email'].str.strip().str.lower()
+    df['phone'] = normalize_phones(phone_raw)
+
+    # First matching condition wins
+    df['reason'] = np.select(
+        [df['email'] == '', ~df['email'].str.match(EMAIL_PATTERN), (phone_raw != '') & df['phone'].isna()],
+        [REASON_MISSING_EMAIL, REASON_INVALID_EMAIL, REASON_INVALID_PHONE],
+        default=None
+    )
+    return df
+
+def prepare_chunk(df):
+    """
+    Normalize one chunk: Square column names, combined name, clean email/phone
+
+    Returns:
+        tuple: (DataFrame with email/name/phone columns, count of rows without a valid email)
+    """
+    df = df.rename(columns=COLUMN_MAPPING)
+
+    # Validate that we have email column
+    if 'email' not in df.columns:
+        raise ValueError("CSV must have 'email' or 'Email Address' column")
+
+    # Combine first_name and last_name into name if they exist
+    if 'first_name' in df.columns or 'last_name' in df.columns:
+        first = df.get('first_name', pd.Series([''] * len(df), index=df.index))
+        last = df.get('last_name', pd.Series([''] * len(df), index=df.index))
+        df['name'] = (first + ' ' + last).str.strip()
+    elif 'name' not in df.columns:
+        df['name'] = ''
+
+    if 'phone' not in df.columns:
+        df['phone'] = ''
+
+    df = normalize_contacts(df)
+
+    # Drop rows with missing or invalid emails
+    rejected = df['reason'].isin(REJECT_REASONS)
+    df = df[~rejected]
+
+    df['name'] = df['name'].str.strip()
+    return df[['email', 'name', 'phone']], int(rejected.sum())
+
+def import_chunk(db, df, segment_tag, seen_emails, claimed_phones, stats):
+    """
+    Upsert one prepared chunk with indexed IN lookups and bulk writes
+
+    Args:
+        db: Database session
+        df: Chunk from prepare_chunk
+        segment_tag (str): Optional segment to add to every contact
+        seen_emails (set): Email hashes already imported from this file
+        claimed_phones (set): Phone hashes already claimed by this file
+        stats (dict): Running counters, updated in place
+    """
+    customers = Customer.__table__
+    now = datetime.now()
+
+    # Remove duplicates within CSV (first occurrence wins, across chunks)
+    rows = []
+    for email, name, phone in df.itertuples(index=False):
+        email_hash = email_blind_index(email)
+        if email_hash in seen_emails:
+            continue
+        seen_emails.add(email_hash)
+
+        rows.append((email, email_hash, name, phone, phone_blind_index(phone) if phone else None))
+
+    if not rows:
+        return
+
+    stats['total_rows'] += len(rows)
+
+    # Existing customers for the whole chunk in one indexed IN query
+    existing = {
+        row.email_hash: row for row in db.execute(
+            customers.select().with_only_columns(
+                customers.c.id, customers.c.email_hash, customers.c.name, customers.c.phone,
+                customers.c.phone_hash, customers.c.sms_subscribed, customers.c.sms_opted_in_date
+            ).where(customers.c.email_hash.in_([row[1] for row in rows]))
+        )
+    }
+
+    # Phones are unique across customers - find current owners the same way
+    phone_hashes = [row[4] for row in rows if row[4]]
+    phone_owners = dict(db.execute(
+        customers.select().with_only_columns(customers.c.phone_hash, customers.c.id)
+        .where(customers.c.phone_hash.in_(phone_hashes))
+    ).all()) if phone_hashes else {}
+
+    inserts = []
+    updates = []
+    customer_ids = [current.id for current in existing.values()]  # Every customer in the chunk, for segment_tag
+    new_contacts = {}  # email_hash -> (email, phone) of each insert
+    new_phones = {}  # customer_id -> phone added to a customer
+
+    for email, email_hash, name, phone, phone_hash in rows:
+        current = existing.get(email_hash)
+
+        # Drop a phone already owned by another customer
+        if phone:
+            owner = phone_owners.get(phone_hash)
+            if phone_hash in claimed_phones or (owner is not None and (current is None or owner != current.id)):
+                phone, phone_hash = None, None
+            else:
+                claimed_phones.add(phone_hash)
+
+        if current:
+            values = {
+                'b_id': current.id,
+                'b_name': current.name,
+                'b_phone': current.phone,
+                'b_phone_hash': current.phone_hash,
+                'b_sms_subscribed': current.sms_subscribed,
+                'b_sms_opted_in_date': current.sms_opted_in_date,
+                'b_updated_at': now
+            }
+
+            # Update name if provided and not already set
+            if name and not current.name:
+                values['b_name'] = name
+
+            # Update phone if provided and not already set
+            if phone and not current.phone:
+                values['b_phone'] = encrypt_string(phone)
+                values['b_phone_hash'] = phone_hash
+                # Auto-subscribe to SMS if phone is added
+                values['b_sms_subscribed'] = True
+                values['b_sms_opted_in_date'] = now
+                new_phones[current.id] = phone
+
+            updates.append(values)
+        else:
+            new_contacts[email_hash] = (email, phone)
+            inserts.append({
+                'email': encrypt_string(email),
+                'email_hash': email_hash,
+                'phone': encrypt_string(phone) if phone else None,
+                'phone_hash': phone_hash,
+                'name': name,
+                'subscribed': True,
+                'sms_subscribed': True if phone else False,
+                'sms_opted_in_date': now if phone else None
+            })
+
+    if inserts:
+        # Rows a concurrent signup created first are skipped by the INSERT;
+        # count only what it actually wrote and report the rest as duplicates
+        statement = insert_ignoring_conflicts(db, customers)
+        if db.get_bind().dialect.insert_executemany_returning:
+            added = len(db.execute(statement.returning(customers.c.id), inserts).all())
+        else:
+            db.execute(statement, inserts)  # Plain INSERT: a conflict raises instead
+            added = len(inserts)
+        stats['added'] += added
+        stats['duplicates'] += len(inserts) - added
+
+        # Search tokens need the new ids - one more indexed IN query. A row
+        # a concurrent signup created first keeps its own phone's tokens.
+        inserted = db.execute(
+            customers.select().with_only_columns(customers.c.id, customers.c.email_hash, customers.c.phone_hash)
+            .where(customers.c.email_hash.in_(list(new_contacts)))
+        ).all()
+        index_search_tokens(db, 'email', {row.id: new_contacts[row.email_hash][0] for row in inserted})
+        for row in inserted:
+            customer_ids.append(row.id)
+            phone = new_contacts[row.email_hash][1]
+            if phone and row.phone_hash == phone_blind_index(phone):
+                new_phones[row.id] = phone
+
+    if updates:
+        db.execute(
+            update(customers).where(customers.c.id == bindparam('b_id')).values(
+                name=bindparam('b_name'),
+                phone=bindparam('b_phone'),
+                phone_hash=bindparam('b_phone_hash'),
+                sms_subscribed=bindparam('b_sms_subscribed'),
+                sms_opted_in_date=bindparam('b_sms_opted_in_date'),
+                updated_at=bindparam('b_updated_at')
+            ).execution_options(synchronize_session=False),
+            updates
+        )
+        stats['updated'] += len(updates)
+
+    index_search_tokens(db, 'phone', new_phones)
+
+    # Tag the whole chunk with one INSERT ... SELECT
+    if segment_tag:
+        SegmentManager(db).bulk_add_segment(customer_ids, segment_tag)
+
+def import_csv(file_path, segment_tag=None, chunk_size=None, progress_callback=None):
     """
     Import contacts from CSV with deduplication
 
     Supports two CSV formats:
     1. Simple format: email,name,phone
     2. Square export format: Email Address,First Name,Last Name,Phone Number,...
+
+    The file is streamed in chunks of IMPORT_CHUNK_SIZE rows. Each chunk
+    resolves existing customers with one blind-index IN query, is written
+    with bulk INSERT/UPDATE statements and committed on its own, so memory
+    stays flat and a 200k-row export never sits in one giant transaction.
+
+    Args:
+        file_path: CSV file path, or a file-like object holding the CSV
+        segment_tag (str): Optional segment to add to every contact
+        chunk_size (int): Rows per chunk (defaults to IMPORT_CHUNK_SIZE)
+        progress_callback: Called with a stats snapshot after each chunk
+
+    Returns:
+        dict: total_rows, added, updated, duplicates, invalid, processed
     """
+    chunk_size = chunk_size or Config.IMPORT_CHUNK_SIZE
+    segment_tag = validate_segment(segment_tag) if segment_tag else None
     db = SessionLocal()
 
+    stats = {
+        'total_rows': 0,
+        'added': 0,
+        'updated': 0,
+        'duplicates': 0,  # New to the file but created concurrently by someone else
+        'invalid': 0,
+        'processed': 0  # Raw CSV rows read so far
+    }
+
+    # Email and phone hashes already claimed by earlier rows of this file
+    seen_emails = set()
+    claimed_phones = set()
+
     try:
-        # Read CSV
-        df = pd.read_csv(file_path)
-
-        # Map Square column names to our expected names
-        column_mapping = {
-            'Email Address': 'email',
-            'Phone Number': 'phone',
-            'First Name': 'first_name',
-            'Last Name': 'last_name'
-        }
-
-        # Rename columns if they match Square format
-        df.rename(columns=column_mapping, inplace=True)
-
-        # Validate that we have email column
-        if 'email' not in df.columns:
-            raise ValueError("CSV must have 'email' or 'Email Address' column")
-
-        # Combine first_name and last_name into name if they exist
-        if 'first_name' in df.columns or 'last_name' in df.columns:
-            first = df.get('first_name', pd.Series([''] * len(df))).fillna('')
-            last = df.get('last_name', pd.Series([''] * len(df))).fillna('')
-            df['name'] = (first.astype(str) + ' ' + last.astype(str)).str.strip()
-
-        # Drop rows with missing emails
-        df = df.dropna(subset=['email'])
-
-        # Normalize emails (lowercase, strip whitespace)
-        df['email'] = df['email'].astype(str).str.strip().str.lower()
-
-        # Remove invalid emails
-        df = df[df['email'].apply(is_valid_email)]
-
-        # Process phone numbers if column exists
-        has_phone = 'phone' in df.columns
-        if has_phone:
-            # Fill NaN with empty string
-            df['phone'] = df['phone'].fillna('')
-            # Convert to string and strip whitespace
-            df['phone'] = df['phone'].astype(str).str.strip()
-
-        # Remove duplicates within CSV
-        df = df.drop_duplicates(subset=['email'])
-
-        stats = {
-            'total_rows': len(df),
-            'added': 0,
-            'updated': 0,
-            'invalid': 0
-        }
-
-        for _, row in df.iterrows():
-            email = row['email']
-            name = row.get('name', '')
-            phone_raw = row.get('phone', '') if has_phone else ''
-
-            # Format phone number if provided
-            phone = None
-            if phone_raw and phone_raw != 'nan' and phone_raw != '':
-                formatted = format_phone_number(phone_raw)
-                if formatted and validate_phone_number(formatted):
-                    phone = formatted
-
-            # Check if customer exists
-            existing = Customer.find_by_email(db, email)
-
-            if existing:
-                # Update name if provided and not already set
-                if name and not existing.name:
-                    existing.name = name
-
-                # Update phone if provided and not already set
-                if phone and not existing.phone:
-                    existing.phone = phone
-                    # Auto-subscribe to SMS if phone is added
-                    existing.sms_subscribed = True
-                    existing.sms_opted_in_date = datetime.now()
-
-                # Add segment tag if provided
-                if segment_tag:
-                    tags = set(existing.segments.split(',')) if existing.segments else set()
-                    tags.add(segment_tag)
-                    existing.segments = ','.join(filter(None, tags))
-
-                existing.updated_at = datetime.now()
-                stats['updated'] += 1
-            else:
-                # Create new customer
-                customer = Customer(
-                    email=email,
-                    phone=phone,
-                    name=name,
-                    segments=segment_tag if segment_tag else '',
-                    subscribed=True,
-                    sms_subscribed=True if phone else False,
-                    sms_opted_in_date=datetime.now() if phone else None
-                )
-                db.add(customer)
-                stats['added'] += 1
-
-        db.commit()
+        for chunk in read_csv_chunks(file_path, chunk_size):
+            df, invalid = prepare_chunk(chunk)
+            stats['invalid'] += invalid
+            stats['processed'] += len(chunk)
+
+            import_chunk(db, df, segment_tag, seen_emails, claimed_phones, stats)
+            db.commit()
+
+            if progress_callback:
+                progress_callback(dict(stats))
+
         return stats
 
     except Exception as e:
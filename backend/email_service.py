@@ -1,28 +1,69 @@
+import os
+import re
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+import requests
+from requests.adapters import HTTPAdapter
 from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
-from jinja2 import Template
+from sendgrid.helpers.mail import Mail, Personalization, To, Substitution
+from markupsafe import escape, Markup
 from backend.models import Customer
 from backend.config import Config
 from backend.image_handler import ImageHandler
+from backend.template_cache import template_cache
+from backend.retry_scheduler import parse_retry_after, is_retryable
+from backend.rate_limiter import channel_bucket, campaign_bucket, reserve_slots, wait_until
+from backend.qr_generator import qr_code_base64, qr_code_url, generate_batch
 
-def send_email(to_email, to_name, subject, html_content):
+# Per-recipient template fields carried as SendGrid substitutions in batch mode
+SUBSTITUTION_TAGS = {
+    'customer_name': '%customer_name%',
+    'unsubscribe_link': '%unsubscribe_link%'
+}
+QR_SUBSTITUTION_TAG = '%qr_code%'
+
+# SendGrid v3 accepts at most 1000 personalizations per request
+SENDGRID_MAX_PERSONALIZATIONS = 1000
+
+# Rejections of the account rather than the request - splitting a batch won't help
+ACCOUNT_STATUS_CODES = {401, 403}
+
+# 1x1 image for previews, which have no recipient to mint a QR code for
+QR_PLACEHOLDER_BASE64 = 'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=='
+
+def build_message(to_email, to_name, subject, html_content, images_processed=False):
     """
-    Send single email via SendGrid
+    Build a SendGrid Mail object with environment-aware image processing
 
-    Images are automatically processed based on environment:
-    - Development: Converted to base64
-    - Production: External URLs
+    Args:
+        images_processed (bool): HTML already went through ImageHandler
+                                 (e.g. filled from a CampaignSkeleton)
+
+    Returns:
+        Mail: Message ready for SendGridAPIClient.send() or SendGridDispatcher
     """
     # Process images based on environment
-    processed_html = ImageHandler.process_html_images(html_content)
+    processed_html = html_content if images_processed else ImageHandler.process_html_images(html_content)
 
-    message = Mail(
+    return Mail(
         from_email=(Config.SENDER_EMAIL, Config.SENDER_NAME),
         to_emails=to_email,
         subject=subject,
         html_content=processed_html
     )
 
+def send_email(to_email, to_name, subject, html_content):
+    """
+    Send single email via SendGrid
+
+    Images are automatically processed based on environment:
+    - Development: Converted to base64
+    - Production: External URLs
+    """
+    message = build_message(to_email, to_name, subject, html_content)
+
     try:
         sg = SendGridAPIClient(Config.SENDGRID_API_KEY)
         response = sg.send(message)
@@ -36,19 +77,196 @@ def send_email(to_email, to_name, subject, html_content):
             'error': str(e)
         }
 
+class SendGridDispatcher:
+    """
+    Concurrent SendGrid sender over one pooled keep-alive HTTP session
+
+    send_email() pays a TLS handshake and a full round trip per message,
+    one message at a time. The dispatcher reuses connections and keeps up
+    to max_workers requests in flight, paced by the shared 'email' token
+    bucket (EMAIL_RATE_LIMIT) and, when a campaign_id is given, that
+    campaign's bucket - so every worker process together stays under quota.
+
+    Usage:
+        dispatcher = get_dispatcher()
+        results = dispatcher.send_batch([(to_email, to_name, subject, html), ...])
+    """
+
+    def __init__(self, api_key=None, host=None, max_workers=None, rate_limit=None):
+        self.api_key = api_key if api_key is not None else Config.SENDGRID_API_KEY
+        self.url = f"{(host or Config.SENDGRID_API_HOST).rstrip('/')}/v3/mail/send"
+        self.max_workers = max_workers or Config.EMAIL_SEND_CONCURRENCY
+        self.bucket = channel_bucket('email', rate_limit)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json'
+        })
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                           thread_name_prefix='sendgrid')
+
+    def _buckets(self, campaign_id):
+        if campaign_id is None:
+            return [self.bucket]
+        return [self.bucket, campaign_bucket('email', campaign_id)]
+
+    def send_message(self, message, campaign_id=None, on_wait=None):
+        """
+        POST one prepared Mail
+
+        Returns:
+            dict: Same shape as send_email() - success plus status_code or error
+        """
+        return self._send_at(reserve_slots(self._buckets(campaign_id), 1)[0], message, on_wait)
+
+    def _send_at(self, slot, message, on_wait=None):
+        wait_until(slot, on_wait)
+        return self._post(message)
+
+    def _post(self, message):
+        try:
+            response = self.session.post(self.url, json=message.get(), timeout=30)
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'network_error': True
+            }
+
+        if response.status_code >= 400:
+            return {
+                'success': False,
+                'status_code': response.status_code,
+                'error': f"HTTP Error {response.status_code}: {response.text[:500]}",
+                'retry_after': parse_retry_after(response.headers.get('Retry-After'))
+            }
+        return {
+            'success': True,
+            'status_code': response.status_code,
+            'message_id': response.headers.get('X-Message-Id'),
+            'status': 'accepted'
+        }
+
+    def send_batch(self, emails, images_processed=False, campaign_id=None, on_wait=None):
+        """
+        Send many emails concurrently
+
+        Tokens for the whole batch are reserved in one go, so the rate
+        limiter costs one database round trip per bucket, not per email.
+
+        Args:
+            emails: Iterable of (to_email, to_name, subject, html_content)
+            images_processed (bool): Bodies already went through ImageHandler
+            campaign_id (int): Also draw from this campaign's rate bucket
+            on_wait: Called periodically (from worker threads) while sends
+                wait for their slots - see rate_limiter.wait_until
+
+        Returns:
+            list[dict]: One result per email, in input order
+        """
+        messages = [build_message(*email, images_processed=images_processed) for email in emails]
+        slots = reserve_slots(self._buckets(campaign_id), len(messages))
+        return list(self.executor.map(self._send_at, slots, messages, [on_wait] * len(messages)))
+
+    def send_personalized(self, subject, html_content, recipients, batch_size=None, campaign_id=None,
+                          on_wait=None):
+        """
+        Send one body to many recipients, up to 1000 per API request
+
+        Each recipient gets their own personalization (so nobody sees other
+        addresses) with substitutions for the per-recipient fields. Batches
+        are sent concurrently. A batch rejected outright (a permanent 4xx,
+        e.g. one malformed address) is split in half and each half resent,
+        down to single recipients, so only the offending recipients fail.
+
+        Args:
+            subject (str): Subject line
+            html_content (str): Body rendered with SUBSTITUTION_TAGS
+            recipients: List of (to_email, to_name, substitutions dict)
+            batch_size (int): Personalizations per request (max 1000)
+            campaign_id (int): Also draw from this campaign's rate bucket
+            on_wait: Called periodically (from worker threads) while requests
+                wait for their slots - see rate_limiter.wait_until
+
+        Returns:
+            list[dict]: One result per recipient, in input order
+        """
+        batch_size = min(batch_size or Config.EMAIL_PERSONALIZATIONS_PER_REQUEST,
+                         SENDGRID_MAX_PERSONALIZATIONS)
+        processed_html = ImageHandler.process_html_images(html_content)
+        chunks = [recipients[i:i + batch_size] for i in range(0, len(recipients), batch_size)]
+
+        # A request may start once the tokens for its last recipient are in
+        slots = reserve_slots(self._buckets(campaign_id), len(recipients))
+        chunk_slots = [slots[min(i + batch_size, len(recipients)) - 1] for i in range(0, len(recipients), batch_size)]
+
+        def post_chunk(chunk):
+            message = Mail(
+                from_email=(Config.SENDER_EMAIL, Config.SENDER_NAME),
+                subject=subject,
+                html_content=processed_html
+            )
+            for i, (to_email, to_name, substitutions) in enumerate(chunk):
+                personalization = Personalization()
+                personalization.add_to(To(to_email, to_name))
+                for tag, value in substitutions.items():
+                    personalization.add_substitution(Substitution(tag, value))
+                message.add_personalization(personalization, index=i)
+            result = self._post(message)
+
+            if len(chunk) > 1 and is_splittable(result):
+                # Already paid for in tokens: the rejected request sent nothing
+                middle = len(chunk) // 2
+                return post_chunk(chunk[:middle]) + post_chunk(chunk[middle:])
+            return [dict(result, batch_size=len(chunk)) for _ in chunk]
+
+        def send_chunk(chunk, slot):
+            wait_until(slot, on_wait)
+            return post_chunk(chunk)
+
+        results = []
+        for chunk_results in self.executor.map(send_chunk, chunks, chunk_slots):
+            results.extend(chunk_results)
+        return results
+
+    def close(self):
+        """Release worker threads and pooled connections"""
+        self.executor.shutdown(wait=True)
+        self.session.close()
+
+
+def is_splittable(result):
+    """A failed batch request that smaller requests could partly get through"""
+    status_code = result.get('status_code')
+    return (not result['success'] and status_code is not None and 400 <= status_code < 500
+            and status_code not in ACCOUNT_STATUS_CODES and not is_retryable(result))
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+def get_dispatcher():
+    """Process-wide dispatcher so connections stay warm between batches"""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = SendGridDispatcher()
+        return _dispatcher
+
 def render_email_template(template_path, customer, custom_body):
     """Render email with template and customer data"""
 
-    # Read template
-    with open(template_path, 'r') as f:
-        template_content = f.read()
+    # Compiled once per file (and per edit), not per customer
+    template = template_cache.get_template_file(template_path)
 
     # Generate unsubscribe link
-    token = customer.get_unsubscribe_token()
-    unsubscribe_link = f"{Config.BASE_URL}/unsubscribe?token={token}&email={customer.email}"
+    unsubscribe_link = get_unsubscribe_link(customer)
 
     # Render template
-    template = Template(template_content)
     rendered = template.render(
         customer_name=customer.name or 'Valued Customer',
         email_body=custom_body,
@@ -61,6 +279,269 @@ def render_email_template(template_path, customer, custom_body):
 
     return rendered
 
+def get_unsubscribe_link(customer):
+    """Build the absolute unsubscribe URL for a customer (no request context needed)"""
+    query = urlencode({
+        'email': customer.email,
+        'token': customer.get_unsubscribe_token()
+    })
+    return f"{Config.BASE_URL}/unsubscribe?{query}"
+
+def build_shared_template_vars(campaign):
+    """
+    Template variables that are identical for every recipient of a campaign
+
+    Environment-aware logo/hero images. The QR code is per recipient
+    (build_recipient_template_vars).
+    """
+    template_vars = {}
+
+    # Add image URLs based on environment
+    if Config.is_development():
+        template_vars['logo_base64'] = ImageHandler.get_image_url('FNFWebLogo200x50.png').replace('data:image/png;base64,', '')
+        template_vars['hero_image_base64'] = ImageHandler.get_image_url('FNFFront600x300.png').replace('data:image/png;base64,', '')
+    else:
+        template_vars['logo_url'] = Config.get_static_url('images/FNFWebLogo200x50.png')
+        template_vars['hero_image_url'] = Config.get_static_url('images/FNFFront600x300.png')
+
+    return template_vars
+
+def build_recipient_template_vars(customer, campaign=None):
+    """
+    Template variables that differ per recipient
+
+    Includes the recipient's own QR code (qr_generator) when the campaign
+    has QR codes enabled.
+    """
+    template_vars = {
+        'customer_name': customer.name or 'Valued Customer',
+        'unsubscribe_link': get_unsubscribe_link(customer)
+    }
+    if campaign is not None and campaign.has_qr_code:
+        template_vars.update(build_qr_template_vars(campaign, customer))
+    return template_vars
+
+def qr_template_var():
+    """
+    Template variable that carries the QR code
+
+    'qr_code_url' (a hosted image) under the external image strategy, so
+    each email carries a short link instead of the image; otherwise
+    'qr_code_base64'.
+    """
+    return 'qr_code_url' if Config.get_image_strategy() == 'external' else 'qr_code_base64'
+
+def build_qr_template_vars(campaign, customer):
+    """The recipient's own QR code for a campaign, as qr_template_var()"""
+    if qr_template_var() == 'qr_code_url':
+        return {'qr_code_url': qr_code_url(campaign.id, customer.id)}
+    # Base64 has no HTML specials; Markup spares autoescape a pass over it
+    return {'qr_code_base64': Markup(qr_code_base64(campaign.id, customer.id))}
+
+def substitution_tags(campaign):
+    """Template variable -> SendGrid substitution tag for a campaign's batch sends"""
+    tags = dict(SUBSTITUTION_TAGS)
+    if campaign.has_qr_code:
+        tags[qr_template_var()] = QR_SUBSTITUTION_TAG
+    return tags
+
+def build_campaign_template_vars(campaign, customer):
+    """
+    Build the full variable set for one recipient of a campaign template
+
+    Mirrors the variables campaign_send has always passed: customer name,
+    unsubscribe link, environment-aware logo/hero images and the QR code
+    when the campaign has QR codes enabled.
+    """
+    template_vars = build_shared_template_vars(campaign)
+    template_vars.update(build_recipient_template_vars(customer, campaign))
+    return template_vars
+
+class CampaignSkeleton:
+    """
+    A campaign body rendered and image-processed once, split into literal
+    chunks and named per-recipient slots
+
+    Per-recipient output is then a single join instead of a template render
+    plus ImageHandler regex passes over the whole document.
+
+    Slots: customer_name, unsubscribe_link and, when the campaign has QR
+    codes, qr_code or qr_code_url (see qr_template_var).
+    """
+
+    # Slot name -> template variable it stands in for
+    SLOT_VARS = {
+        'customer_name': 'customer_name',
+        'unsubscribe_link': 'unsubscribe_link',
+        'qr_code': 'qr_code_base64',
+        'qr_code_url': 'qr_code_url'
+    }
+    QR_SLOTS = {'qr_code_base64': 'qr_code', 'qr_code_url': 'qr_code_url'}
+
+    def __init__(self, template, shared_vars, has_qr_code=False):
+        self.slot_names = ['customer_name', 'unsubscribe_link']
+        if has_qr_code:
+            self.slot_names.append(self.QR_SLOTS[qr_template_var()])
+        nonce = secrets.token_hex(8)
+
+        # Control-character sentinels: untouched by autoescape and image rewriting
+        template_vars = dict(shared_vars)
+        for slot in self.slot_names:
+            template_vars[self.SLOT_VARS[slot]] = Markup(f"\x1dslot:{slot}:{nonce}\x1d")
+
+        html = ImageHandler.process_html_images(template.render(template_vars))
+        self.parts = re.split(f"\x1dslot:(\\w+):{nonce}\x1d", html)
+
+    def fill(self, values):
+        """
+        Produce the final HTML for one recipient
+
+        Args:
+            values (dict): Slot name -> value; plain strings are HTML-escaped
+                           as Jinja autoescape would have done
+
+        Returns:
+            str: Image-processed HTML
+        """
+        parts = list(self.parts)
+        for i in range(1, len(parts), 2):
+            parts[i] = str(escape(values[parts[i]]))
+        return ''.join(parts)
+
+class CampaignRenderer:
+    """
+    Render one campaign for many recipients
+
+    The template is fetched from the compile-once cache and the shared
+    variables (images) are built once at construction; render() only
+    supplies each recipient's own variables, including their QR code.
+
+    Usage:
+        renderer = CampaignRenderer(campaign)
+        html = renderer.render(customer)
+    """
+
+    def __init__(self, campaign):
+        self.campaign = campaign
+        self.template = template_cache.get_template(campaign.template_name)
+        # Base64 image data can't contain HTML specials; marking it safe once
+        # spares autoescape from rescanning hundreds of KB per recipient
+        self.shared_vars = {
+            name: Markup(value) if name.endswith('_base64') and value else value
+            for name, value in build_shared_template_vars(campaign).items()
+        }
+
+        self._skeleton = None
+        self._skeleton_checked = False
+
+    def render(self, customer):
+        """Render for one recipient"""
+        template_vars = dict(self.shared_vars)
+        template_vars.update(build_recipient_template_vars(customer, self.campaign))
+        return self.template.render(template_vars)
+
+    def slot_values(self, customer):
+        """Per-recipient values for the skeleton slots"""
+        recipient_vars = build_recipient_template_vars(customer, self.campaign)
+        return {slot: recipient_vars.get(var) for slot, var in CampaignSkeleton.SLOT_VARS.items()}
+
+    def prepare(self, customers):
+        """
+        Render a batch's QR codes up front, across the QR render pool
+
+        render(), render_for_send() and build_substitutions() then find every
+        recipient's image in the QR cache.
+        """
+        if self.campaign.has_qr_code:
+            generate_batch(self.campaign.id, [customer.id for customer in customers])
+
+    @property
+    def skeleton(self):
+        """
+        The split-render skeleton, or None if this template can't use one
+
+        A template that transforms a slot variable (e.g. {{ customer_name|upper }})
+        would mangle the sentinel, so the skeleton is verified once against a
+        full render with awkward sample values before being trusted.
+        """
+        if not self._skeleton_checked:
+            self._skeleton_checked = True
+            try:
+                has_qr_code = bool(self.campaign.has_qr_code)
+                skeleton = CampaignSkeleton(self.template, self.shared_vars, has_qr_code)
+                sample = {
+                    'customer_name': 'Sample <Customer> & "Co"',
+                    'unsubscribe_link': f"{Config.BASE_URL}/unsubscribe?email=a%40b.c&token=0'1",
+                    'qr_code_base64': None,
+                    'qr_code_url': None
+                }
+                if has_qr_code:
+                    qr_samples = {
+                        'qr_code_base64': Markup(QR_PLACEHOLDER_BASE64),
+                        'qr_code_url': f"{Config.BASE_URL}/qr/{'0' * 64}.png?r=1-2&b"
+                    }
+                    qr_var = qr_template_var()
+                    sample[qr_var] = qr_samples[qr_var]
+                template_vars = dict(self.shared_vars)
+                template_vars.update(sample)
+                expected = ImageHandler.process_html_images(self.template.render(template_vars))
+                slot_sample = {slot: sample[var] for slot, var in CampaignSkeleton.SLOT_VARS.items()}
+                if skeleton.fill(slot_sample) == expected:
+                    self._skeleton = skeleton
+                else:
+                    print(f"Template {self.campaign.template_name} transforms a per-recipient "
+                          f"variable; using full per-recipient rendering")
+            except Exception as e:
+                print(f"Skeleton render failed for {self.campaign.template_name}: {e}")
+        return self._skeleton
+
+    def render_for_send(self, customer):
+        """
+        Final, image-processed HTML for one recipient
+
+        Fills the pre-rendered skeleton when possible, otherwise falls back to
+        a full render plus image processing.
+        """
+        skeleton = self.skeleton
+        if skeleton is not None:
+            return skeleton.fill(self.slot_values(customer))
+        return ImageHandler.process_html_images(self.render(customer))
+
+    def render_with_tags(self):
+        """
+        Render once with substitution tags in the per-recipient slots
+
+        Used by personalization batching: SendGrid swaps each tag for the
+        recipient's value server-side, so one rendered body serves the batch.
+        """
+        template_vars = dict(self.shared_vars)
+        template_vars.update(substitution_tags(self.campaign))
+        return self.template.render(template_vars)
+
+def render_campaign_email(campaign, customer):
+    """
+    Render a campaign's template file for one customer
+
+    CRC: crc-EmailQueueTask.md (render_email)
+    """
+    return CampaignRenderer(campaign).render(customer)
+
+def render_campaign_email_with_tags(campaign):
+    """Render a campaign once with substitution tags (see CampaignRenderer)"""
+    return CampaignRenderer(campaign).render_with_tags()
+
+def build_substitutions(customer, campaign=None):
+    """
+    Per-recipient substitution values for a tag-rendered campaign
+
+    Values are HTML-escaped the same way Jinja autoescape would have
+    escaped them in a per-recipient render. Pass the campaign to include
+    the recipient's QR code when it has them.
+    """
+    recipient_vars = build_recipient_template_vars(customer, campaign)
+    tags = substitution_tags(campaign) if campaign is not None else SUBSTITUTION_TAGS
+    return {tag: str(escape(recipient_vars[name])) for name, tag in tags.items()}
+
 def send_test_email(test_email, subject, custom_body):
     """Send test email to yourself"""
 
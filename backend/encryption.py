@@ -1,8 +1,23 @@
 """
 Encryption utilities for protecting PII (emails and phone numbers)
 Uses Fernet symmetric encryption (AES-128)
+
+Fernet ciphertext is randomized, so it can't be searched. Lookups use
+blind indexes instead: a keyed HMAC-SHA256 of the normalized value, stored
+next to the ciphertext and indexed.
+
+Decryption can be batched (decrypt_many, optionally across a process pool)
+and memoized for the length of a request or send job (decryption_memo), so
+reading the same email or phone again costs a dict lookup.
 """
 import os
+import hmac
+import hashlib
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from contextvars import ContextVar
+from concurrent.futures import ProcessPoolExecutor
 from cryptography.fernet import Fernet
 from dotenv import load_dotenv
 import base64
@@ -64,6 +79,257 @@ def decrypt_string(encrypted):
         print(f"Decryption error (might be plaintext): {e}")
         return encrypted  # Return as-is
 
+# Batches smaller than this are decrypted in-process even when a pool is requested
+POOL_MIN_BATCH = 1000
+
+_pool = None
+_pool_size = 0
+_pool_lock = threading.Lock()
+
+def _init_pool_worker(key):
+    """Pool initializer - use the parent's key even if the child's environment has none"""
+    global cipher
+    cipher = Fernet(key)
+
+def _decrypt_chunk(ciphertexts):
+    return [decrypt_string(ciphertext) for ciphertext in ciphertexts]
+
+def _get_pool(processes):
+    """Shared decryption pool, (re)created when the requested size changes (spawned, like send partitions)"""
+    global _pool, _pool_size
+    with _pool_lock:
+        if _pool is None or _pool_size != processes:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            key = ENCRYPTION_KEY.encode() if isinstance(ENCRYPTION_KEY, str) else ENCRYPTION_KEY
+            _pool = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'),
+                                        initializer=_init_pool_worker, initargs=(key,))
+            _pool_size = processes
+        return _pool
+
+def decrypt_many(ciphertexts, processes=0):
+    """
+    Decrypt a batch of ciphertexts in one call
+
+    Each distinct ciphertext is decrypted once. With processes > 1 and at
+    least POOL_MIN_BATCH distinct values, the work is split across a shared
+    process pool (Fernet is CPU-bound, so threads would not help).
+
+    Args:
+        ciphertexts: Iterable of encrypted strings (None / empty allowed)
+        processes (int): Pool size; 0 or 1 decrypts in this process
+
+    Returns:
+        list: Plaintexts in input order (None for empty input), with
+              decrypt_string's fallback for values that aren't ciphertext
+    """
+    ciphertexts = list(ciphertexts)
+    unique = list(dict.fromkeys(ciphertext for ciphertext in ciphertexts if ciphertext))
+
+    if processes and processes > 1 and len(unique) >= POOL_MIN_BATCH:
+        size = -(-len(unique) // processes)
+        chunks = [unique[start:start + size] for start in range(0, len(unique), size)]
+        plaintexts = [text for chunk in _get_pool(processes).map(_decrypt_chunk, chunks) for text in chunk]
+    else:
+        plaintexts = _decrypt_chunk(unique)
+
+    lookup = dict(zip(unique, plaintexts))
+    return [lookup[ciphertext] if ciphertext else None for ciphertext in ciphertexts]
+
+class DecryptionMemo:
+    """
+    Plaintexts already decrypted in one request or job, keyed by ciphertext
+
+    Fernet ciphertexts are unique per encryption, so a memo entry can only
+    ever be the plaintext of that exact stored value.
+    """
+
+    def __init__(self):
+        self._plaintexts = {}
+        self.hits = 0
+        self.misses = 0
+
+    def decrypt(self, ciphertext):
+        """Decrypt through the memo"""
+        if not ciphertext:
+            return None
+        if ciphertext in self._plaintexts:
+            self.hits += 1
+            return self._plaintexts[ciphertext]
+        self.misses += 1
+        plaintext = self._plaintexts[ciphertext] = decrypt_string(ciphertext)
+        return plaintext
+
+    def prefetch(self, ciphertexts, processes=0):
+        """Decrypt every not-yet-memoized ciphertext with one decrypt_many call"""
+        missing = list(dict.fromkeys(c for c in ciphertexts if c and c not in self._plaintexts))
+        if missing:
+            self.misses += len(missing)
+            self._plaintexts.update(zip(missing, decrypt_many(missing, processes)))
+
+    def clear(self):
+        """Forget memoized plaintexts (counters are kept)"""
+        self._plaintexts.clear()
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._plaintexts)}
+
+_active_memo = ContextVar('decryption_memo', default=None)
+
+def start_decryption_memo():
+    """
+    Make a fresh memo current for this thread / context
+
+    Returns:
+        Token for end_decryption_memo()
+    """
+    return _active_memo.set(DecryptionMemo())
+
+def end_decryption_memo(token):
+    """Drop the memo made current by start_decryption_memo()"""
+    if token is not None:
+        _active_memo.reset(token)
+
+def current_decryption_memo():
+    """The active DecryptionMemo, or None outside a memo scope"""
+    return _active_memo.get()
+
+@contextmanager
+def decryption_memo():
+    """
+    Memoize decryption for the duration of a block
+
+    Usage:
+        with decryption_memo() as memo:
+            ...
+            print(memo.stats())
+    """
+    token = start_decryption_memo()
+    try:
+        yield _active_memo.get()
+    finally:
+        end_decryption_memo(token)
+
+def decrypt_field(ciphertext):
+    """Decrypt a stored email/phone, through the active memo if there is one"""
+    memo = _active_memo.get()
+    if memo is not None:
+        return memo.decrypt(ciphertext)
+    return decrypt_string(ciphertext) if ciphertext else None
+
+def prefetch_decryption(ciphertexts, processes=0):
+    """Batch-decrypt into the active memo ahead of reads (no-op without one)"""
+    memo = _active_memo.get()
+    if memo is not None:
+        memo.prefetch(ciphertexts, processes)
+
+# Blind index key - separate from the Fernet key when BLIND_INDEX_KEY is set,
+# otherwise derived from it so existing deployments need no new secret.
+# Changing either key invalidates stored indexes (re-run the backfill).
+BLIND_INDEX_KEY = os.getenv('BLIND_INDEX_KEY')
+_blind_index_key = (
+    BLIND_INDEX_KEY.encode() if BLIND_INDEX_KEY
+    else hmac.new(ENCRYPTION_KEY.encode() if isinstance(ENCRYPTION_KEY, str) else ENCRYPTION_KEY,
+                  b'maxxconnect-blind-index', hashlib.sha256).digest()
+)
+# Keyed once; blind_index copies it instead of re-deriving the HMAC pads per call
+_blind_index_hmac = hmac.new(_blind_index_key, digestmod=hashlib.sha256)
+
+def normalize_email(email):
+    """Canonical form used for email blind indexes (trimmed, lowercase)"""
+    if not email:
+        return None
+    normalized = str(email).strip().lower()
+    return normalized or None
+
+def normalize_phone(phone):
+    """
+    Canonical form used for phone blind indexes (digits only)
+
+    Digits only, so '+1 (555) 123-4567', '+15551234567' and a '+' that
+    arrived as a space in a query string all index the same.
+    """
+    if not phone:
+        return None
+    digits = ''.join(filter(str.isdigit, str(phone)))
+    if len(digits) == 10:
+        digits = '1' + digits  # Match format_phone_number's US default
+    return digits or None
+
+def blind_index(value, purpose):
+    """
+    Deterministic keyed hash for equality lookups on encrypted columns
+
+    Args:
+        value: Already-normalized plaintext
+        purpose: Domain separator ('email', 'phone') so equal strings in
+                 different fields don't share an index value
+
+    Returns:
+        64-char hex digest, or None for empty values
+    """
+    if not value:
+        return None
+    digest = _blind_index_hmac.copy()
+    digest.update(f"{purpose}:{value}".encode())
+    return digest.hexdigest()
+
+def email_blind_index(email):
+    """Blind index for an email address"""
+    return blind_index(normalize_email(email), 'email')
+
+def phone_blind_index(phone):
+    """Blind index for a phone number"""
+    return blind_index(normalize_phone(phone), 'phone')
+
+# Search tokens - blind indexes of value fragments, so contact search can
+# match partial emails and phone numbers without decrypting every row.
+# Only a ladder of lengths is stored to keep the token table small; a query
+# between two lengths uses the shorter one and the few candidates it finds
+# are checked against their decrypted values.
+SEARCH_PREFIX_LENGTHS = (3, 4, 5, 6, 8, 10, 12)
+PHONE_SUFFIX_LENGTHS = (4, 7, 10)
+
+def token_length(length, lengths):
+    """Longest stored length that fits in `length` chars, None if it is too short"""
+    fitting = [stored for stored in lengths if stored <= length]
+    return fitting[-1] if fitting else None
+
+def prefix_tokens(value, purpose):
+    """Blind indexes of value's prefixes at each SEARCH_PREFIX_LENGTHS length"""
+    if not value:
+        return []
+    return [blind_index(value[:length], purpose)
+            for length in SEARCH_PREFIX_LENGTHS if length <= len(value)]
+
+def email_search_tokens(email):
+    """
+    Search tokens for an email: prefixes of the local part and of the domain
+
+    Returns:
+        list of hex digests ('email_local' / 'email_domain' purposes)
+    """
+    normalized = normalize_email(email)
+    if not normalized:
+        return []
+    local, _, domain = normalized.partition('@')
+    return prefix_tokens(local, 'email_local') + prefix_tokens(domain, 'email_domain')
+
+def phone_search_tokens(phone):
+    """
+    Search tokens for a phone: its trailing digits at each PHONE_SUFFIX_LENGTHS length
+
+    The full number is already covered by phone_blind_index.
+
+    Returns:
+        list of hex digests ('phone_suffix' purpose)
+    """
+    digits = normalize_phone(phone)
+    if not digits:
+        return []
+    return [blind_index(digits[-length:], 'phone_suffix')
+            for length in PHONE_SUFFIX_LENGTHS if length <= len(digits)]
+
 def generate_key():
     """Generate a new encryption key for production use"""
     return Fernet.generate_key().decode()
@@ -8,6 +8,9 @@ Sequence: seq-campaign-create.md, seq-campaign-send.md
 import os
 import base64
 import re
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
 from backend.config import Config
 
@@ -15,6 +18,37 @@ from backend.config import Config
 class ImageHandler:
     """Handle images in email HTML based on environment"""
 
+    # Data URI cache: resolved path -> (mtime_ns, size, data_uri), LRU order,
+    # bounded by IMAGE_CACHE_MAX_BYTES of encoded data
+    _data_uri_cache = OrderedDict()
+    _data_uri_cache_bytes = 0
+
+    # Resolved path memo: src -> path (or (None, expires_at) for misses)
+    _path_cache = {}
+    _MISSING_PATH_TTL = 60  # seconds before re-probing a src that wasn't found
+
+    _cache_lock = threading.Lock()
+    _cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    # src values filled in per recipient after processing: SendGrid
+    # substitution tags ('%qr_code%') and CampaignSkeleton slot sentinels
+    PLACEHOLDER_PREFIXES = ('%', '\x1d')
+
+    # URLs rewrite_image_urls leaves as they are: already inlined or absolute,
+    # or filled in per recipient
+    _KEEP_PREFIXES = ('data:', 'http') + PLACEHOLDER_PREFIXES
+
+    # <img ... src="url">, and the same or CSS background(-image): ... url(url),
+    # compiled once. Each stops at the end of its URL, so the rest of the tag
+    # or declaration is copied through untouched. The combined pattern has no
+    # literal prefix for re to search for and scans several times slower, so
+    # it is only used on HTML that contains 'url(' at all.
+    _IMG_SRC = r'''<img\s[^>]*?(?<![\w-])src\s*=\s*(?P<quote>["'])(?P<src>[^"'>]+)(?P=quote)'''
+    IMG_SRC_PATTERN = re.compile(_IMG_SRC)
+    IMAGE_URL_PATTERN = re.compile(
+        _IMG_SRC + r'''|background(?:-image)?\s*:[^;{}<>]*?url\(\s*(?P<css_quote>["']?)(?P<css>[^"')]+)(?P=css_quote)\s*\)'''
+    )
+
     @staticmethod
     def process_html_images(html_content):
         """
@@ -46,30 +80,7 @@ class ImageHandler:
         Returns:
             str: HTML with images as base64 data URIs
         """
-        # Find all img tags with src attributes
-        img_pattern = r'<img\s+[^>]*src=["\']([^"\']+)["\'][^>]*>'
-
-        def replace_img(match):
-            img_tag = match.group(0)
-            src = match.group(1)
-
-            # Skip if already base64 or external URL
-            if src.startswith('data:') or src.startswith('http'):
-                return img_tag
-
-            # Try to find local file
-            file_path = ImageHandler._resolve_image_path(src)
-            if file_path and os.path.exists(file_path):
-                try:
-                    base64_data = ImageHandler._image_to_base64(file_path)
-                    return img_tag.replace(src, base64_data)
-                except Exception as e:
-                    print(f"Warning: Could not convert image {src} to base64: {e}")
-                    return img_tag
-
-            return img_tag
-
-        return re.sub(img_pattern, replace_img, html_content)
+        return ImageHandler.rewrite_image_urls(html_content, ImageHandler._base64_url)
 
     @staticmethod
     def _convert_to_external_urls(html_content):
@@ -82,41 +93,97 @@ class ImageHandler:
         Returns:
             str: HTML with external image URLs
         """
-        # Find all img tags with src attributes
-        img_pattern = r'<img\s+[^>]*src=["\']([^"\']+)["\'][^>]*>'
+        return ImageHandler.rewrite_image_urls(html_content, ImageHandler._external_url)
 
-        def replace_img(match):
-            img_tag = match.group(0)
-            src = match.group(1)
+    @staticmethod
+    def rewrite_image_urls(html_content, convert):
+        """
+        Rewrite local image URLs in one pass over the HTML
+
+        Covers <img src="..."> and CSS background / background-image url(...)
+        in style attributes and <style> blocks. Only the URL itself is
+        replaced; everything between URLs is copied through unchanged into a
+        list that is joined once at the end. data:, http(s) and per-recipient
+        placeholder URLs are left alone.
 
-            # Skip if already external URL or base64
-            if src.startswith('http') or src.startswith('data:'):
-                return img_tag
+        Args:
+            html_content (str): HTML content
+            convert: Callable taking a local URL and returning its replacement,
+                     or None to keep it
 
-            # Convert to external URL
-            if src.startswith('/static/'):
-                external_url = Config.get_full_url(src)
-            elif src.startswith('static/'):
-                external_url = Config.get_full_url('/' + src)
-            else:
-                # Assume it's in static/images/
-                external_url = Config.get_static_url(f"images/{src}")
+        Returns:
+            str: HTML with local image URLs converted
+        """
+        pattern = ImageHandler.IMAGE_URL_PATTERN if 'url(' in html_content else ImageHandler.IMG_SRC_PATTERN
+        parts = []
+        position = 0
+        for match in pattern.finditer(html_content):
+            group = match.lastgroup  # 'src' or 'css'
+            url = match.group(group)
+            if url.startswith(ImageHandler._KEEP_PREFIXES):
+                continue
+            converted = convert(url)
+            if converted is None or converted == url:
+                continue
+            parts.append(html_content[position:match.start(group)])
+            parts.append(converted)
+            position = match.end(group)
+
+        if not parts:
+            return html_content
+        parts.append(html_content[position:])
+        return ''.join(parts)
 
-            return img_tag.replace(src, external_url)
+    @staticmethod
+    def _base64_url(src):
+        """Data URI for a local image (None if it can't be found or read)"""
+        file_path = ImageHandler._resolve_image_path(src)
+        if not file_path:
+            return None
+        try:
+            return ImageHandler._image_to_base64(file_path)
+        except Exception as e:
+            print(f"Warning: Could not convert image {src} to base64: {e}")
+            return None
 
-        return re.sub(img_pattern, replace_img, html_content)
+    @staticmethod
+    def _external_url(src):
+        """Absolute URL for a local image path"""
+        if src.startswith('/static/'):
+            return Config.get_full_url(src)
+        elif src.startswith('static/'):
+            return Config.get_full_url('/' + src)
+        # Assume it's in static/images/
+        return Config.get_static_url(f"images/{src}")
 
     @staticmethod
     def _resolve_image_path(src):
         """
         Resolve relative image path to absolute file path
 
+        Results are memoized per src so a campaign doesn't repeat the same
+        stat probes for every recipient; misses are re-probed after a minute.
+
         Args:
             src (str): Image src attribute value
 
         Returns:
             str: Absolute file path or None
         """
+        cached = ImageHandler._path_cache.get(src)
+        if isinstance(cached, str):
+            return cached
+        if cached is not None and cached[1] > time.monotonic():
+            return None
+
+        path = ImageHandler._probe_image_path(src)
+        with ImageHandler._cache_lock:
+            ImageHandler._path_cache[src] = path if path else (None, time.monotonic() + ImageHandler._MISSING_PATH_TTL)
+        return path
+
+    @staticmethod
+    def _probe_image_path(src):
+        """Check the candidate locations for an image src on disk"""
         # Strip leading slash if present
         src_clean = src.lstrip('/')
 
@@ -143,12 +210,91 @@ class ImageHandler:
         """
         Convert image file to base64 data URI
 
+        Encoded results are cached by path and revalidated against the file's
+        mtime and size, so each image is read and encoded once per edit rather
+        than once per email.
+
         Args:
             file_path (str): Path to image file
 
         Returns:
             str: Base64 data URI
         """
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            # Gone since it was resolved - forget the memoized path too
+            with ImageHandler._cache_lock:
+                ImageHandler._forget_path(file_path)
+            raise
+
+        with ImageHandler._cache_lock:
+            entry = ImageHandler._data_uri_cache.get(file_path)
+            if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+                ImageHandler._data_uri_cache.move_to_end(file_path)
+                ImageHandler._cache_stats['hits'] += 1
+                return entry[2]
+
+        data_uri = ImageHandler._encode_image(file_path)
+
+        with ImageHandler._cache_lock:
+            ImageHandler._cache_stats['misses'] += 1
+            ImageHandler._store_data_uri(file_path, stat, data_uri)
+
+        return data_uri
+
+    @staticmethod
+    def _store_data_uri(file_path, stat, data_uri):
+        """Insert into the data URI cache, evicting least recently used entries (lock held)"""
+        cache = ImageHandler._data_uri_cache
+        old = cache.pop(file_path, None)
+        if old:
+            ImageHandler._data_uri_cache_bytes -= len(old[2])
+
+        max_bytes = Config.IMAGE_CACHE_MAX_BYTES
+        if len(data_uri) > max_bytes:
+            return  # Larger than the whole cache - don't thrash it
+
+        cache[file_path] = (stat.st_mtime_ns, stat.st_size, data_uri)
+        ImageHandler._data_uri_cache_bytes += len(data_uri)
+
+        while ImageHandler._data_uri_cache_bytes > max_bytes:
+            _, evicted = cache.popitem(last=False)
+            ImageHandler._data_uri_cache_bytes -= len(evicted[2])
+            ImageHandler._cache_stats['evictions'] += 1
+
+    @staticmethod
+    def _forget_path(file_path):
+        """Drop memoized srcs resolving to a path (lock held)"""
+        for src in [src for src, path in ImageHandler._path_cache.items() if path == file_path]:
+            del ImageHandler._path_cache[src]
+        old = ImageHandler._data_uri_cache.pop(file_path, None)
+        if old:
+            ImageHandler._data_uri_cache_bytes -= len(old[2])
+
+    @staticmethod
+    def cache_stats():
+        """Image cache counters for monitoring"""
+        with ImageHandler._cache_lock:
+            return dict(ImageHandler._cache_stats,
+                        entries=len(ImageHandler._data_uri_cache),
+                        bytes=ImageHandler._data_uri_cache_bytes,
+                        max_bytes=Config.IMAGE_CACHE_MAX_BYTES,
+                        resolved_paths=len(ImageHandler._path_cache))
+
+    @staticmethod
+    def clear_caches():
+        """Empty the data URI and resolved path caches"""
+        with ImageHandler._cache_lock:
+            ImageHandler._data_uri_cache.clear()
+            ImageHandler._data_uri_cache_bytes = 0
+            ImageHandler._path_cache.clear()
+            for key in ImageHandler._cache_stats:
+                ImageHandler._cache_stats[key] = 0
+
+    @staticmethod
+    def _encode_image(file_path):
+        """Read and base64-encode an image file as a data URI"""
         # Determine MIME type from extension
         ext = Path(file_path).suffix.lower()
         mime_types = {
@@ -206,9 +352,10 @@ class ImageHandler:
         if strategy == 'base64':
             # Return base64 data URI
             filepath = os.path.join('static', 'images', filename)
-            if os.path.exists(filepath):
+            try:
                 return ImageHandler._image_to_base64(filepath)
-            return None
+            except OSError:
+                return None
         else:
             # Return external URL
             return Config.get_static_url(f"images/{filename}")
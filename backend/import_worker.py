@@ -0,0 +1,145 @@
+"""
+Background CSV imports backed by the database work queue
+
+The /import route only stores the upload as an ImportJob and returns.
+The same worker process that drains campaign sends (worker.py) claims
+queued imports, streams them through csv_importer.import_csv and writes
+progress counters back to the job after every chunk for the page to poll.
+
+CRC: crc-CeleryApp.md
+Spec: phase-2-campaign-management.md
+"""
+import io
+from datetime import datetime, timedelta
+from sqlalchemy import or_, and_
+from backend.database import SessionLocal
+from backend.models import ImportJob
+from backend.csv_importer import import_csv
+from backend.subscriber_stats import subscriber_stats
+from backend.config import Config
+
+
+def get_active_import(db):
+    """Return the most recent queued or running import, if any"""
+    return db.query(ImportJob).filter(
+        ImportJob.status.in_(('queued', 'running'))
+    ).order_by(ImportJob.id.desc()).first()
+
+
+def enqueue_import(db, file_data, filename, segment_tag=None):
+    """
+    Queue an uploaded CSV for background import
+
+    Args:
+        db: Database session
+        file_data (bytes): Uploaded CSV contents
+        filename (str): Original (sanitized) filename, for display
+        segment_tag (str): Optional segment to add to every contact
+
+    Returns:
+        ImportJob: The committed job
+    """
+    job = ImportJob(
+        filename=filename,
+        segment_tag=segment_tag,
+        file_data=file_data,
+        status='queued'
+    )
+    db.add(job)
+    db.commit()
+    return job
+
+
+def claim_next_import(db, worker_id):
+    """
+    Claim a queued import, or take over one whose worker went silent
+
+    A taken-over import starts again from the top of the file. Rows the
+    previous worker already committed are simply matched as existing
+    customers, so nothing is duplicated.
+
+    Returns:
+        ImportJob or None
+    """
+    now = datetime.now()
+    stale_before = now - timedelta(seconds=Config.SEND_JOB_LEASE_SECONDS)
+    claimable = or_(
+        ImportJob.status == 'queued',
+        and_(ImportJob.status == 'running', ImportJob.heartbeat_at < stale_before)
+    )
+
+    candidates = db.query(ImportJob.id).filter(claimable).order_by(ImportJob.id).limit(5).all()
+    for (job_id,) in candidates:
+        claimed = db.query(ImportJob).filter(ImportJob.id == job_id, claimable).update(
+            {'status': 'running', 'worker_id': worker_id, 'heartbeat_at': now},
+            synchronize_session=False
+        )
+        db.commit()
+        if claimed:
+            return db.query(ImportJob).filter_by(id=job_id).first()
+
+    return None
+
+
+def process_import(db, job):
+    """
+    Run a claimed import, checkpointing progress after every chunk
+
+    Returns:
+        ImportJob: The finished job
+    """
+    job.started_at = datetime.now()
+    db.commit()
+
+    def record_progress(stats):
+        job.processed_count = stats['processed']
+        job.total_rows = stats['total_rows']
+        job.added_count = stats['added']
+        job.updated_count = stats['updated']
+        job.duplicate_count = stats['duplicates']
+        job.invalid_count = stats['invalid']
+        job.heartbeat_at = datetime.now()
+        db.commit()
+
+    stats = import_csv(io.BytesIO(job.file_data or b''), job.segment_tag, progress_callback=record_progress)
+    record_progress(stats)
+
+    job.status = 'completed'
+    job.completed_at = datetime.now()
+    job.file_data = None
+    db.commit()
+    subscriber_stats.invalidate()  # Once, as the job completes (other processes catch up within the TTL)
+
+    print(f"Import job {job.id} completed: {job.added_count} added, {job.updated_count} updated, "
+          f"{job.duplicate_count} duplicates, {job.invalid_count} invalid")
+    return job
+
+
+def run_once(worker_id):
+    """
+    Claim and process at most one import
+
+    Returns:
+        bool: True if an import was processed
+    """
+    db = SessionLocal()
+    try:
+        job = claim_next_import(db, worker_id)
+        if not job:
+            return False
+
+        print(f"Worker {worker_id} processing import job {job.id} ({job.filename})")
+        try:
+            process_import(db, job)
+        except Exception as e:
+            db.rollback()
+            job = db.query(ImportJob).filter_by(id=job.id).first()
+            job.status = 'failed'
+            job.error = str(e)
+            job.completed_at = datetime.now()
+            job.file_data = None
+            db.commit()
+            print(f"Import job {job.id} failed: {e}")
+        return True
+    finally:
+        db.close()
@@ -1,15 +1,18 @@
 """
-Database Models - Customer and Campaign entities
+Database Models - Customer, Campaign, QR code, send queue (jobs, partitions, deliveries) and import job entities
 
-CRC: crc-Customer.md, crc-Campaign.md
+CRC: crc-Customer.md, crc-Campaign.md, crc-QRCode.md, crc-EmailQueueTask.md, crc-SMSQueueTask.md
 Spec: phase-2-campaign-management.md
 """
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, Text, LargeBinary, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.sql import func
 from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import relationship
 from backend.database import Base
-from backend.encryption import encrypt_string, decrypt_string
+from backend.encryption import (encrypt_string, decrypt_field, email_blind_index, phone_blind_index,
+                                email_search_tokens, phone_search_tokens)
 import hashlib
+from datetime import datetime
 
 class Customer(Base):
     __tablename__ = 'customers'
@@ -19,16 +22,25 @@ class Customer(Base):
     _phone_encrypted = Column('phone', String(500), nullable=True, index=True)  # Encrypted storage
     name = Column(String(255))
 
+    # Blind indexes - keyed HMAC of the normalized value, for indexed lookups
+    email_hash = Column(String(64), unique=True, nullable=True, index=True)
+    phone_hash = Column(String(64), unique=True, nullable=True, index=True)
+
+    # Blind indexes of email / phone fragments for contact search
+    search_tokens = relationship('CustomerSearchToken', cascade='all, delete-orphan', passive_deletes=True)
+
     # Email property with automatic encryption/decryption
     @hybrid_property
     def email(self):
-        """Decrypt email when reading"""
-        return decrypt_string(self._email_encrypted) if self._email_encrypted else None
+        """Decrypt email when reading (memoized within a request or send job)"""
+        return decrypt_field(self._email_encrypted)
 
     @email.setter
     def email(self, value):
         """Encrypt email when writing"""
         self._email_encrypted = encrypt_string(value) if value else None
+        self.email_hash = email_blind_index(value)
+        self._set_search_tokens('email', email_search_tokens(value))
 
     @email.expression
     def email(cls):
@@ -38,13 +50,15 @@ class Customer(Base):
     # Phone property with automatic encryption/decryption
     @hybrid_property
     def phone(self):
-        """Decrypt phone when reading"""
-        return decrypt_string(self._phone_encrypted) if self._phone_encrypted else None
+        """Decrypt phone when reading (memoized within a request or send job)"""
+        return decrypt_field(self._phone_encrypted)
 
     @phone.setter
     def phone(self, value):
         """Encrypt phone when writing"""
         self._phone_encrypted = encrypt_string(value) if value else None
+        self.phone_hash = phone_blind_index(value)
+        self._set_search_tokens('phone', phone_search_tokens(value))
 
     @phone.expression
     def phone(cls):
@@ -61,13 +75,25 @@ class Customer(Base):
     sms_opted_in_date = Column(DateTime, nullable=True)
     sms_unsubscribed_date = Column(DateTime, nullable=True)
 
-    segments = Column(Text)  # Comma-separated tags
+    # Segment tags, via customer_segments (see segment_manager)
+    segments = relationship('Segment', secondary='customer_segments', order_by='Segment.name')
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
 
+    __table_args__ = (
+        # Keyset pagination on /contacts (see contact_browser.CONTACT_SORTS)
+        Index('ix_customers_created_id', created_at, id),
+        Index('ix_customers_name_sort', func.coalesce(name, ''), id),
+    )
+
     def __repr__(self):
         return f"<Customer {self.email}>"
 
+    def _set_search_tokens(self, field, tokens):
+        """Replace this customer's search tokens for one field ('email' or 'phone')"""
+        kept = [token for token in self.search_tokens if token.field != field]
+        self.search_tokens = kept + [CustomerSearchToken(field=field, token=token) for token in tokens]
+
     def get_unsubscribe_token(self):
         """Generate secure unsubscribe token"""
         data = f"{self.id}:{self.email}".encode()
@@ -80,15 +106,76 @@ class Customer(Base):
 
     @classmethod
     def find_by_email(cls, db_session, email):
-        """Find customer by email (handles encryption)"""
-        encrypted_email = encrypt_string(email)
-        return db_session.query(cls).filter(cls._email_encrypted == encrypted_email).first()
+        """Find customer by email via its blind index (case-insensitive)"""
+        email_hash = email_blind_index(email)
+        if not email_hash:
+            return None
+        return db_session.query(cls).filter(cls.email_hash == email_hash).first()
 
     @classmethod
     def find_by_phone(cls, db_session, phone):
-        """Find customer by phone (handles encryption)"""
-        encrypted_phone = encrypt_string(phone)
-        return db_session.query(cls).filter(cls._phone_encrypted == encrypted_phone).first()
+        """Find customer by phone via its blind index (format-insensitive)"""
+        phone_hash = phone_blind_index(phone)
+        if not phone_hash:
+            return None
+        return db_session.query(cls).filter(cls.phone_hash == phone_hash).first()
+
+    @classmethod
+    def phone_in_use(cls, db_session, phone, exclude_id=None):
+        """Check if another customer already owns this phone number"""
+        phone_hash = phone_blind_index(phone)
+        if not phone_hash:
+            return False
+        query = db_session.query(cls.id).filter(cls.phone_hash == phone_hash)
+        if exclude_id is not None:
+            query = query.filter(cls.id != exclude_id)
+        return query.first() is not None
+
+class CustomerSearchToken(Base):
+    """
+    One search token of a customer's email or phone (see contact_search)
+
+    Tokens are keyed hashes, so the table reveals no more than the blind
+    indexes on customers do. Lookups go through (token, customer_id).
+    """
+    __tablename__ = 'customer_search_tokens'
+
+    id = Column(Integer, primary_key=True)
+    customer_id = Column(Integer, ForeignKey('customers.id', ondelete='CASCADE'), nullable=False, index=True)
+    field = Column(String(10), nullable=False)  # email, phone
+    token = Column(String(64), nullable=False)
+
+    __table_args__ = (
+        Index('ix_search_token_customer', token, customer_id),
+    )
+
+class Segment(Base):
+    """A customer segment tag (normalized lowercase name)"""
+    __tablename__ = 'segments'
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(100), unique=True, nullable=False)
+    created_at = Column(DateTime, default=func.now())
+
+    def __repr__(self):
+        return f"<Segment {self.name}>"
+
+class CustomerSegment(Base):
+    """
+    Membership of a customer in a segment
+
+    The (segment_id, customer_id) primary key serves per-segment counts and
+    audiences; ix_customer_segments_customer serves a customer's own tags.
+    """
+    __tablename__ = 'customer_segments'
+
+    segment_id = Column(Integer, ForeignKey('segments.id', ondelete='CASCADE'), primary_key=True)
+    customer_id = Column(Integer, ForeignKey('customers.id', ondelete='CASCADE'), primary_key=True)
+    created_at = Column(DateTime, default=func.now())
+
+    __table_args__ = (
+        Index('ix_customer_segments_customer', customer_id),
+    )
 
 class Campaign(Base):
     __tablename__ = 'campaigns'
@@ -98,6 +185,7 @@ class Campaign(Base):
     subject = Column(String(255), nullable=False)
     template_name = Column(String(255), nullable=True)  # Email template filename
     html_content = Column(Text, nullable=False)
+    sms_content = Column(Text, nullable=True)  # SMS message text (opt-out footer added on send)
     has_qr_code = Column(Boolean, default=False)  # Whether campaign includes QR codes
     status = Column(String(50), default='draft')  # draft, sent, sending
     sent_date = Column(DateTime, nullable=True)
@@ -109,3 +197,311 @@ class Campaign(Base):
     def requires_qr_generation(self):
         """Check if campaign needs QR codes during send"""
         return self.has_qr_code is True
+
+class SendJob(Base):
+    """
+    One background send of a campaign to an audience segment
+
+    The web request only creates the job and its CampaignDelivery rows;
+    a worker process (worker.py) claims the job and drains the rows.
+    A job whose remaining rows are all waiting on a retry backoff, or whose
+    run raised an unexpected error, is parked as 'retrying' until
+    next_attempt_at, then claimed again.
+    """
+    __tablename__ = 'send_jobs'
+
+    ACTIVE_STATUSES = ('queued', 'running', 'retrying')
+
+    id = Column(Integer, primary_key=True)
+    campaign_id = Column(Integer, ForeignKey('campaigns.id', ondelete='CASCADE'), nullable=False, index=True)
+    channel = Column(String(20), default='email')  # email, sms
+    segment = Column(String(50), default='all')  # all, email_only, sms_only, both
+    status = Column(String(50), default='queued', index=True)  # queued, running, retrying, completed, failed
+    total_count = Column(Integer, default=0)
+    sent_count = Column(Integer, default=0)
+    failed_count = Column(Integer, default=0)
+    skipped_count = Column(Integer, default=0)
+    retrying_count = Column(Integer, default=0)  # Deliveries waiting on a retry backoff
+    next_attempt_at = Column(DateTime, nullable=True)  # When a 'retrying' job is due again
+    error_count = Column(Integer, default=0)  # Runs that raised; the job fails after SEND_MAX_ATTEMPTS
+    error = Column(Text, nullable=True)
+
+    # Worker lease - a job whose heartbeat is older than the lease can be taken over
+    worker_id = Column(String(255), nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+
+    created_at = Column(DateTime, default=func.now())
+    started_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<SendJob {self.id} campaign={self.campaign_id} {self.status}>"
+
+    def is_active(self):
+        """Check if the job still has work queued, in progress or waiting to retry"""
+        return self.status in self.ACTIVE_STATUSES
+
+    def to_dict(self):
+        """Progress snapshot for the JSON status endpoint"""
+        processed = (self.sent_count or 0) + (self.failed_count or 0) + (self.skipped_count or 0)
+        return {
+            'job_id': self.id,
+            'campaign_id': self.campaign_id,
+            'channel': self.channel,
+            'status': self.status,
+            'total': self.total_count or 0,
+            'processed': processed,
+            'sent': self.sent_count or 0,
+            'failed': self.failed_count or 0,
+            'skipped': self.skipped_count or 0,
+            'retrying': self.retrying_count or 0,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'error': self.error,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None
+        }
+
+class SendPartition(Base):
+    """
+    One customer id range of a large send job, drained by its own process
+
+    Partitions are disjoint and hold about the same number of deliveries.
+    Each is claimed like a job (pending -> running -> completed) and keeps
+    its own counters and heartbeat. A job taken over after a crash skips
+    the completed ranges and hands the rest out again.
+    """
+    __tablename__ = 'send_partitions'
+    __table_args__ = (
+        UniqueConstraint('job_id', 'position', name='uq_partition_job_position'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    job_id = Column(Integer, ForeignKey('send_jobs.id', ondelete='CASCADE'), nullable=False)
+    position = Column(Integer, nullable=False)  # Order of the range within the job
+    min_customer_id = Column(Integer, nullable=False)  # Inclusive
+    max_customer_id = Column(Integer, nullable=False)  # Inclusive
+    status = Column(String(50), default='pending')  # pending, running, completed
+    total_count = Column(Integer, default=0)
+    sent_count = Column(Integer, default=0)
+    failed_count = Column(Integer, default=0)
+    skipped_count = Column(Integer, default=0)
+    worker_id = Column(String(255), nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<SendPartition {self.position} job={self.job_id} {self.min_customer_id}-{self.max_customer_id} {self.status}>"
+
+    def to_dict(self):
+        """Progress of one range for the JSON status endpoint"""
+        return {
+            'position': self.position,
+            'customer_ids': [self.min_customer_id, self.max_customer_id],
+            'status': self.status,
+            'total': self.total_count or 0,
+            'processed': (self.sent_count or 0) + (self.failed_count or 0) + (self.skipped_count or 0),
+            'sent': self.sent_count or 0,
+            'failed': self.failed_count or 0,
+            'skipped': self.skipped_count or 0
+        }
+
+class CampaignDelivery(Base):
+    """
+    Per-recipient send record - doubles as the persisted work queue
+
+    Status flow: pending -> sending -> sent / failed / skipped, with
+    retryable failures going sending -> retry -> sending again once
+    next_attempt_at passes (see retry_scheduler).
+    Rows are flipped to 'sending' and committed before the provider is
+    called, so a restarted worker never re-sends a row it may already
+    have delivered.
+
+    Once a send finishes the rows are the campaign's permanent per-recipient
+    ledger (see campaign_analytics). The composite indexes cover the queries
+    that must stay fast at millions of rows; their leading columns also serve
+    lookups by job, campaign or customer alone.
+    """
+    __tablename__ = 'campaign_deliveries'
+    __table_args__ = (
+        UniqueConstraint('job_id', 'customer_id', 'channel', name='uq_delivery_job_customer_channel'),
+        # Worker drain: a job's next pending / due retry rows in id order
+        Index('ix_delivery_job_status_id', 'job_id', 'status', 'id'),
+        # Results page and analytics: counts and drill-down per campaign, channel and status
+        Index('ix_delivery_campaign_channel_status', 'campaign_id', 'channel', 'status', 'id'),
+        # A customer's history across campaigns (and ON DELETE CASCADE from customers)
+        Index('ix_delivery_customer_created', 'customer_id', 'created_at'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    job_id = Column(Integer, ForeignKey('send_jobs.id', ondelete='CASCADE'), nullable=False)
+    campaign_id = Column(Integer, ForeignKey('campaigns.id', ondelete='CASCADE'), nullable=False)
+    customer_id = Column(Integer, ForeignKey('customers.id', ondelete='CASCADE'), nullable=False)
+    channel = Column(String(20), default='email')
+    status = Column(String(50), default='pending')  # pending, sending, retry, sent, failed, skipped
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, nullable=True)  # Backoff deadline while status is 'retry'
+    error = Column(Text, nullable=True)  # Last failure, kept while retrying
+
+    # Provider's id and status for the sent message (SendGrid X-Message-Id / Twilio SID)
+    provider_message_id = Column(String(64), nullable=True, index=True)
+    provider_status = Column(String(32), nullable=True)
+
+    created_at = Column(DateTime, default=func.now())  # Enqueued
+    last_attempt_at = Column(DateTime, nullable=True)
+    sent_at = Column(DateTime, nullable=True)  # Accepted by the provider
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+    def to_dict(self):
+        """Ledger entry for JSON drill-down"""
+        return {
+            'id': self.id,
+            'job_id': self.job_id,
+            'customer_id': self.customer_id,
+            'channel': self.channel,
+            'status': self.status,
+            'attempts': self.attempts or 0,
+            'error': self.error,
+            'provider_message_id': self.provider_message_id,
+            'provider_status': self.provider_status,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'last_attempt_at': self.last_attempt_at.isoformat() if self.last_attempt_at else None,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None
+        }
+
+    def __repr__(self):
+        return f"<CampaignDelivery job={self.job_id} customer={self.customer_id} {self.status}>"
+
+class QRCode(Base):
+    """
+    One issued redemption code (see qr_generator.generate_token)
+
+    Only a SHA-256 of the code is stored, so the table alone can't be used
+    to redeem anything. Redemption is a single conditional UPDATE on the
+    unique code_hash index (see qr_redemption.redeem_code).
+    """
+    __tablename__ = 'qr_codes'
+    __table_args__ = (
+        UniqueConstraint('campaign_id', 'customer_id', name='uq_qr_code_campaign_customer'),
+        # ON DELETE CASCADE from customers
+        Index('ix_qr_codes_customer', 'customer_id'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    campaign_id = Column(Integer, ForeignKey('campaigns.id', ondelete='CASCADE'), nullable=False)
+    customer_id = Column(Integer, ForeignKey('customers.id', ondelete='CASCADE'), nullable=False)
+    code_hash = Column(String(64), unique=True, nullable=False, index=True)
+    created_at = Column(DateTime, default=func.now())
+    expires_at = Column(DateTime, nullable=True)
+    usage_count = Column(Integer, nullable=False, default=0)
+    max_usage = Column(Integer, nullable=False, default=1)
+    redeemed_at = Column(DateTime, nullable=True)  # First redemption
+
+    def __repr__(self):
+        return f"<QRCode campaign={self.campaign_id} customer={self.customer_id} used={self.usage_count}/{self.max_usage}>"
+
+    def is_expired(self, now=None):
+        """Check if the code is past expires_at"""
+        return self.expires_at is not None and (now or datetime.now()) >= self.expires_at
+
+    def can_redeem(self):
+        """Check if the code has redemptions left"""
+        return (self.usage_count or 0) < (self.max_usage or 1)
+
+    def is_valid(self, now=None):
+        """Check if the code is unexpired with redemptions left"""
+        return self.can_redeem() and not self.is_expired(now)
+
+    def to_dict(self):
+        """Redemption state for the JSON validate/redeem endpoints"""
+        return {
+            'campaign_id': self.campaign_id,
+            'customer_id': self.customer_id,
+            'usage_count': self.usage_count or 0,
+            'max_usage': self.max_usage or 1,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+            'redeemed_at': self.redeemed_at.isoformat() if self.redeemed_at else None
+        }
+
+class ImportJob(Base):
+    """
+    One background CSV contact import
+
+    The upload is stored on the row itself so the worker can read it even
+    when it runs on a different machine from the web process; it is
+    cleared once the import finishes.
+    """
+    __tablename__ = 'import_jobs'
+
+    id = Column(Integer, primary_key=True)
+    filename = Column(String(255))
+    segment_tag = Column(String(255), nullable=True)
+    file_data = Column(LargeBinary, nullable=True)  # Uploaded CSV, cleared when done
+    status = Column(String(50), default='queued', index=True)  # queued, running, completed, failed
+
+    # Progress counters (see csv_importer.import_csv stats)
+    processed_count = Column(Integer, default=0)  # Raw CSV rows read
+    total_rows = Column(Integer, default=0)  # Unique valid contacts
+    added_count = Column(Integer, default=0)
+    updated_count = Column(Integer, default=0)
+    duplicate_count = Column(Integer, default=0)  # Inserts skipped: created concurrently
+    invalid_count = Column(Integer, default=0)
+    error = Column(Text, nullable=True)
+
+    # Worker lease - same takeover rule as SendJob
+    worker_id = Column(String(255), nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+
+    created_at = Column(DateTime, default=func.now())
+    started_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<ImportJob {self.id} {self.filename} {self.status}>"
+
+    def is_active(self):
+        """Check if the import is still queued or in progress"""
+        return self.status in ('queued', 'running')
+
+    def to_dict(self):
+        """Progress snapshot for the JSON status endpoint"""
+        return {
+            'job_id': self.id,
+            'filename': self.filename,
+            'status': self.status,
+            'processed': self.processed_count or 0,
+            'total_rows': self.total_rows or 0,
+            'added': self.added_count or 0,
+            'updated': self.updated_count or 0,
+            'duplicates': self.duplicate_count or 0,
+            'invalid': self.invalid_count or 0,
+            'error': self.error,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None
+        }
+
+class RateLimitBucket(Base):
+    """
+    Shared token bucket for provider send rates (see rate_limiter.TokenBucket)
+
+    Keys are 'email', 'sms', '<channel>:campaign:<id>' and
+    'sms:sender:<number>'. Times are Unix epoch seconds so every process
+    computes refill against the same clock; writes are compare-and-swap
+    on version.
+    """
+    __tablename__ = 'rate_limit_buckets'
+
+    key = Column(String(255), primary_key=True)
+    limit_per_minute = Column(Float, default=0)  # 0 = unlimited, counted only
+    capacity = Column(Float, nullable=False)  # Burst size in tokens
+    tokens = Column(Float, nullable=False)  # Negative while reservations wait on refill
+    updated_at = Column(Float, nullable=False)
+    version = Column(Integer, nullable=False, default=1)
+
+    # Sliding-window send counts for velocity
+    window_start = Column(Float, nullable=True)
+    window_count = Column(Integer, default=0)
+    previous_count = Column(Integer, default=0)
+
+    def __repr__(self):
+        return f"<RateLimitBucket {self.key} tokens={self.tokens:.1f}>"
@@ -0,0 +1,385 @@
+"""
+QRCodeGenerator - per-recipient redemption codes and their QR images
+
+Every recipient of a QR campaign gets the code
+'{campaign_id}-{customer_id}-{signature}', where the signature is a keyed
+HMAC of the two ids. Codes are unique per recipient, can't be guessed or
+forged, can be checked without a database lookup, and come out the same on
+every retry and resend of the campaign.
+
+Rendering a code is CPU-bound (qrcode places modules in pure Python, then
+PIL encodes the PNG), so large batches are spread over a process pool.
+Rendered PNG bytes are kept in a bounded LRU keyed by code, so a retried
+or resent recipient reuses the image instead of rendering it again.
+
+Under the external image strategy emails link to the image instead of
+inlining it: each PNG is written once to a content-addressed store on disk
+(QRImageStore) and served by /qr/<sha256>.png with a strong ETag and a
+one-year immutable Cache-Control.
+
+CRC: crc-QRCodeGenerator.md
+Spec: phase-2-campaign-management.md
+Sequence: seq-qr-generate.md, seq-campaign-send-qr.md
+"""
+import io
+import os
+import re
+import hmac
+import base64
+import hashlib
+import tempfile
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import qrcode
+from qrcode.constants import ERROR_CORRECT_M
+from PIL import Image
+from backend.config import Config
+from backend.encryption import ENCRYPTION_KEY
+
+# Signature bytes in a code (hex-encoded, so 32 characters)
+TOKEN_HASH_LENGTH = 16
+
+# Pixels per QR module; a 37-module code (version 3 plus border) is 222px,
+# close to the 200px the email templates display it at
+BOX_SIZE = 6
+BORDER = 4
+
+# qrcode normally tries all 8 mask patterns and keeps the one with the fewest
+# penalty points, which is most of its work. Every mask is valid and scans;
+# fixing one makes each render about 3x faster.
+MASK_PATTERN = 0
+
+# Batches smaller than this are rendered in-process even when a pool is configured
+POOL_MIN_BATCH = 64
+
+# Cache lifetime for hosted images (content-addressed, so they never change)
+QR_IMAGE_MAX_AGE = 365 * 24 * 3600
+
+# ?r= of a hosted image URL: '{campaign_id}-{customer_id}' (never the code itself)
+RECIPIENT_PATTERN = re.compile(r'^(\d{1,18})-(\d{1,18})$')
+
+# Optional dedicated signing key; otherwise derived from ENCRYPTION_KEY.
+# Changing either invalidates codes already sent.
+QR_SIGNING_KEY = os.getenv('QR_SIGNING_KEY')
+_signing_key = (
+    QR_SIGNING_KEY.encode() if QR_SIGNING_KEY
+    else hmac.new(ENCRYPTION_KEY.encode() if isinstance(ENCRYPTION_KEY, str) else ENCRYPTION_KEY,
+                  b'maxxconnect-qr-code', hashlib.sha256).digest()
+)
+_signing_hmac = hmac.new(_signing_key, digestmod=hashlib.sha256)
+
+
+def _signature(campaign_id, customer_id):
+    digest = _signing_hmac.copy()
+    digest.update(f"qr:{int(campaign_id)}:{int(customer_id)}".encode())
+    return digest.hexdigest()[:TOKEN_HASH_LENGTH * 2].upper()
+
+
+def generate_token(campaign_id, customer_id):
+    """
+    Redemption code for one customer of a campaign
+
+    Uppercase hex keeps the code within QR alphanumeric mode, which holds it
+    in a smaller (version 3) symbol than byte mode would.
+
+    Returns:
+        str: e.g. '12-3456-9F2C...' (same result on every call)
+    """
+    return f"{int(campaign_id)}-{int(customer_id)}-{_signature(campaign_id, customer_id)}"
+
+
+def verify_token(code):
+    """
+    Check a scanned code's signature (constant-time)
+
+    Args:
+        code (str): Code as scanned or typed (case and surrounding space ignored)
+
+    Returns:
+        tuple or None: (campaign_id, customer_id), None if malformed or forged
+    """
+    parts = str(code or '').strip().upper().split('-')
+    if len(parts) != 3 or not parts[0].isdigit() or not parts[1].isdigit():
+        return None
+    campaign_id, customer_id = int(parts[0]), int(parts[1])
+    if not hmac.compare_digest(parts[2], _signature(campaign_id, customer_id)):
+        return None
+    return campaign_id, customer_id
+
+
+def render_qr_png(code):
+    """
+    Render a code as a black-and-white PNG
+
+    The module matrix is drawn at one pixel per module and scaled up with
+    nearest-neighbour resampling, rather than painting each module as a
+    rectangle through qrcode's PIL image factory.
+
+    Returns:
+        bytes: PNG data
+    """
+    qr = qrcode.QRCode(error_correction=ERROR_CORRECT_M, border=BORDER, mask_pattern=MASK_PATTERN)
+    qr.add_data(code)
+    qr.make(fit=True)
+    matrix = qr.get_matrix()
+    size = len(matrix)
+
+    modules = bytes(0 if dark else 255 for row in matrix for dark in row)
+    image = Image.frombytes('L', (size, size), modules)
+    image = image.resize((size * BOX_SIZE, size * BOX_SIZE), Image.NEAREST).convert('1')
+
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def encode_base64(png):
+    """PNG bytes as base64 text for a data: URI"""
+    return base64.b64encode(png).decode()
+
+
+def _render_chunk(codes):
+    return [render_qr_png(code) for code in codes]
+
+
+_pool = None
+_pool_size = 0
+_pool_lock = threading.Lock()
+
+
+def _get_pool(processes):
+    """
+    Shared rendering pool, (re)created when the requested size changes
+
+    Workers are spawned rather than forked: the web app and send worker
+    hold threads (heartbeats, limiter sessions) and pooled DB connections
+    that a forked child would inherit mid-use.
+    """
+    global _pool, _pool_size
+    with _pool_lock:
+        if _pool is None or _pool_size != processes:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'))
+            _pool_size = processes
+        return _pool
+
+
+def render_many(codes, processes=None):
+    """
+    Render a batch of codes, across a process pool when it is worth it
+
+    Args:
+        codes: List of codes
+        processes (int): Pool size (default QR_RENDER_PROCESSES); 0 or 1
+                         renders in this process
+
+    Returns:
+        list[bytes]: PNGs in input order
+    """
+    codes = list(codes)
+    processes = Config.QR_RENDER_PROCESSES if processes is None else processes
+
+    if processes > 1 and len(codes) >= POOL_MIN_BATCH:
+        # A few chunks per worker so an uneven chunk doesn't leave cores idle
+        size = max(1, -(-len(codes) // (processes * 4)))
+        chunks = [codes[start:start + size] for start in range(0, len(codes), size)]
+        return [png for chunk in _get_pool(processes).map(_render_chunk, chunks) for png in chunk]
+    return _render_chunk(codes)
+
+
+class QRImageCache:
+    """Thread-safe LRU of rendered QR PNGs keyed by code, bounded by total bytes"""
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = Config.QR_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self._entries = OrderedDict()  # code -> PNG bytes
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, code):
+        """PNG for a code, rendering and caching it on a miss"""
+        with self._lock:
+            png = self._entries.get(code)
+            if png is not None:
+                self._entries.move_to_end(code)
+                self.hits += 1
+                return png
+            self.misses += 1
+        png = render_qr_png(code)
+        with self._lock:
+            self._store(code, png)
+        return png
+
+    def prefetch(self, codes, processes=None):
+        """
+        Render every code not already cached, as one batch
+
+        Returns:
+            int: Codes rendered
+        """
+        with self._lock:
+            missing = [code for code in dict.fromkeys(codes) if code not in self._entries]
+        if missing:
+            pngs = render_many(missing, processes)
+            with self._lock:
+                for code, png in zip(missing, pngs):
+                    self._store(code, png)
+        return len(missing)
+
+    def _store(self, code, png):
+        """Insert, evicting least recently used entries (lock held)"""
+        old = self._entries.pop(code, None)
+        if old is not None:
+            self._bytes -= len(old)
+        if len(png) > self.max_bytes:
+            return
+        self._entries[code] = png
+        self._bytes += len(png)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Cache counters for monitoring"""
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes,
+                    'hits': self.hits, 'misses': self.misses}
+
+
+qr_cache = QRImageCache()
+
+
+def generate_batch(campaign_id, customer_ids, processes=None):
+    """
+    Codes for many recipients, with their images rendered into qr_cache
+
+    Args:
+        campaign_id (int): Campaign id
+        customer_ids: Iterable of customer ids
+        processes (int): Render pool size (default QR_RENDER_PROCESSES)
+
+    Returns:
+        dict: customer_id -> code
+    """
+    codes = {customer_id: generate_token(campaign_id, customer_id) for customer_id in customer_ids}
+    qr_cache.prefetch(codes.values(), processes)
+    return codes
+
+
+def qr_code_base64(campaign_id, customer_id):
+    """Base64 PNG of a recipient's code, for templates' qr_code_base64"""
+    return encode_base64(qr_cache.get(generate_token(campaign_id, customer_id)))
+
+
+class QRImageStore:
+    """
+    Write-once QR PNGs on disk, named by the SHA-256 of their bytes
+
+    A file's name is its content, so it never changes once written: the
+    route can serve it as immutable, and a resend finds it already there.
+    Files are sharded by the first two hex digits to keep directories small.
+    """
+
+    DIGEST_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+    # Digests this process knows are on disk, to skip the stat per recipient
+    MAX_KNOWN = 100000
+
+    def __init__(self, root=None):
+        self.root = os.path.abspath(root or Config.QR_STORE_DIR)
+        self._known = set()
+
+    def path(self, digest):
+        """File path for a digest (None if it isn't a SHA-256 hex digest)"""
+        if not self.DIGEST_PATTERN.match(digest or ''):
+            return None
+        return os.path.join(self.root, digest[:2], f"{digest}.png")
+
+    def put(self, png):
+        """
+        Store PNG bytes unless already present
+
+        Written to a temporary file and renamed into place, so a reader
+        never sees a partial image.
+
+        Returns:
+            str: The content's SHA-256 hex digest
+        """
+        digest = hashlib.sha256(png).hexdigest()
+        if digest in self._known:
+            return digest
+        path = self.path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(png)
+                os.replace(temp_path, path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+        if len(self._known) >= self.MAX_KNOWN:
+            self._known.clear()
+        self._known.add(digest)
+        return digest
+
+    def find(self, digest):
+        """
+        Returns:
+            str or None: Path of a stored image, None if missing or malformed
+        """
+        path = self.path(digest)
+        return path if path and os.path.isfile(path) else None
+
+
+qr_store = QRImageStore()
+
+
+def qr_code_url(campaign_id, customer_id):
+    """
+    Hosted image URL for a recipient's code, storing the image if needed
+
+    Only the ids ride along, as ?r={campaign_id}-{customer_id}, so a web
+    process that doesn't share the worker's disk can regenerate the code and
+    store the image on first request. The redeemable code itself never
+    appears in the URL, where access logs would collect it.
+    """
+    code = generate_token(campaign_id, customer_id)
+    digest = qr_store.put(qr_cache.get(code))
+    return f"{Config.BASE_URL}/qr/{digest}.png?r={campaign_id}-{customer_id}"
+
+
+def load_qr_image(digest, recipient=None):
+    """
+    Path of a stored QR image, rendering it from its recipient if missing
+
+    Args:
+        digest (str): SHA-256 hex digest from the URL
+        recipient (str): The URL's ?r={campaign_id}-{customer_id}; only used
+                         if that recipient's code renders to digest
+
+    Returns:
+        str or None: File path, None for unknown images and mismatched ids
+    """
+    path = qr_store.find(digest)
+    if path or not recipient or not qr_store.path(digest):
+        return path
+    match = RECIPIENT_PATTERN.match(recipient)
+    if not match:
+        return None
+    png = qr_cache.get(generate_token(int(match.group(1)), int(match.group(2))))
+    if hashlib.sha256(png).hexdigest() != digest:
+        return None
+    qr_store.put(png)
+    return qr_store.find(digest)
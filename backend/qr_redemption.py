@@ -0,0 +1,264 @@
+"""
+QR code redemption - record issued codes, validate and redeem them at the counter
+
+A scanned code passes three gates, cheapest first:
+
+1. Signature - verify_token recomputes the code's HMAC; junk, typos and
+   forgeries stop here without touching the database.
+2. Bloom filter - an in-process filter of every issued code's hash rejects
+   well-formed codes that were never sent (a test send, a deleted row).
+3. Database - one indexed lookup on qr_codes.code_hash. Redeeming is a
+   single conditional UPDATE (unexpired and under max_usage), so two
+   scanners racing on the same code can't both succeed.
+
+Codes issued by another process since the filter was loaded are picked up
+by topping it up from qr_codes (rows past the last id seen) whenever a
+correctly signed code misses it. Only signed codes reach that query, so
+junk can't drive it.
+
+CRC: crc-QRCode.md
+Spec: phase-2-campaign-management.md
+Sequence: seq-qr-validate.md
+"""
+import hashlib
+import math
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, func, or_
+from backend.database import insert_ignoring_conflicts
+from backend.models import Customer, QRCode
+from backend.qr_generator import generate_token, verify_token
+from backend.config import Config
+
+# Outcomes of check_code / redeem_code
+VALID = 'valid'
+REDEEMED = 'redeemed'
+ALREADY_REDEEMED = 'already_redeemed'
+EXPIRED = 'expired'
+UNKNOWN = 'unknown'
+
+# Rows per INSERT / per filter load query
+BATCH_SIZE = 5000
+
+# Smallest filter built, in codes; it is rebuilt at twice the size when full
+BLOOM_MIN_CAPACITY = 100000
+
+
+def code_hash(code):
+    """SHA-256 hex digest a code is stored and looked up by"""
+    return hashlib.sha256(code.encode()).hexdigest()
+
+
+def calculate_expiration(start=None):
+    """
+    Expiry for codes of a send starting at start (default now)
+
+    Returns:
+        datetime or None: None when QR_EXPIRATION_DAYS is 0 (codes never expire)
+    """
+    if not Config.QR_EXPIRATION_DAYS:
+        return None
+    return (start or datetime.now()) + timedelta(days=Config.QR_EXPIRATION_DAYS)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over hex digests (no false negatives)"""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = max(1, capacity)
+        self.size = max(64, int(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, digest):
+        # Double hashing: two 64-bit slices of the (already uniform) digest
+        h1 = int(digest[:16], 16)
+        h2 = int(digest[16:32], 16) | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, digest):
+        for position in self._positions(digest):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, digest):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(digest))
+
+
+class IssuedCodeFilter:
+    """
+    Bloom filter of every code hash in qr_codes, loaded on first use
+
+    Thread-safe; each web process keeps its own.
+    """
+
+    def __init__(self, error_rate=None):
+        self.error_rate = error_rate or Config.QR_BLOOM_ERROR_RATE
+        self._bloom = None
+        self._last_id = 0
+        self._lock = threading.Lock()
+
+    def _load_since(self, db, last_id):
+        """Add qr_codes rows with id > last_id (lock held)"""
+        while True:
+            rows = db.execute(
+                select(QRCode.id, QRCode.code_hash).where(QRCode.id > last_id).order_by(QRCode.id).limit(BATCH_SIZE)
+            ).all()
+            for row in rows:
+                self._bloom.add(row.code_hash)
+            if len(rows) < BATCH_SIZE:
+                return rows[-1].id if rows else last_id
+            last_id = rows[-1].id
+
+    def _rebuild(self, db):
+        """Size a fresh filter for the table with room to grow, and fill it (lock held)"""
+        issued = db.execute(select(func.count(QRCode.id))).scalar() or 0
+        self._bloom = BloomFilter(max(BLOOM_MIN_CAPACITY, issued * 2), self.error_rate)
+        self._last_id = self._load_since(db, 0)
+
+    def refresh(self, db):
+        """Pick up codes issued since the last load, rebuilding if the filter is full"""
+        with self._lock:
+            if self._bloom is None or self._bloom.count >= self._bloom.capacity:
+                self._rebuild(db)
+            else:
+                self._last_id = self._load_since(db, self._last_id)
+
+    def add(self, digests):
+        """Record codes this process just issued"""
+        with self._lock:
+            if self._bloom is not None:
+                for digest in digests:
+                    self._bloom.add(digest)
+
+    def might_contain(self, db, digest):
+        """
+        False only if the code was never issued
+
+        A miss tops the filter up from the database once before answering,
+        so only call this for codes that passed verify_token.
+        """
+        with self._lock:
+            if self._bloom is not None and digest in self._bloom:
+                return True
+        self.refresh(db)
+        with self._lock:
+            return digest in self._bloom
+
+    def reset(self):
+        with self._lock:
+            self._bloom = None
+            self._last_id = 0
+
+
+issued_codes = IssuedCodeFilter()
+
+
+def issue_codes(db, campaign_id, customer_ids, expires_at=None):
+    """
+    Record the codes of a campaign's recipients (callers commit)
+
+    Codes already issued to a customer for the campaign are left as they
+    are, so a retry or resend keeps the original expiry and usage.
+
+    Args:
+        db: Database session
+        campaign_id (int): Campaign id
+        customer_ids: Iterable of customer ids
+        expires_at (datetime): Expiry for new codes (see calculate_expiration)
+    """
+    rows = [{
+        'campaign_id': campaign_id,
+        'customer_id': customer_id,
+        'code_hash': code_hash(generate_token(campaign_id, customer_id)),
+        'expires_at': expires_at
+    } for customer_id in dict.fromkeys(customer_ids)]
+    if not rows:
+        return
+    statement = insert_ignoring_conflicts(db, QRCode.__table__)
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.execute(statement, rows[start:start + BATCH_SIZE])
+    issued_codes.add(row['code_hash'] for row in rows)
+
+
+def screen_code(db, code):
+    """
+    Run a scanned code through the signature and Bloom filter gates
+
+    Returns:
+        str or None: The code's hash, None if the code is certainly unknown
+    """
+    parsed = verify_token(code)
+    if parsed is None:
+        return None
+    digest = code_hash(generate_token(*parsed))  # Canonical form of what was scanned or typed
+    if not issued_codes.might_contain(db, digest):
+        return None
+    return digest
+
+
+def classify(qr_code, now=None):
+    """Status of a stored code without redeeming it (None = not in qr_codes)"""
+    if qr_code is None:
+        return UNKNOWN
+    if not qr_code.can_redeem():
+        return ALREADY_REDEEMED
+    if qr_code.is_expired(now):
+        return EXPIRED
+    return VALID
+
+
+def _result(db, status, qr_code):
+    """Response for a screened code, with the customer's name for the staff member"""
+    result = {'status': status}
+    if qr_code is not None:
+        result.update(qr_code.to_dict())
+        result['customer_name'] = db.execute(select(Customer.name).where(Customer.id == qr_code.customer_id)).scalar()
+    return result
+
+
+def check_code(db, code, now=None):
+    """
+    Validate a code without redeeming it
+
+    Returns:
+        dict: status (valid, already_redeemed, expired or unknown), plus the
+              code's campaign, customer and usage when it is known
+    """
+    digest = screen_code(db, code)
+    if digest is None:
+        return {'status': UNKNOWN}
+    qr_code = db.query(QRCode).filter(QRCode.code_hash == digest).first()
+    return _result(db, classify(qr_code, now), qr_code)
+
+
+def redeem_code(db, code, now=None):
+    """
+    Redeem a code in one atomic UPDATE and commit
+
+    The UPDATE only matches an unexpired code with redemptions left, so
+    concurrent redemptions of a single-use code let exactly one through.
+
+    Returns:
+        dict: status (redeemed, already_redeemed, expired or unknown), plus
+              the code's campaign, customer and usage when it is known
+    """
+    digest = screen_code(db, code)
+    if digest is None:
+        return {'status': UNKNOWN}
+    now = now or datetime.now()
+
+    statement = update(QRCode).where(
+        QRCode.code_hash == digest,
+        QRCode.usage_count < QRCode.max_usage,
+        or_(QRCode.expires_at.is_(None), QRCode.expires_at > now)
+    ).values(
+        usage_count=QRCode.usage_count + 1,
+        redeemed_at=func.coalesce(QRCode.redeemed_at, now)
+    )
+    redeemed = db.execute(statement).rowcount == 1
+    db.commit()
+
+    qr_code = db.query(QRCode).filter(QRCode.code_hash == digest).first()
+    return _result(db, REDEEMED if redeemed else classify(qr_code, now), qr_code)
@@ -0,0 +1,375 @@
+"""
+Shared token-bucket rate limiting for provider sends
+
+Bucket state lives in the rate_limit_buckets table, so every send worker,
+worker.py process and gunicorn worker draws from the same budget instead
+of each pacing itself as if it were alone. There are buckets per channel
+(EMAIL_RATE_LIMIT, SMS_RATE_LIMIT - the provider quotas), per campaign
+(EMAIL_CAMPAIGN_RATE_LIMIT, SMS_CAMPAIGN_RATE_LIMIT) and per SMS sender
+number (TWILIO_MPS_PER_NUMBER). Each bucket also keeps a sliding one-minute
+send count, which is what the velocity readings report.
+
+CRC: crc-RateLimiter.md
+Spec: phase-2-campaign-management.md
+Sequence: seq-email-process.md, seq-sms-process.md
+"""
+import random
+import time
+from contextlib import contextmanager
+from sqlalchemy.exc import IntegrityError, OperationalError
+from backend.database import SessionLocal
+from backend.models import RateLimitBucket
+from backend.config import Config
+
+# Velocity is reported per minute from a sliding window this long
+VELOCITY_WINDOW_SECONDS = 60
+
+# Compare-and-swap retries before a reservation gives up
+MAX_RESERVE_ATTEMPTS = 50
+
+# Retries of a reservation that hit a locked database (SQLite's "database is
+# locked" under many writers), backing off exponentially from the base delay
+MAX_LOCKED_ATTEMPTS = 8
+LOCKED_BACKOFF_SECONDS = 0.05
+
+# wait_until() calls its on_wait hook at least this often while sleeping
+WAIT_HOOK_SECONDS = 5.0
+
+
+class TokenBucket:
+    """
+    One token bucket shared through the database
+
+    Tokens refill continuously at per_minute / 60 a second, up to
+    RATE_LIMIT_BURST_SECONDS worth. Senders reserve tokens rather than
+    polling for them: a reservation may overdraw the bucket and the caller
+    sleeps off its share of the deficit. Every reservation is a single
+    compare-and-swap, so concurrent senders in any number of processes
+    queue up behind each other and together run at the limit - never
+    above it, and never slower because they are waiting on each other.
+
+    A per_minute of 0 means no limit; sends are still counted for velocity.
+    """
+
+    def __init__(self, key, per_minute, burst_seconds=None):
+        self.key = key
+        self.per_minute = per_minute if per_minute and per_minute > 0 else 0
+        self.rate = self.per_minute / 60.0
+        burst = Config.RATE_LIMIT_BURST_SECONDS if burst_seconds is None else burst_seconds
+        self.capacity = max(1.0, self.rate * burst)
+
+    def reserve(self, count=1, db=None):
+        """
+        Claim tokens for `count` messages sent together (e.g. one API request)
+
+        Args:
+            count (int): Messages in the request
+            db: Optional limiter session to reuse (see reserve_each)
+
+        Returns:
+            float: time.monotonic() value at which the send may start
+        """
+        slots = self.reserve_each(count, db)
+        return slots[-1] if slots else 0.0
+
+    def reserve_each(self, count, db=None):
+        """
+        Claim tokens for `count` messages sent one after another
+
+        All tokens are taken in one database round trip; the start slots
+        are then spread locally, one token's worth of refill apart once
+        the bucket runs dry.
+
+        Args:
+            count (int): Messages to reserve
+            db: Optional session to reuse across reservations. It is
+                committed and rolled back here, so it must be one the
+                limiter owns (see limiter_session), not a caller's.
+
+        Returns:
+            list[float]: time.monotonic() start slot for each message, ascending
+        """
+        if count <= 0:
+            return []
+        available = self._take(count, db)
+        now = time.monotonic()
+        if not self.rate:
+            return [now] * count
+        return [now + max(0.0, (i + 1 - available) / self.rate) for i in range(count)]
+
+    def wait(self, count=1, on_wait=None):
+        """Block until `count` more messages may start without exceeding the limit"""
+        wait_until(self.reserve(count), on_wait)
+
+    def _take(self, count, db=None):
+        """
+        Atomically remove `count` tokens and record them in the velocity window
+
+        A locked database is rolled back and retried with jittered
+        exponential backoff rather than failing the send.
+
+        Returns:
+            float: Tokens that were available before this reservation (may be negative)
+        """
+        own_session = db is None
+        db = SessionLocal() if own_session else db
+        locked = 0
+        try:
+            for _ in range(MAX_RESERVE_ATTEMPTS):
+                try:
+                    available = self._try_take(db, count)
+                except OperationalError:
+                    db.rollback()
+                    locked += 1
+                    if locked >= MAX_LOCKED_ATTEMPTS:
+                        raise
+                    time.sleep(LOCKED_BACKOFF_SECONDS * 2 ** (locked - 1) * random.uniform(0.5, 1.5))
+                    continue
+                if available is not None:
+                    return available
+
+            raise RuntimeError(f"Rate limit bucket '{self.key}' is too contended to reserve")
+        finally:
+            if own_session:
+                db.close()
+
+    def _try_take(self, db, count):
+        """
+        One compare-and-swap attempt at taking `count` tokens
+
+        Returns:
+            float or None: Tokens available before the reservation, or None
+                if another process got there first
+        """
+        now = time.time()
+        bucket = db.query(RateLimitBucket).filter_by(key=self.key).first()
+
+        if bucket is None:
+            db.add(RateLimitBucket(
+                key=self.key,
+                limit_per_minute=self.per_minute,
+                capacity=self.capacity,
+                tokens=self.capacity - count,
+                updated_at=now,
+                window_start=now,
+                window_count=count,
+                previous_count=0,
+                version=1
+            ))
+            try:
+                db.commit()
+                return self.capacity
+            except IntegrityError:
+                # Another process created it first - go through the update path
+                db.rollback()
+                return None
+
+        elapsed = max(0.0, now - bucket.updated_at)
+        available = min(self.capacity, bucket.tokens + elapsed * self.rate) if self.rate else self.capacity
+        window_start, window_count, previous_count = roll_window(bucket, now)
+
+        updated = db.query(RateLimitBucket).filter(
+            RateLimitBucket.key == self.key,
+            RateLimitBucket.version == bucket.version
+        ).update({
+            'limit_per_minute': self.per_minute,
+            'capacity': self.capacity,
+            'tokens': available - count,
+            'updated_at': max(now, bucket.updated_at),
+            'window_start': window_start,
+            'window_count': window_count + count,
+            'previous_count': previous_count,
+            'version': bucket.version + 1
+        }, synchronize_session=False)
+        db.commit()
+        if updated:
+            return available
+        db.expire_all()
+        return None
+
+
+def roll_window(bucket, now):
+    """
+    Advance a bucket's velocity window to `now`
+
+    Returns:
+        tuple: (window_start, window_count, previous_count) as of now
+    """
+    window_start = bucket.window_start if bucket.window_start is not None else now
+    window_count = bucket.window_count or 0
+    previous_count = bucket.previous_count or 0
+
+    windows_passed = int((now - window_start) // VELOCITY_WINDOW_SECONDS)
+    if windows_passed >= 2:
+        return window_start + windows_passed * VELOCITY_WINDOW_SECONDS, 0, 0
+    if windows_passed == 1:
+        return window_start + VELOCITY_WINDOW_SECONDS, 0, window_count
+    return window_start, window_count, previous_count
+
+
+def bucket_velocity(bucket, now=None):
+    """
+    Sends per minute over the last VELOCITY_WINDOW_SECONDS
+
+    The previous window's count is weighted by how much of it still
+    overlaps the sliding window.
+
+    Returns:
+        float: Messages per minute
+    """
+    now = time.time() if now is None else now
+    window_start, window_count, previous_count = roll_window(bucket, now)
+    overlap = 1.0 - min(1.0, (now - window_start) / VELOCITY_WINDOW_SECONDS)
+    return (previous_count * overlap + window_count) * 60.0 / VELOCITY_WINDOW_SECONDS
+
+
+def channel_key(channel):
+    return channel
+
+
+def campaign_key(channel, campaign_id):
+    return f"{channel}:campaign:{campaign_id}"
+
+
+def sender_key(from_number):
+    return f"sms:sender:{from_number}"
+
+
+def channel_bucket(channel, per_minute=None):
+    """Provider-wide bucket for 'email' (EMAIL_RATE_LIMIT) or 'sms' (SMS_RATE_LIMIT)"""
+    if per_minute is None:
+        per_minute = Config.SMS_RATE_LIMIT if channel == 'sms' else Config.EMAIL_RATE_LIMIT
+    return TokenBucket(channel_key(channel), per_minute)
+
+
+def campaign_bucket(channel, campaign_id):
+    """Per-campaign bucket (EMAIL_CAMPAIGN_RATE_LIMIT / SMS_CAMPAIGN_RATE_LIMIT)"""
+    per_minute = Config.SMS_CAMPAIGN_RATE_LIMIT if channel == 'sms' else Config.EMAIL_CAMPAIGN_RATE_LIMIT
+    return TokenBucket(campaign_key(channel, campaign_id), per_minute)
+
+
+def sender_bucket(from_number, mps=None):
+    """
+    Per-number SMS bucket
+
+    Carriers enforce messages-per-second per number, so there is no burst
+    allowance: one token at a time.
+    """
+    mps = Config.TWILIO_MPS_PER_NUMBER if mps is None else mps
+    return TokenBucket(sender_key(from_number), mps * 60, burst_seconds=0)
+
+
+@contextmanager
+def limiter_session():
+    """A session the limiter owns, shared by several reservations"""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def reserve_slots(buckets, count, db=None):
+    """
+    Reserve `count` sequential sends against every bucket
+
+    All buckets are reserved through one session (db, or a new limiter
+    session for this call).
+
+    Returns:
+        list[float]: Per-message start slot - the latest any bucket allows
+    """
+    if db is None:
+        with limiter_session() as db:
+            return reserve_slots(buckets, count, db)
+    slots = [0.0] * count
+    for bucket in buckets:
+        slots = [max(a, b) for a, b in zip(slots, bucket.reserve_each(count, db))]
+    return slots
+
+
+def wait_if_needed(channel, campaign_id=None, count=1, on_wait=None):
+    """
+    Block until `count` messages may go out on a channel (and campaign)
+
+    Args:
+        channel (str): 'email' or 'sms'
+        campaign_id (int): Also draw from the campaign's bucket
+        count (int): Messages about to be sent together
+        on_wait: Called periodically while blocked (see wait_until)
+    """
+    buckets = [channel_bucket(channel)]
+    if campaign_id is not None:
+        buckets.append(campaign_bucket(channel, campaign_id))
+    with limiter_session() as db:
+        slot = max(bucket.reserve(count, db) for bucket in buckets)
+    wait_until(slot, on_wait)
+
+
+def get_current_rate(channel, campaign_id=None):
+    """
+    Current send velocity for a channel, or one campaign on it
+
+    Returns:
+        float: Messages per minute over the last minute
+    """
+    key = campaign_key(channel, campaign_id) if campaign_id is not None else channel_key(channel)
+    db = SessionLocal()
+    try:
+        bucket = db.query(RateLimitBucket).filter_by(key=key).first()
+        return bucket_velocity(bucket) if bucket else 0.0
+    finally:
+        db.close()
+
+
+def get_rate_snapshot(db):
+    """
+    Velocity and headroom of every bucket, for monitoring
+
+    Returns:
+        list[dict]: key, limit_per_minute, velocity_per_minute, tokens
+    """
+    now = time.time()
+    snapshot = []
+    for bucket in db.query(RateLimitBucket).order_by(RateLimitBucket.key):
+        rate = (bucket.limit_per_minute or 0) / 60.0
+        tokens = min(bucket.capacity, bucket.tokens + max(0.0, now - bucket.updated_at) * rate) if rate else None
+        snapshot.append({
+            'key': bucket.key,
+            'limit_per_minute': bucket.limit_per_minute or 0,
+            'velocity_per_minute': round(bucket_velocity(bucket, now), 1),
+            'tokens': round(tokens, 2) if tokens is not None else None
+        })
+    return snapshot
+
+
+def reset_counters(db, campaign_id):
+    """
+    Drop a campaign's buckets once it has finished sending
+
+    Returns:
+        int: Buckets removed
+    """
+    return db.query(RateLimitBucket).filter(
+        RateLimitBucket.key.in_([campaign_key(channel, campaign_id) for channel in ('email', 'sms')])
+    ).delete(synchronize_session=False)
+
+
+def wait_until(slot, on_wait=None):
+    """
+    Sleep until a slot returned by TokenBucket.reserve()
+
+    Args:
+        slot (float): time.monotonic() value to wait for
+        on_wait: Optional callable run at least every WAIT_HOOK_SECONDS
+            while sleeping, e.g. to heartbeat a send job's lease
+    """
+    while True:
+        delay = slot - time.monotonic()
+        if delay <= 0:
+            return
+        if on_wait is None:
+            time.sleep(delay)
+            return
+        time.sleep(min(delay, WAIT_HOOK_SECONDS))
+        on_wait()
@@ -0,0 +1,122 @@
+"""
+Retry policy for failed campaign deliveries
+
+A provider failure is either retryable (rate limited, provider 5xx, network
+trouble) or permanent (rejected address, bad request, render error). A
+retryable failure puts the delivery back in the queue as 'retry' with a
+next_attempt_at set by jittered exponential backoff, until SEND_MAX_ATTEMPTS
+is reached. Nothing here sleeps: the send worker picks due retries up
+alongside pending rows, and a job left with only future retries is parked
+as 'retrying' so the worker can move on to other work.
+
+CRC: crc-EmailQueueTask.md, crc-SMSQueueTask.md
+Spec: phase-2-campaign-management.md
+Sequence: seq-email-retry.md, seq-sms-retry.md
+"""
+import random
+from datetime import timedelta
+from sqlalchemy import func
+from backend.models import CampaignDelivery
+from backend.config import Config
+
+# HTTP statuses worth another try: timeout, too early, rate limited, provider errors
+RETRYABLE_STATUS_CODES = {408, 425, 429}
+
+
+def is_retryable(result):
+    """
+    Classify a failed provider result
+
+    Dispatchers flag connection errors and timeouts with network_error;
+    failures with no HTTP status and no such flag (render errors, missing
+    content or sender) would fail the same way again.
+
+    Args:
+        result (dict): Failed result from a dispatcher
+
+    Returns:
+        bool: True if sending again may succeed
+    """
+    status_code = result.get('status_code')
+    if status_code is None:
+        return bool(result.get('network_error'))
+    return status_code in RETRYABLE_STATUS_CODES or status_code >= 500
+
+
+def backoff_delay(attempts, retry_after=None):
+    """
+    Seconds to wait before the next attempt
+
+    Exponential in the attempts made so far, capped at SEND_RETRY_MAX_SECONDS,
+    with "equal jitter" - half fixed, half random - so a burst of failures
+    does not come back as a burst of retries. A provider's Retry-After is
+    honored as a floor.
+
+    Args:
+        attempts (int): Attempts already made (1 after the first failure)
+        retry_after (float): Provider-requested wait, if any
+
+    Returns:
+        float: Delay in seconds
+    """
+    ceiling = min(Config.SEND_RETRY_MAX_SECONDS,
+                  Config.SEND_RETRY_BASE_SECONDS * 2 ** max(0, attempts - 1))
+    delay = ceiling / 2 + random.uniform(0, ceiling / 2)
+    if retry_after:
+        delay = max(delay, retry_after)
+    return delay
+
+
+def failure_outcome(attempts, result, now):
+    """
+    Decide what a failed delivery becomes: a scheduled retry or a final failure
+
+    Args:
+        attempts (int): Attempts made so far, including the one that just failed
+        result (dict): The failed provider result
+        now (datetime): Current time
+
+    Returns:
+        dict: status ('retry' or 'failed'), error and next_attempt_at for the
+              CampaignDelivery row
+    """
+    error = result.get('error', 'Unknown error')
+    attempts = attempts or 1
+
+    if not is_retryable(result):
+        return {'status': 'failed', 'error': error, 'next_attempt_at': None}
+
+    if attempts >= Config.SEND_MAX_ATTEMPTS:
+        return {
+            'status': 'failed',
+            'error': f"{error} (gave up after {attempts} attempts)",
+            'next_attempt_at': None
+        }
+
+    return {
+        'status': 'retry',
+        'error': error,
+        'next_attempt_at': now + timedelta(seconds=backoff_delay(attempts, result.get('retry_after')))
+    }
+
+
+def next_retry_at(db, job_id):
+    """Earliest scheduled retry for a job, or None when none are waiting"""
+    return db.query(func.min(CampaignDelivery.next_attempt_at)).filter(
+        CampaignDelivery.job_id == job_id,
+        CampaignDelivery.status == 'retry'
+    ).scalar()
+
+
+def parse_retry_after(value):
+    """
+    Seconds from a Retry-After header (delta-seconds form only)
+
+    Returns:
+        float or None
+    """
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        return None
+    return seconds if seconds > 0 else None
@@ -0,0 +1,177 @@
+"""
+SegmentManager - customer segment tags stored as a join table
+
+Tags live in segments, and memberships in customer_segments keyed by
+(segment_id, customer_id). Every operation is one set-based statement per
+batch of customers - adding a tag to 10,000 customers is an
+INSERT ... SELECT, not a loop over Customer rows - and finding customers
+by tag is an indexed lookup instead of a LIKE scan over comma-joined text.
+
+CRC: crc-SegmentManager.md
+Spec: phase-2-campaign-management.md
+Sequence: seq-segment-manage.md, seq-segment-filter.md
+"""
+import re
+from sqlalchemy import select, delete, func, literal
+from backend.database import insert_ignoring_conflicts
+from backend.models import Customer, Segment, CustomerSegment
+
+# Free text as the old comma-separated column allowed ("mom's club", 'café',
+# 'a&b'), minus the comma separator and control characters; 100 = column size
+SEGMENT_PATTERN = re.compile(r'^[^,\x00-\x1f\x7f]{1,100}$')
+
+# Customer ids per INSERT ... SELECT / DELETE (keeps IN lists within driver limits)
+BATCH_SIZE = 5000
+
+
+def normalize_segment(tag):
+    """Lowercase, trim and collapse inner whitespace"""
+    return ' '.join(str(tag or '').lower().split())
+
+
+def validate_segment(tag):
+    """
+    Normalize a tag and check it fits a segment name (no commas or control
+    characters, at most 100 characters)
+
+    Returns:
+        str: The normalized tag
+
+    Raises:
+        ValueError: If the tag is empty, too long or has a comma / control character
+    """
+    normalized = normalize_segment(tag)
+    if not SEGMENT_PATTERN.match(normalized):
+        raise ValueError(f"Invalid segment '{tag}': use up to 100 characters, without commas")
+    return normalized
+
+
+def parse_segment_list(comma_separated):
+    """
+    Split 'vip, Pizza-Lover,vip' into validated, de-duplicated tags
+
+    Returns:
+        list[str]: Tags in first-seen order
+    """
+    tags = []
+    for part in (comma_separated or '').split(','):
+        if part.strip():
+            tag = validate_segment(part)
+            if tag not in tags:
+                tags.append(tag)
+    return tags
+
+
+class SegmentManager:
+    """Segment operations on one database session (callers commit)"""
+
+    def __init__(self, db_session):
+        self.db = db_session
+
+    def ensure_segment(self, tag):
+        """
+        Id of a segment, creating it if needed
+
+        Returns:
+            int: segments.id
+        """
+        name = validate_segment(tag)
+        self.db.execute(insert_ignoring_conflicts(self.db, Segment.__table__).values(name=name))
+        return self.db.execute(select(Segment.id).where(Segment.name == name)).scalar_one()
+
+    def segment_ids(self, tags):
+        """Ids of existing segments among tags (unknown tags are skipped)"""
+        names = [normalize_segment(tag) for tag in tags]
+        return list(self.db.execute(select(Segment.id).where(Segment.name.in_(names))).scalars())
+
+    def get_all_segments(self):
+        """All segment names, alphabetically"""
+        return list(self.db.execute(select(Segment.name).order_by(Segment.name)).scalars())
+
+    def get_segment_counts(self):
+        """
+        Customers per segment in one grouped query
+
+        Returns:
+            list[tuple]: (name, count) alphabetically, including empty segments
+        """
+        return [tuple(row) for row in self.db.execute(
+            select(Segment.name, func.count(CustomerSegment.customer_id))
+            .outerjoin(CustomerSegment, CustomerSegment.segment_id == Segment.id)
+            .group_by(Segment.id, Segment.name)
+            .order_by(Segment.name)
+        )]
+
+    def customers_in_segments(self, tags):
+        """
+        SQL criterion: customer belongs to any of the tags
+
+        Usable in any Customer query, e.g. alongside segment_filter() when
+        selecting a send audience.
+        """
+        names = [normalize_segment(tag) for tag in tags]
+        return Customer.id.in_(
+            select(CustomerSegment.customer_id)
+            .join(Segment, Segment.id == CustomerSegment.segment_id)
+            .where(Segment.name.in_(names))
+        )
+
+    def get_customers_by_segments(self, segments):
+        """
+        Customers in any of the segments
+
+        Args:
+            segments: List of tags, or a comma-separated string
+
+        Returns:
+            Query: Customer query (add filters, order or paginate before loading)
+        """
+        tags = parse_segment_list(segments) if isinstance(segments, str) else segments
+        return self.db.query(Customer).filter(self.customers_in_segments(tags))
+
+    def bulk_add_segment(self, customer_ids, tag):
+        """
+        Tag many customers with INSERT ... SELECT, skipping ones already tagged
+
+        Ids that don't belong to a customer are ignored.
+
+        Returns:
+            int: Segment id
+        """
+        segment_id = self.ensure_segment(tag)
+        customer_ids = list(customer_ids)
+        statement = insert_ignoring_conflicts(self.db, CustomerSegment.__table__)
+        for start in range(0, len(customer_ids), BATCH_SIZE):
+            batch = customer_ids[start:start + BATCH_SIZE]
+            self.db.execute(statement.from_select(
+                ['segment_id', 'customer_id', 'created_at'],
+                select(literal(segment_id), Customer.id, func.now()).where(Customer.id.in_(batch))
+            ))
+        return segment_id
+
+    def bulk_remove_segment(self, customer_ids, tag):
+        """
+        Untag many customers
+
+        Returns:
+            int: Memberships removed
+        """
+        segment_ids = self.segment_ids([tag])
+        if not segment_ids:
+            return 0
+        customer_ids = list(customer_ids)
+        removed = 0
+        for start in range(0, len(customer_ids), BATCH_SIZE):
+            removed += self.db.execute(delete(CustomerSegment).where(
+                CustomerSegment.segment_id == segment_ids[0],
+                CustomerSegment.customer_id.in_(customer_ids[start:start + BATCH_SIZE])
+            )).rowcount
+        return removed
+
+    def add_segment_to_customer(self, customer_id, tag):
+        """Tag one customer (no-op if already tagged)"""
+        return self.bulk_add_segment([customer_id], tag)
+
+    def remove_segment_from_customer(self, customer_id, tag):
+        """Untag one customer"""
+        return self.bulk_remove_segment([customer_id], tag) > 0
@@ -0,0 +1,1006 @@
+"""
+Background campaign sending backed by a database work queue
+
+The send route only enqueues: it creates a SendJob and one CampaignDelivery
+row per recipient, then returns. A separate worker process (worker.py)
+claims queued jobs and drains their delivery rows in checkpointed batches.
+No external broker is needed - SQLite or Postgres holds all queue state.
+
+CRC: crc-EmailQueueTask.md, crc-SMSQueueTask.md, crc-CeleryApp.md
+Spec: phase-2-campaign-management.md
+Sequence: seq-campaign-send.md, seq-email-process.md, seq-email-retry.md, seq-sms-retry.md
+"""
+import os
+import socket
+import threading
+import time
+import multiprocessing
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, literal, func, case, or_, and_
+from backend.database import SessionLocal
+from backend.encryption import decrypt_field, decryption_memo, current_decryption_memo, prefetch_decryption
+from backend.models import Customer, Campaign, SendJob, SendPartition, CampaignDelivery
+from backend.email_service import get_dispatcher, CampaignRenderer, build_substitutions
+from backend.sms_service import get_sms_dispatcher, build_sms_body
+from backend.rate_limiter import reset_counters
+from backend.retry_scheduler import failure_outcome, next_retry_at, backoff_delay
+from backend.qr_redemption import issue_codes, calculate_expiration
+from backend.config import Config
+from backend import import_worker
+
+INTERRUPTED_ERROR = 'Interrupted mid-send; not retried to avoid a duplicate message'
+
+# Partitions planned per send process
+PARTITIONS_PER_PROCESS = 4
+
+# Lease renewals while a batch waits on the rate limiter, per lease period
+HEARTBEATS_PER_LEASE = 10
+
+
+class LeaseLost(Exception):
+    """Another worker took over the job; stop without writing to it"""
+
+
+class SendLease:
+    """
+    A worker's hold on a job, and on a partition of it
+
+    Every checkpoint renews the lease before writing anything else, with an
+    UPDATE fenced on the job still being running under this worker. That
+    row write also locks the job against a concurrent takeover until the
+    checkpoint commits, so a worker that lost its lease can never claim or
+    record deliveries the new holder now owns.
+
+    A partition process holds the job through its parent's lease, plus its
+    partition (fenced on the partition's worker, which release_partitions
+    clears). It also checks its parent is still alive: daemon processes are
+    not stopped when the parent is SIGKILLed, and would otherwise keep
+    heartbeating a job nobody is finishing.
+    """
+
+    def __init__(self, job_id, worker_id, partition=None, parent_pid=None):
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.partition_id = partition.id if partition is not None else None
+        self.partition_worker = partition.worker_id if partition is not None else None
+        self.parent_pid = parent_pid
+
+    def renew(self, db, now=None, partition_counts=None, require_parent=True, **counts):
+        """
+        Heartbeat the job (and partition), adding any counters, if this
+        worker still holds them
+
+        Args:
+            require_parent (bool): Also stop if the parent process died. Off
+                when recording a batch that already went out, which only
+                needs the fences to hold.
+
+        Raises:
+            LeaseLost: If the job or partition was taken over, or the parent
+                process died (the transaction is rolled back)
+        """
+        if require_parent and self.parent_pid is not None and os.getppid() != self.parent_pid:
+            db.rollback()
+            raise LeaseLost(f"Send job {self.job_id}: worker process {self.parent_pid} is gone")
+
+        now = now or datetime.now()
+        held = add_counts(db, SendJob, self.job_id, SendJob.worker_id == self.worker_id,
+                          SendJob.status == 'running', heartbeat_at=now, **counts)
+        if held and self.partition_id:
+            held = add_counts(db, SendPartition, self.partition_id, SendPartition.worker_id == self.partition_worker,
+                              SendPartition.status == 'running', heartbeat_at=now, **(partition_counts or {}))
+        if not held:
+            db.rollback()
+            raise LeaseLost(f"Send job {self.job_id} is no longer held by {self.worker_id}")
+
+
+class LeaseHeartbeat:
+    """
+    on_wait hook (rate_limiter.wait_until) that keeps a lease alive while a
+    batch waits for rate slots
+
+    Dispatcher threads call it concurrently, so renewals are serialized and
+    throttled to one per lease period / HEARTBEATS_PER_LEASE, each on its
+    own short-lived session. A lost lease raises LeaseLost in the waiting
+    thread, so the rest of the batch is never sent.
+    """
+
+    def __init__(self, lease):
+        self.lease = lease
+        self.interval = max(1.0, Config.SEND_JOB_LEASE_SECONDS / HEARTBEATS_PER_LEASE)
+        self._next_at = time.monotonic() + self.interval
+        self._lost = None
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            if self._lost:
+                raise self._lost
+            if time.monotonic() < self._next_at:
+                return
+            db = SessionLocal()
+            try:
+                self.lease.renew(db)
+                db.commit()
+            except LeaseLost as e:
+                self._lost = e  # Every other waiting send stops too
+                raise
+            finally:
+                db.close()
+            self._next_at = time.monotonic() + self.interval
+
+
+class Recipient:
+    """
+    The customer columns a send needs, read straight from the batch query
+
+    Stands in for Customer wherever a delivery is rendered or sent, without
+    an ORM object or identity-map entry per recipient. Email and phone are
+    decrypted on access through the job's decryption memo, so a batch only
+    pays for the field its channel uses, once per recipient, and skipped
+    recipients are never decrypted at all.
+    """
+    __slots__ = ('id', 'name', 'subscribed', 'sms_subscribed', '_email_encrypted', '_phone_encrypted')
+
+    # Batch query columns, labelled so they can't clash with CampaignDelivery's
+    COLUMNS = (
+        Customer.id.label('recipient_id'),
+        Customer.name.label('recipient_name'),
+        Customer.subscribed.label('recipient_subscribed'),
+        Customer.sms_subscribed.label('recipient_sms_subscribed'),
+        Customer._email_encrypted.label('recipient_email'),
+        Customer._phone_encrypted.label('recipient_phone')
+    )
+
+    def __init__(self, row):
+        self.id = row.recipient_id
+        self.name = row.recipient_name
+        self.subscribed = row.recipient_subscribed
+        self.sms_subscribed = row.recipient_sms_subscribed
+        self._email_encrypted = row.recipient_email
+        self._phone_encrypted = row.recipient_phone
+
+    @property
+    def email(self):
+        return decrypt_field(self._email_encrypted)
+
+    @property
+    def phone(self):
+        return decrypt_field(self._phone_encrypted)
+
+    # Same tokens as the Customer row would produce
+    get_unsubscribe_token = Customer.get_unsubscribe_token
+    get_sms_optout_token = Customer.get_sms_optout_token
+
+
+def get_worker_id():
+    """Identify this worker process in job leases"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def segment_filter(segment):
+    """
+    Return filter criteria for an audience segment
+
+    Args:
+        segment (str): 'all', 'email_only', 'sms_only' or 'both'
+
+    Returns:
+        dict: Keyword filters for Customer
+    """
+    if segment == 'email_only':
+        return {'subscribed': True, 'sms_subscribed': False}
+    elif segment == 'sms_only':
+        return {'sms_subscribed': True, 'subscribed': False}
+    elif segment == 'both':
+        return {'subscribed': True, 'sms_subscribed': True}
+    return {'subscribed': True}
+
+
+def segment_channels(segment):
+    """
+    Channels a live send to a segment goes out on
+
+    Args:
+        segment (str): 'all', 'email_only', 'sms_only' or 'both'
+
+    Returns:
+        list[str]: 'email' and/or 'sms'
+    """
+    if segment == 'sms_only':
+        return ['sms']
+    elif segment == 'both':
+        return ['email', 'sms']
+    return ['email']
+
+
+def get_active_job(db, campaign_id):
+    """Return the queued, running or retrying job for a campaign, if any"""
+    return db.query(SendJob).filter(
+        SendJob.campaign_id == campaign_id,
+        SendJob.status.in_(SendJob.ACTIVE_STATUSES)
+    ).first()
+
+
+def enqueue_campaign_send(db, campaign, segment='all', channel='email'):
+    """
+    Queue a campaign for background sending
+
+    Recipient rows are written with a single INSERT ... SELECT so enqueueing
+    stays fast regardless of list size and never loads customers into Python.
+
+    Args:
+        db: Database session
+        campaign (Campaign): Campaign to send
+        segment (str): Audience segment
+        channel (str): 'email' or 'sms'
+
+    Returns:
+        SendJob: The committed job
+    """
+    job = SendJob(campaign_id=campaign.id, channel=channel, segment=segment, status='queued')
+    db.add(job)
+    db.flush()
+
+    criteria = [getattr(Customer, column) == value for column, value in segment_filter(segment).items()]
+    if channel == 'sms':
+        criteria += [Customer.sms_subscribed == True, Customer._phone_encrypted.isnot(None)]
+    # Sending a campaign again only reaches customers it hasn't reached yet
+    criteria.append(Customer.id.notin_(select(CampaignDelivery.customer_id).where(
+        CampaignDelivery.campaign_id == campaign.id,
+        CampaignDelivery.channel == channel,
+        CampaignDelivery.status == 'sent'
+    )))
+    recipients = select(
+        literal(job.id),
+        literal(campaign.id),
+        Customer.id,
+        literal(channel),
+        literal('pending'),
+        literal(0)
+    ).where(*criteria)
+
+    result = db.execute(
+        CampaignDelivery.__table__.insert().from_select(
+            ['job_id', 'campaign_id', 'customer_id', 'channel', 'status', 'attempts'],
+            recipients
+        )
+    )
+
+    job.total_count = result.rowcount if result.rowcount and result.rowcount > 0 else \
+        db.query(CampaignDelivery).filter_by(job_id=job.id).count()
+    campaign.status = 'sending'
+    db.commit()
+    return job
+
+
+def claim_next_job(db, worker_id):
+    """
+    Claim a queued job, a retrying job whose backoff has passed, or take
+    over a running job whose worker went silent
+
+    The claim is a conditional UPDATE, so two workers racing for the same
+    job cannot both win.
+
+    Returns:
+        SendJob or None
+    """
+    now = datetime.now()
+    stale_before = now - timedelta(seconds=Config.SEND_JOB_LEASE_SECONDS)
+    claimable = or_(
+        SendJob.status == 'queued',
+        and_(SendJob.status == 'retrying', SendJob.next_attempt_at <= now),
+        and_(SendJob.status == 'running', SendJob.heartbeat_at < stale_before)
+    )
+
+    candidates = db.query(SendJob.id).filter(claimable).order_by(SendJob.id).limit(5).all()
+    for (job_id,) in candidates:
+        claimed = db.query(SendJob).filter(SendJob.id == job_id, claimable).update(
+            {'status': 'running', 'worker_id': worker_id, 'heartbeat_at': now},
+            synchronize_session=False
+        )
+        db.commit()
+        if claimed:
+            job = db.query(SendJob).filter_by(id=job_id).first()
+            recover_interrupted(db, job)
+            return job
+
+    return None
+
+
+def recover_interrupted(db, job):
+    """
+    Close out rows a crashed worker left in 'sending'
+
+    Those rows may or may not have reached the provider, so they are failed
+    rather than re-sent - a restart must never produce duplicate messages.
+    """
+    interrupted = db.query(CampaignDelivery).filter_by(job_id=job.id, status='sending').update(
+        {'status': 'failed', 'error': INTERRUPTED_ERROR},
+        synchronize_session=False
+    )
+    if interrupted:
+        add_counts(db, SendJob, job.id, failed_count=interrupted)
+    if not job.started_at:
+        job.started_at = datetime.now()
+    db.commit()
+    return interrupted
+
+
+def send_deliveries(campaign, pairs, renderer=None, on_wait=None):
+    """
+    Send a batch of queued messages through the pooled dispatchers
+
+    Args:
+        campaign (Campaign): Campaign being sent
+        pairs: List of (delivery, customer) - customer is a Recipient or Customer
+        renderer (CampaignRenderer): Reused across batches of one send
+        on_wait: Called periodically while sends wait on the rate limiter
+
+    Returns:
+        list[dict]: Provider results in the same order as pairs
+    """
+    results = [None] * len(pairs)
+    by_channel = {}
+    for i, (delivery, customer) in enumerate(pairs):
+        by_channel.setdefault(delivery.channel, []).append(i)
+
+    for channel, slots in by_channel.items():
+        channel_pairs = [pairs[i] for i in slots]
+        if channel == 'email':
+            sent = send_email_deliveries(campaign, channel_pairs, renderer, on_wait)
+        elif channel == 'sms':
+            sent = send_sms_deliveries(campaign, channel_pairs, on_wait)
+        else:
+            sent = [{'success': False, 'error': f'Unsupported channel: {channel}'} for _ in slots]
+        for i, result in zip(slots, sent):
+            results[i] = result
+
+    return results
+
+
+def send_email_deliveries(campaign, pairs, renderer=None, on_wait=None):
+    """
+    Send a batch of campaign emails
+
+    In 'batch' mode (EMAIL_SEND_MODE) the campaign is rendered once and sent
+    as SendGrid personalizations, up to 1000 recipients per API call.
+    In 'individual' mode each recipient gets their own request, with HTML
+    filled in from the campaign's pre-rendered skeleton.
+    QR campaigns render the batch's codes up front across the QR pool.
+    Either way the HTTP calls run concurrently inside the dispatcher,
+    bounded by EMAIL_SEND_CONCURRENCY and the shared email and campaign
+    rate buckets.
+
+    Returns:
+        list[dict]: Provider results in the same order as pairs
+    """
+    results = [None] * len(pairs)
+    emails = []
+    email_slots = []
+    batch_mode = Config.EMAIL_SEND_MODE == 'batch'
+
+    if not pairs:
+        return results
+
+    try:
+        renderer = renderer or CampaignRenderer(campaign)
+        renderer.prepare([customer for _, customer in pairs])
+        if batch_mode:
+            # Render once with substitution tags; SendGrid fills in each recipient
+            shared_html = renderer.render_with_tags()
+    except Exception as e:
+        return [{'success': False, 'error': f'Render failed: {e}'} for _ in pairs]
+
+    for i, (delivery, customer) in enumerate(pairs):
+        if batch_mode:
+            emails.append((customer.email, customer.name or 'Valued Customer', build_substitutions(customer, campaign)))
+            email_slots.append(i)
+            continue
+        try:
+            html = renderer.render_for_send(customer)
+        except Exception as e:
+            results[i] = {'success': False, 'error': f'Render failed: {e}'}
+            continue
+        emails.append((customer.email, customer.name or 'Valued Customer', campaign.subject, html))
+        email_slots.append(i)
+
+    if emails:
+        if batch_mode:
+            sent = get_dispatcher().send_personalized(campaign.subject, shared_html, emails,
+                                                      campaign_id=campaign.id, on_wait=on_wait)
+        else:
+            sent = get_dispatcher().send_batch(emails, images_processed=True, campaign_id=campaign.id,
+                                               on_wait=on_wait)
+        for i, result in zip(email_slots, sent):
+            results[i] = result
+
+    return results
+
+
+def send_sms_deliveries(campaign, pairs, on_wait=None):
+    """
+    Send a batch of campaign SMS through the pooled Twilio dispatcher
+
+    The body is the same for every recipient, so it is built once. The
+    dispatcher bounds concurrency (SMS_SEND_CONCURRENCY) and paces each
+    sender number to TWILIO_MPS_PER_NUMBER through the shared rate buckets.
+
+    Returns:
+        list[dict]: Provider results (with message_sid/status) in the same order as pairs
+    """
+    if not campaign.sms_content:
+        return [{'success': False, 'error': 'Campaign has no SMS content'} for _ in pairs]
+
+    body = build_sms_body(campaign.sms_content)
+    return get_sms_dispatcher().send_batch([(customer.phone, body) for _, customer in pairs],
+                                           campaign_id=campaign.id, on_wait=on_wait)
+
+
+def is_still_subscribed(customer, channel):
+    """Recipients can unsubscribe between enqueue and send"""
+    if channel == 'sms':
+        return bool(customer.sms_subscribed and customer._phone_encrypted)
+    return bool(customer.subscribed)
+
+
+def ledger_update(delivery_id, status, error=None, next_attempt_at=None,
+                  provider_message_id=None, provider_status=None, sent_at=None):
+    """
+    Parameters for one row of the batched CampaignDelivery result UPDATE
+
+    Every row carries the same keys so a whole batch goes out as a single
+    executemany statement.
+    """
+    return {
+        'id': delivery_id,
+        'status': status,
+        'error': error,
+        'next_attempt_at': next_attempt_at,
+        'provider_message_id': provider_message_id,
+        'provider_status': provider_status,
+        'sent_at': sent_at
+    }
+
+
+def add_counts(db, model, row_id, *criteria, **deltas):
+    """
+    Add to a job's or partition's counters in one UPDATE (callers commit)
+
+    The arithmetic happens in SQL rather than on values read earlier, so
+    processes draining partitions of the same job don't overwrite each
+    other's counts. Counters never drop below zero.
+
+    Args:
+        db: Database session
+        model: SendJob or SendPartition
+        row_id (int): Row to update
+        *criteria: Extra conditions the row must meet (e.g. a lease fence)
+        **deltas: Counter column -> amount to add; other columns -> new value
+
+    Returns:
+        int: Rows updated (0 if the criteria no longer hold)
+    """
+    values = {}
+    for name, delta in deltas.items():
+        if name.endswith('_count'):
+            total = func.coalesce(getattr(model, name), 0) + delta
+            values[name] = case((total < 0, 0), else_=total)
+        else:
+            values[name] = delta
+    return db.execute(update(model).where(model.id == row_id, *criteria).values(**values)).rowcount
+
+
+def job_renderer(job, campaign):
+    """Compile the template and build shared variables once for the whole send"""
+    if job.channel != 'email':
+        return None
+    try:
+        return CampaignRenderer(campaign)
+    except Exception as e:
+        # send_deliveries records the render error per recipient
+        print(f"Send job {job.id}: template render setup failed: {e}")
+        return None
+
+
+def drain_deliveries(db, job, campaign, worker_id, renderer=None, batch_size=None, partition=None,
+                     parent_pid=None):
+    """
+    Send a job's due deliveries in checkpointed batches until none are left
+
+    Each batch is marked 'sending' and committed before any provider call,
+    then results and counters are committed together. That commit is the
+    checkpoint a restarted worker resumes from. Both checkpoints write the
+    batch's CampaignDelivery rows with a single statement each, after
+    renewing the worker's lease (SendLease): only rows still pending/retry
+    are claimed and only rows still 'sending' get results, so a worker that
+    was taken over stops with LeaseLost instead of double-sending. While a
+    batch waits on the rate limiter, LeaseHeartbeat keeps the lease alive.
+
+    Args:
+        db: Database session
+        job (SendJob): Claimed job
+        campaign (Campaign): The job's campaign
+        worker_id (str): Holder of the job's lease
+        renderer (CampaignRenderer): Reused across batches (email jobs)
+        batch_size (int): Deliveries per checkpoint (default per channel and send mode)
+        partition (SendPartition): Only send this partition's customer id range
+        parent_pid (int): In a partition process, the worker process that spawned it
+
+    Raises:
+        LeaseLost: If another worker took the job or partition over
+    """
+    if not batch_size:
+        # Personalization batching wants a full request's worth per checkpoint
+        batch_size = Config.EMAIL_PERSONALIZATIONS_PER_REQUEST \
+            if job.channel == 'email' and Config.EMAIL_SEND_MODE == 'batch' else Config.SEND_BATCH_SIZE
+
+    # Read once: job attributes expire at every commit
+    job_id, channel = job.id, job.channel
+    qr_expires_at = calculate_expiration(job.started_at)
+    lease = SendLease(job_id, worker_id, partition, parent_pid)
+    heartbeat = LeaseHeartbeat(lease)
+    criteria = [CampaignDelivery.job_id == job_id]
+    if partition is not None:
+        criteria.append(CampaignDelivery.customer_id.between(partition.min_customer_id, partition.max_customer_id))
+
+    while True:
+        due = or_(
+            CampaignDelivery.status == 'pending',
+            and_(CampaignDelivery.status == 'retry', CampaignDelivery.next_attempt_at <= datetime.now())
+        )
+        # One query for the batch and its recipients, as plain rows rather than
+        # ORM objects: nothing to track or refresh after each commit
+        batch = db.query(
+            CampaignDelivery.id, CampaignDelivery.customer_id, CampaignDelivery.channel,
+            CampaignDelivery.status, CampaignDelivery.attempts, *Recipient.COLUMNS
+        ).outerjoin(
+            Customer, Customer.id == CampaignDelivery.customer_id
+        ).filter(*criteria, due).order_by(CampaignDelivery.id).limit(batch_size).all()
+
+        if not batch:
+            break
+
+        # Checkpoint 1: claim the batch in one UPDATE, skipping any row that
+        # stopped being due since it was read
+        now = datetime.now()
+        lease.renew(db, now)
+        claimed = claim_deliveries(db, [row.id for row in batch], now)
+        batch = [row for row in batch if row.id in claimed]
+        add_counts(db, SendJob, job_id, retrying_count=-sum(1 for row in batch if row.status == 'retry'))
+        db.commit()
+
+        counts = {'sent_count': 0, 'failed_count': 0, 'skipped_count': 0, 'retrying_count': 0}
+        updates = []
+        to_send = []
+        for row in batch:
+            customer = Recipient(row) if row.recipient_id is not None else None
+            if customer is None or not is_still_subscribed(customer, row.channel):
+                updates.append(ledger_update(row.id, 'skipped'))
+                counts['skipped_count'] += 1
+                continue
+            to_send.append((row, customer))
+
+        # Record the batch's QR codes before any provider call, so every code
+        # that goes out can be redeemed
+        if channel == 'email' and campaign.has_qr_code and to_send:
+            issue_codes(db, campaign.id, [customer.id for _, customer in to_send], qr_expires_at)
+            db.commit()
+
+        # Decrypt the batch's addresses in one call; renders and sends then
+        # read them from the memo. Cleared per batch to keep memory flat.
+        memo = current_decryption_memo()
+        if memo is not None:
+            memo.clear()
+        prefetch_decryption([customer._phone_encrypted if row.channel == 'sms' else customer._email_encrypted
+                             for row, customer in to_send], Config.DECRYPT_PROCESSES)
+
+        results = send_deliveries(campaign, to_send, renderer, heartbeat)
+
+        now = datetime.now()
+        for (row, customer), result in zip(to_send, results):
+            if result.get('success'):
+                updates.append(ledger_update(
+                    row.id, 'sent',
+                    provider_message_id=result.get('message_sid') or result.get('message_id'),
+                    provider_status=result.get('status'),
+                    sent_at=now
+                ))
+                counts['sent_count'] += 1
+                continue
+
+            outcome = failure_outcome((row.attempts or 0) + 1, result, now)
+            updates.append(ledger_update(row.id, **outcome))
+            counts['retrying_count' if outcome['status'] == 'retry' else 'failed_count'] += 1
+
+        # Checkpoint 2: record results - one executemany UPDATE for the batch
+        partition_counts = {name: value for name, value in counts.items() if name != 'retrying_count'}
+        lease.renew(db, datetime.now(), partition_counts, require_parent=False, **counts)
+        if updates:
+            db.execute(update(CampaignDelivery).where(CampaignDelivery.status == 'sending'), updates,
+                       execution_options={'synchronize_session': None})
+        db.commit()
+
+
+def claim_deliveries(db, delivery_ids, now):
+    """
+    Mark deliveries 'sending', only those still pending or due for retry
+
+    Returns:
+        set[int]: Ids actually claimed
+    """
+    statement = update(CampaignDelivery).where(
+        CampaignDelivery.id.in_(delivery_ids),
+        CampaignDelivery.status.in_(('pending', 'retry'))
+    ).values(
+        status='sending',
+        attempts=func.coalesce(CampaignDelivery.attempts, 0) + 1,
+        next_attempt_at=None,
+        last_attempt_at=now
+    ).execution_options(synchronize_session=False)
+
+    if db.get_bind().dialect.update_returning:
+        return set(db.execute(statement.returning(CampaignDelivery.id)).scalars())
+    # No RETURNING: the lease makes this worker the only writer of the job's rows
+    db.execute(statement)
+    return set(id_ for (id_,) in db.query(CampaignDelivery.id).filter(
+        CampaignDelivery.id.in_(delivery_ids), CampaignDelivery.status == 'sending',
+        CampaignDelivery.last_attempt_at == now))
+
+
+def plan_partitions(db, job, count):
+    """
+    Split a job's deliveries into disjoint customer id ranges
+
+    Boundaries are read from the (job_id, customer_id) index at evenly
+    spaced offsets, so each range holds about the same number of
+    deliveries. A job that already has partitions keeps them.
+
+    Args:
+        db: Database session
+        job (SendJob): Job to split
+        count (int): Partitions wanted
+
+    Returns:
+        list[SendPartition]: In customer id order
+    """
+    existing = db.query(SendPartition).filter_by(job_id=job.id).order_by(SendPartition.position).all()
+    if existing:
+        return existing
+
+    customer_ids = db.query(CampaignDelivery.customer_id).filter(
+        CampaignDelivery.job_id == job.id).order_by(CampaignDelivery.customer_id)
+    total = customer_ids.count()
+    count = max(1, min(count, total))
+    starts = [total * i // count for i in range(count + 1)]
+    lows = [customer_ids.offset(start).limit(1).scalar() for start in starts[:-1]]
+    highest = db.query(func.max(CampaignDelivery.customer_id)).filter(CampaignDelivery.job_id == job.id).scalar()
+
+    partitions = [SendPartition(
+        job_id=job.id,
+        position=i,
+        min_customer_id=low,
+        max_customer_id=lows[i + 1] - 1 if i + 1 < count else highest,
+        status='pending',
+        total_count=starts[i + 1] - starts[i]
+    ) for i, low in enumerate(lows)]
+    db.add_all(partitions)
+    db.commit()
+    return partitions
+
+
+def claim_partition(db, lease, worker_id):
+    """
+    Claim a job's next pending partition with a conditional UPDATE, in the
+    same transaction as a renewal of the job's lease
+
+    Args:
+        db: Database session
+        lease (SendLease): The job's lease
+        worker_id (str): Process claiming the partition
+
+    Returns:
+        SendPartition or None: None once every partition is taken
+
+    Raises:
+        LeaseLost: If another worker took the job over
+    """
+    candidates = db.query(SendPartition.id).filter_by(job_id=lease.job_id, status='pending') \
+        .order_by(SendPartition.position).limit(5).all()
+    for (partition_id,) in candidates:
+        lease.renew(db)
+        claimed = db.query(SendPartition).filter_by(id=partition_id, status='pending').update(
+            {'status': 'running', 'worker_id': worker_id, 'heartbeat_at': datetime.now()},
+            synchronize_session=False
+        )
+        db.commit()
+        if claimed:
+            return db.query(SendPartition).filter_by(id=partition_id).first()
+    return None
+
+
+def release_partitions(db, job_id):
+    """
+    Return a job's running partitions to pending
+
+    Only called by the job's lease holder, so any partition still marked
+    running belongs to a process that is gone (a previous holder's, or
+    one of ours that crashed).
+
+    Returns:
+        int: Partitions released
+    """
+    released = db.query(SendPartition).filter_by(job_id=job_id, status='running').update(
+        {'status': 'pending', 'worker_id': None}, synchronize_session=False)
+    db.commit()
+    return released
+
+
+def drain_partitions(db, job, campaign, worker_id, renderer=None, batch_size=None, parent_pid=None):
+    """
+    Claim and send a job's pending partitions one after another
+
+    Returns:
+        int: Partitions completed
+
+    Raises:
+        LeaseLost: If another worker took the job or a partition over
+    """
+    job_lease = SendLease(job.id, worker_id, parent_pid=parent_pid)
+    partition_worker = get_worker_id()
+    completed = 0
+    while True:
+        partition = claim_partition(db, job_lease, partition_worker)
+        if partition is None:
+            return completed
+        partition_lease = SendLease(job.id, worker_id, partition, parent_pid)
+        drain_deliveries(db, job, campaign, worker_id, renderer, batch_size, partition, parent_pid)
+        partition_lease.renew(db)
+        db.query(SendPartition).filter_by(id=partition.id).update(
+            {'status': 'completed', 'completed_at': datetime.now()}, synchronize_session=False)
+        db.commit()
+        completed += 1
+
+
+def run_partitions(job_id, worker_id, batch_size=None, parent_pid=None):
+    """
+    Entry point of a partition process: drain partitions until none are left
+
+    The partitions already occupy the cores, so the decrypt and QR render
+    pools stay in-process here. The process stops at its next checkpoint
+    if the job is taken over or the worker process that spawned it dies.
+    """
+    Config.DECRYPT_PROCESSES = 0
+    Config.QR_RENDER_PROCESSES = 1
+    db = SessionLocal()
+    try:
+        job = db.query(SendJob).filter_by(id=job_id).first()
+        campaign = db.query(Campaign).filter_by(id=job.campaign_id).first()
+        with decryption_memo():
+            completed = drain_partitions(db, job, campaign, worker_id, job_renderer(job, campaign), batch_size,
+                                         parent_pid)
+        print(f"Send job {job_id}: {get_worker_id()} completed {completed} partitions")
+    except LeaseLost as e:
+        db.rollback()
+        print(f"{e}; partition process {get_worker_id()} stopped")
+    finally:
+        db.close()
+
+
+def send_partitioned(db, job, worker_id, processes, batch_size=None):
+    """
+    Split a large job into customer id ranges and send them from several processes
+
+    Rendering, Fernet decryption and QR drawing all hold the GIL, so one
+    process tops out at one core however many requests it has in flight.
+    Each process claims partitions until none are left; there are a few
+    per process so one slow range doesn't leave the rest of the cores idle.
+    Processes are spawned rather than forked, so none inherits the parent's
+    database connections or dispatcher threads.
+
+    Ranges a crashed process left running go back to pending; the caller's
+    drain_partitions finishes them in-process.
+    """
+    partitions = plan_partitions(db, job, processes * PARTITIONS_PER_PROCESS)
+    pending = sum(1 for partition in partitions if partition.status == 'pending')
+    if not pending:
+        return
+
+    context = multiprocessing.get_context('spawn')
+    workers = [context.Process(target=run_partitions, args=(job.id, worker_id, batch_size, os.getpid()),
+                               daemon=True)
+               for _ in range(min(processes, pending))]
+    print(f"Send job {job.id}: {pending} of {len(partitions)} partitions across {len(workers)} processes")
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+
+    crashed = sum(1 for process in workers if process.exitcode)
+    if crashed:
+        print(f"Send job {job.id}: {crashed} partition processes exited abnormally")
+        SendLease(job.id, worker_id).renew(db)
+        release_partitions(db, job.id)
+        SendLease(job.id, worker_id).renew(db)
+        recover_interrupted(db, job)
+
+
+def finish_job(db, job, campaign, worker_id):
+    """
+    Park a drained job until its next retry is due, or complete it
+
+    Returns:
+        SendJob: The parked or completed job
+
+    Raises:
+        LeaseLost: If another worker took the job over
+    """
+    SendLease(job.id, worker_id).renew(db)
+    db.refresh(job)
+
+    # Only backed-off retries left - release the job until the first is due
+    retry_at = next_retry_at(db, job.id)
+    if retry_at:
+        job.status = 'retrying'
+        job.next_attempt_at = retry_at
+        job.worker_id = None
+        db.commit()
+        print(f"Send job {job.id} waiting on {job.retrying_count} retries until {retry_at:%H:%M:%S}")
+        return job
+
+    job.next_attempt_at = None
+    job.status = 'completed'
+    job.completed_at = datetime.now()
+
+    # An email + SMS send is two jobs - the campaign is sent when both are done
+    still_sending = db.query(SendJob.id).filter(
+        SendJob.campaign_id == campaign.id,
+        SendJob.id != job.id,
+        SendJob.status.in_(SendJob.ACTIVE_STATUSES)
+    ).first()
+    if not still_sending:
+        campaign.status = 'sent'
+        campaign.sent_date = job.completed_at
+        reset_counters(db, campaign.id)
+    db.commit()
+
+    print(f"Send job {job.id} completed: {job.sent_count} sent, {job.failed_count} failed, "
+          f"{job.skipped_count} skipped")
+    return job
+
+
+def process_job(db, job, worker_id, batch_size=None, processes=None):
+    """
+    Drain a claimed job's pending deliveries in checkpointed batches
+
+    Jobs with at least SEND_PARTITION_MIN pending deliveries are split
+    across `processes` worker processes by customer id range (see
+    send_partitioned); the rest, and whatever partitions are left, are
+    sent in this process.
+
+    Retryable failures are rescheduled rather than failed (retry_scheduler)
+    and picked up by later batches once due. When only not-yet-due retries
+    remain, the job is parked as 'retrying' instead of holding the worker.
+
+    Args:
+        db: Database session
+        job (SendJob): Claimed job
+        worker_id (str): Holder of the job's lease
+        batch_size (int): Deliveries per checkpoint (default per channel and send mode)
+        processes (int): Partition processes (default SEND_PROCESSES; 0 or 1 = in-process)
+
+    Returns:
+        SendJob: The finished or parked job
+    """
+    campaign = db.query(Campaign).filter_by(id=job.campaign_id).first()
+    if not campaign:
+        job.status = 'failed'
+        job.error = 'Campaign no longer exists'
+        job.completed_at = datetime.now()
+        db.commit()
+        return job
+
+    processes = Config.SEND_PROCESSES if processes is None else processes
+    partitioned = db.query(SendPartition.id).filter_by(job_id=job.id).first() is not None
+    if partitioned:
+        release_partitions(db, job.id)
+    if processes > 1:
+        pending = db.query(func.count(CampaignDelivery.id)).filter(
+            CampaignDelivery.job_id == job.id, CampaignDelivery.status == 'pending').scalar()
+        if partitioned or pending >= Config.SEND_PARTITION_MIN:
+            send_partitioned(db, job, worker_id, processes, batch_size)
+
+    renderer = job_renderer(job, campaign)
+    drain_partitions(db, job, campaign, worker_id, renderer, batch_size)
+    # Unpartitioned jobs, and retries that came due while the partitions ran
+    drain_deliveries(db, job, campaign, worker_id, renderer, batch_size)
+    return finish_job(db, job, campaign, worker_id)
+
+
+def park_after_error(db, job_id, worker_id, error):
+    """
+    Release a job whose run raised unexpectedly, to be resumed after a backoff
+
+    A locked database or a contended rate bucket is usually gone a minute
+    later, and the job's pending rows are only reachable through the job,
+    so it is parked as 'retrying' like a job waiting on delivery retries.
+    Rows caught mid-send are failed as usual. After SEND_MAX_ATTEMPTS
+    errors the job and its campaign are marked failed.
+
+    Raises:
+        LeaseLost: If another worker took the job over
+    """
+    SendLease(job_id, worker_id).renew(db, error_count=1)
+    job = db.query(SendJob).filter_by(id=job_id).populate_existing().first()
+    recover_interrupted(db, job)
+
+    job.error = str(error)
+    job.worker_id = None
+    if (job.error_count or 0) < Config.SEND_MAX_ATTEMPTS:
+        job.status = 'retrying'
+        job.next_attempt_at = datetime.now() + timedelta(seconds=backoff_delay(job.error_count))
+        db.commit()
+        print(f"Send job {job_id} error ({job.error_count} of {Config.SEND_MAX_ATTEMPTS}), "
+              f"resuming at {job.next_attempt_at:%H:%M:%S}: {error}")
+        return
+
+    job.status = 'failed'
+    job.completed_at = datetime.now()
+    campaign = db.query(Campaign).filter_by(id=job.campaign_id).first()
+    if campaign:
+        campaign.status = 'failed'
+    db.commit()
+    print(f"Send job {job_id} failed: {error}")
+
+
+def run_once(worker_id=None):
+    """
+    Claim and process at most one job
+
+    Returns:
+        bool: True if a job was processed
+    """
+    worker_id = worker_id or get_worker_id()
+    db = SessionLocal()
+    try:
+        job = claim_next_job(db, worker_id)
+        if not job:
+            return False
+
+        job_id = job.id
+        print(f"Worker {worker_id} processing send job {job_id} (campaign {job.campaign_id})")
+        try:
+            with decryption_memo() as memo:
+                process_job(db, job, worker_id)
+            print(f"Send job {job_id} decryption: {memo.hits} memo hits, {memo.misses} decrypted")
+        except LeaseLost as e:
+            # The new holder owns the job now - leave it alone
+            db.rollback()
+            print(f"{e}; stopped")
+        except Exception as e:
+            db.rollback()
+            try:
+                park_after_error(db, job_id, worker_id, e)
+            except LeaseLost as lost:
+                print(f"{lost}; stopped")
+        return True
+    finally:
+        db.close()
+
+
+def run_worker(poll_interval=None):
+    """Poll for send and import jobs forever (entry point for worker.py)"""
+    poll_interval = poll_interval or Config.SEND_WORKER_POLL_SECONDS
+    worker_id = get_worker_id()
+    print(f"Send worker {worker_id} started (poll every {poll_interval}s)")
+
+    while True:
+        processed = False
+        for task in (import_worker.run_once, run_once):
+            try:
+                processed = task(worker_id) or processed
+            except Exception as e:
+                print(f"Send worker error: {e}")
+
+        if not processed:
+            time.sleep(poll_interval)
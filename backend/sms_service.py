@@ -1,6 +1,14 @@
 import os
-from twilio.rest import Client
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
 from backend.models import Customer
+from backend.config import Config
+from backend.retry_scheduler import parse_retry_after
+from backend.rate_limiter import (channel_bucket, campaign_bucket, sender_bucket, reserve_slots, wait_until,
+                                  limiter_session)
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -11,19 +19,17 @@ TWILIO_PHONE_NUMBER = os.getenv('TWILIO_PHONE_NUMBER')
 BUSINESS_NAME = os.getenv('BUSINESS_NAME')
 BASE_URL = os.getenv('BASE_URL')
 
-def send_sms(to_phone, message, include_optout=True):
+def build_sms_body(message, include_optout=True):
     """
-    Send SMS via Twilio
+    Apply the opt-out footer and 160-character limit to a message
 
     Args:
-        to_phone: Phone number in E.164 format (+1234567890)
-        message: Message body (max 160 chars for single SMS)
+        message: Message body
         include_optout: Whether to append opt-out message (required by law)
 
     Returns:
-        dict with success status and message_sid or error
+        str: Body ready to send
     """
-
     # Add opt-out message if requested (legal requirement)
     if include_optout:
         optout_text = f"\n\nReply STOP to unsubscribe. - {BUSINESS_NAME}"
@@ -33,26 +39,170 @@ def send_sms(to_phone, message, include_optout=True):
             message = message[:max_length-3] + "..."
         message = message + optout_text
 
-    try:
-        client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+    return message
+
+class TwilioDispatcher:
+    """
+    Concurrent Twilio sender over one pooled keep-alive HTTP session
+
+    send_sms() used to build a new twilio Client (and connection) per
+    message. The dispatcher reuses connections, keeps up to max_workers
+    requests in flight and paces each sender number to its own
+    messages-per-second budget (TWILIO_MPS_PER_NUMBER) - the limit carriers
+    enforce per number, not per account. Pacing goes through shared token
+    buckets (per number, the 'sms' channel and optionally the campaign), so
+    several worker processes sending from the same numbers stay within it.
+
+    Usage:
+        dispatcher = get_sms_dispatcher()
+        results = dispatcher.send_batch([(to_phone, body), ...])
+    """
+
+    def __init__(self, account_sid=None, auth_token=None, host=None, from_numbers=None,
+                 mps_per_number=None, max_workers=None):
+        self.account_sid = account_sid if account_sid is not None else Config.TWILIO_ACCOUNT_SID
+        auth_token = auth_token if auth_token is not None else Config.TWILIO_AUTH_TOKEN
+        self.url = (f"{(host or Config.TWILIO_API_HOST).rstrip('/')}"
+                    f"/2010-04-01/Accounts/{self.account_sid}/Messages.json")
+        self.from_numbers = list(from_numbers if from_numbers is not None else Config.TWILIO_PHONE_NUMBERS)
+        self.max_workers = max_workers or Config.SMS_SEND_CONCURRENCY
 
-        message_obj = client.messages.create(
-            body=message,
-            from_=TWILIO_PHONE_NUMBER,
-            to=to_phone
-        )
+        mps = Config.TWILIO_MPS_PER_NUMBER if mps_per_number is None else mps_per_number
+        self.buckets = {number: sender_bucket(number, mps) for number in self.from_numbers}
+        self.channel_bucket = channel_bucket('sms')
 
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.auth = (self.account_sid or '', auth_token or '')
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                           thread_name_prefix='twilio')
+
+    def sender_for(self, to_phone):
+        """Pick the sender number - sticky, so a recipient always hears from the same one"""
+        return self.from_numbers[zlib.crc32(to_phone.encode()) % len(self.from_numbers)]
+
+    def send_message(self, to_phone, body, campaign_id=None, on_wait=None):
+        """
+        Send one SMS, waiting for its sender's next slot
+
+        Returns:
+            dict: success plus message_sid/status, or error
+        """
+        return self.send_batch([(to_phone, body)], campaign_id=campaign_id, on_wait=on_wait)[0]
+
+    def _send_at(self, slot, to_phone, body, from_number, on_wait=None):
+        wait_until(slot, on_wait)
+        return self._post(to_phone, body, from_number)
+
+    def _post(self, to_phone, body, from_number):
+        try:
+            response = self.session.post(self.url, data={
+                'To': to_phone,
+                'From': from_number,
+                'Body': body
+            }, timeout=30)
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'network_error': True
+            }
+
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = {}
+
+        if response.status_code >= 400:
+            return {
+                'success': False,
+                'status_code': response.status_code,
+                'error': f"Twilio error {payload.get('code', response.status_code)}: "
+                         f"{payload.get('message') or response.text[:500]}",
+                'retry_after': parse_retry_after(response.headers.get('Retry-After'))
+            }
         return {
             'success': True,
-            'message_sid': message_obj.sid,
-            'status': message_obj.status
+            'message_sid': payload.get('sid'),
+            'status': payload.get('status'),
+            'from': from_number
         }
 
-    except Exception as e:
-        return {
-            'success': False,
-            'error': str(e)
-        }
+    def send_batch(self, messages, campaign_id=None, on_wait=None):
+        """
+        Send many SMS concurrently, in order per sender number
+
+        Every message's start slot is reserved up front in input order, one
+        reservation per bucket, so each sender's messages go out in input
+        order at its MPS budget. Work is queued in slot order, so no worker
+        sits on a far-off slot while an earlier one waits behind it.
+
+        Args:
+            messages: List of (to_phone, body)
+            campaign_id (int): Also draw from this campaign's rate bucket
+            on_wait: Called periodically (from worker threads) while sends
+                wait for their slots - see rate_limiter.wait_until
+
+        Returns:
+            list[dict]: One result per message, in input order
+        """
+        if not self.from_numbers:
+            return [{'success': False, 'error': 'No Twilio sender number configured'} for _ in messages]
+
+        senders = [self.sender_for(to_phone) for to_phone, _ in messages]
+        shared = [self.channel_bucket]
+        if campaign_id is not None:
+            shared.append(campaign_bucket('sms', campaign_id))
+        by_sender = {}
+        for i, from_number in enumerate(senders):
+            by_sender.setdefault(from_number, []).append(i)
+
+        with limiter_session() as db:
+            slots = reserve_slots(shared, len(messages), db)
+            for from_number, indexes in by_sender.items():
+                for i, slot in zip(indexes, self.buckets[from_number].reserve_each(len(indexes), db)):
+                    slots[i] = max(slots[i], slot)
+
+        planned = [(slots[i], i, to_phone, body, senders[i]) for i, (to_phone, body) in enumerate(messages)]
+        planned.sort(key=lambda plan: (plan[0], plan[1]))
+
+        futures = {}
+        for slot, i, to_phone, body, from_number in planned:
+            futures[i] = self.executor.submit(self._send_at, slot, to_phone, body, from_number, on_wait)
+        return [futures[i].result() for i in range(len(messages))]
+
+    def close(self):
+        """Release worker threads and pooled connections"""
+        self.executor.shutdown(wait=True)
+        self.session.close()
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+def get_sms_dispatcher():
+    """Process-wide dispatcher so connections stay warm and pacing is shared"""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = TwilioDispatcher()
+        return _dispatcher
+
+def send_sms(to_phone, message, include_optout=True):
+    """
+    Send SMS via Twilio
+
+    Args:
+        to_phone: Phone number in E.164 format (+1234567890)
+        message: Message body (max 160 chars for single SMS)
+        include_optout: Whether to append opt-out message (required by law)
+
+    Returns:
+        dict with success status and message_sid or error
+    """
+    return get_sms_dispatcher().send_message(to_phone, build_sms_body(message, include_optout))
 
 def send_test_sms(test_phone, message):
     """Send test SMS to yourself"""
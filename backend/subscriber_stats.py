@@ -0,0 +1,102 @@
+"""
+Cached audience counts for the dashboard and campaign pages
+
+Every count those pages show (contacts, email / SMS subscribers, the send
+audiences) comes from one conditional-aggregate pass over customers
+instead of a COUNT(*) per number. The result is held in-process for
+STATS_CACHE_TTL seconds, so page loads skip the table entirely while the
+cache is warm. Routes that change subscriptions invalidate it right away;
+changes made by other processes (imports in worker.py, other gunicorn
+workers) show up within the TTL.
+
+CRC: crc-CampaignAnalytics.md, crc-SegmentManager.md
+Spec: phase-2-campaign-management.md
+"""
+import threading
+import time
+from sqlalchemy import func, case, and_
+from backend.models import Customer
+from backend.config import Config
+
+
+def count_subscribers(db):
+    """
+    All audience counts in a single query
+
+    Segment semantics match send_worker.segment_filter (a NULL flag counts
+    as neither subscribed nor unsubscribed).
+
+    Returns:
+        dict: total_contacts, subscribed, unsubscribed, sms_subscribed,
+              sms_unsubscribed (has a phone), email_only, sms_only, both
+    """
+    def count_where(*criteria):
+        return func.coalesce(func.sum(case((and_(*criteria), 1), else_=0)), 0)
+
+    email_on = Customer.subscribed == True
+    email_off = Customer.subscribed == False
+    sms_on = Customer.sms_subscribed == True
+    sms_off = Customer.sms_subscribed == False
+
+    row = db.query(
+        func.count(Customer.id),
+        count_where(email_on),
+        count_where(email_off),
+        count_where(sms_on),
+        count_where(sms_off, Customer._phone_encrypted.isnot(None)),
+        count_where(email_on, sms_off),
+        count_where(sms_on, email_off),
+        count_where(email_on, sms_on)
+    ).one()
+
+    keys = ('total_contacts', 'subscribed', 'unsubscribed', 'sms_subscribed',
+            'sms_unsubscribed', 'email_only', 'sms_only', 'both')
+    return {key: int(value or 0) for key, value in zip(keys, row)}
+
+
+class SubscriberStatsCache:
+    """Thread-safe single-entry TTL cache around count_subscribers()"""
+
+    def __init__(self, ttl=None):
+        self.ttl = Config.STATS_CACHE_TTL if ttl is None else ttl
+        self._stats = None
+        self._expires_at = 0.0
+        self._generation = 0  # Bumped by invalidate() so an in-flight query can't store stale counts
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, db):
+        """
+        Return audience counts, querying only when the cached copy has expired
+
+        Args:
+            db: Database session used on a miss
+
+        Returns:
+            dict: See count_subscribers()
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._stats is not None and now < self._expires_at:
+                self.hits += 1
+                return dict(self._stats)
+            generation = self._generation
+
+        stats = count_subscribers(db)
+        with self._lock:
+            self.misses += 1
+            if generation == self._generation:
+                self._stats = stats
+                self._expires_at = time.monotonic() + self.ttl
+        return dict(stats)
+
+    def invalidate(self):
+        """Drop the cached counts after a subscription change in this process"""
+        with self._lock:
+            self._stats = None
+            self._expires_at = 0.0
+            self._generation += 1
+
+
+subscriber_stats = SubscriberStatsCache()
@@ -0,0 +1,114 @@
+"""
+Compile-once cache for email templates
+
+Jinja compiles a template's source into Python bytecode; doing that per
+recipient dominated render cost. TemplateCache keeps compiled templates
+keyed by (file path, mtime, size) with bounded LRU eviction, so each
+template file is read and compiled once and recompiled only when edited.
+
+CRC: crc-EmailQueueTask.md (render_email)
+Spec: phase-2-campaign-management.md
+Sequence: seq-email-process.md
+"""
+import os
+import threading
+from collections import OrderedDict
+from jinja2 import Environment, FileSystemLoader, select_autoescape, TemplateNotFound
+from backend.config import Config
+
+# Same templates folder and autoescape rules Flask's render_template uses,
+# so the background worker renders campaigns without an app context
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates')
+
+
+class TemplateCache:
+    """Thread-safe LRU of compiled Jinja templates keyed by path and mtime"""
+
+    def __init__(self, templates_dir=TEMPLATES_DIR, max_entries=None):
+        self.templates_dir = os.path.abspath(templates_dir)
+        self.max_entries = max_entries or Config.TEMPLATE_CACHE_SIZE
+        self.env = Environment(
+            loader=FileSystemLoader(self.templates_dir),  # For {% include %} / {% extends %}
+            autoescape=select_autoescape(['html', 'htm', 'xml'], default_for_string=True)
+        )
+        self._entries = OrderedDict()  # path -> (mtime_ns, size, Template)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, name):
+        """
+        Map a template name (e.g. 'email/monday_special.html') to a file path
+
+        Raises:
+            TemplateNotFound: Missing file or a name escaping the templates folder
+        """
+        path = os.path.abspath(os.path.join(self.templates_dir, name))
+        if not path.startswith(self.templates_dir + os.sep) or not os.path.isfile(path):
+            raise TemplateNotFound(name)
+        return path
+
+    def get_template(self, name):
+        """
+        Return the compiled template, compiling only on first use or after edits
+
+        Args:
+            name (str): Path relative to the templates folder
+
+        Returns:
+            jinja2.Template
+        """
+        return self.get_template_file(self.resolve(name))
+
+    def get_template_file(self, path):
+        """
+        Return the compiled template for a file path
+
+        Args:
+            path (str): Template file path (absolute or relative to cwd)
+
+        Returns:
+            jinja2.Template
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[2]
+
+        with open(path, 'r', encoding='utf-8') as f:
+            source = f.read()
+        template = self.env.from_string(source)
+
+        with self._lock:
+            self.misses += 1
+            self._entries[path] = (stat.st_mtime_ns, stat.st_size, template)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return template
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Cache counters for monitoring"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+# Process-wide cache shared by the web app and the send worker
+template_cache = TemplateCache()
@@ -0,0 +1,10 @@
+# Offline benchmarks and provider stand-ins (run with: python -m benchmarks.<name>)
+import os
+import tempfile
+
+# Dispatchers keep rate-limit state in the database; point every benchmark
+# (and any process it spawns) at one scratch SQLite file, never the app's own
+if 'BENCHMARK_DATABASE_URL' not in os.environ:
+    os.environ['BENCHMARK_DATABASE_URL'] = \
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='maxxconnect-bench-'), 'bench.db')}"
+os.environ['DATABASE_URL'] = os.environ['BENCHMARK_DATABASE_URL']
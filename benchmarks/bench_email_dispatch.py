@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""
+Benchmark serial send_email-style sending vs. the pooled SendGridDispatcher
+
+Runs entirely against the local stand-in server. Example:
+
+    python -m benchmarks.bench_email_dispatch --messages 500 --latency 0.08
+"""
+import argparse
+import time
+from sendgrid import SendGridAPIClient
+from backend.email_service import SendGridDispatcher, build_message
+from backend.database import init_db
+from benchmarks.standin import StandInServer
+
+HTML = "<html><body><h1>Monday special</h1><p>Hey there!</p></body></html>"
+
+
+def bench_serial(server, count):
+    """One new SendGridAPIClient and connection per message, like send_email()"""
+    start = time.perf_counter()
+    for i in range(count):
+        client = SendGridAPIClient('bench', host=server.url)
+        client.send(build_message(f'user{i}@example.com', f'User {i}', 'Bench', HTML))
+    return time.perf_counter() - start
+
+
+def bench_dispatcher(server, count, workers):
+    dispatcher = SendGridDispatcher(api_key='bench', host=server.url, max_workers=workers, rate_limit=0)
+    emails = [(f'user{i}@example.com', f'User {i}', 'Bench', HTML) for i in range(count)]
+    try:
+        start = time.perf_counter()
+        results = dispatcher.send_batch(emails)
+        elapsed = time.perf_counter() - start
+    finally:
+        dispatcher.close()
+
+    failed = sum(1 for r in results if not r['success'])
+    if failed:
+        raise SystemExit(f"{failed} dispatcher sends failed")
+    return elapsed
+
+
+def report(label, count, elapsed, connections):
+    rate = count / elapsed
+    print(f"{label:<28} {elapsed:7.2f}s  {rate:8.1f} msg/s  "
+          f"{connections:5d} connections  5k list ≈ {5000 / rate / 60:6.1f} min")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--messages', type=int, default=300)
+    parser.add_argument('--latency', type=float, default=0.08, help='Simulated API latency (seconds)')
+    parser.add_argument('--workers', type=int, nargs='+', default=[4, 8, 16])
+    args = parser.parse_args()
+    init_db()  # Scratch database for the shared rate-limit buckets
+
+    print(f"{args.messages} messages, {args.latency * 1000:.0f} ms simulated API latency\n")
+
+    with StandInServer(latency=args.latency) as server:
+        elapsed = bench_serial(server, args.messages)
+        report('serial (new client each)', args.messages, elapsed, server.connections)
+
+        for workers in args.workers:
+            server.reset()
+            elapsed = bench_dispatcher(server, args.messages, workers)
+            report(f'dispatcher ({workers} workers)', args.messages, elapsed, server.connections)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+"""
+Benchmark ImageHandler's HTML image rewriting on the bundled email templates
+
+  regex     the previous rewriter: re.sub with the pattern string per call,
+            matching each whole <img> tag and str.replace-ing its src
+  single    ImageHandler.rewrite_image_urls: one precompiled pattern over
+            the HTML, URLs spliced into a list buffer joined once
+
+Each template is rendered three ways: images already inlined as data URIs
+(development), hosted http URLs (production), and local /static paths (a
+hand-written campaign body). Both rewriters must produce identical output
+for every document under both image strategies.
+
+    python -m benchmarks.bench_image_rewrite --repeat 200
+"""
+import argparse
+import os
+import re
+import time
+from backend.config import Config
+from backend.image_handler import ImageHandler
+from backend.template_cache import TEMPLATES_DIR, template_cache
+
+LOGO = 'FNFWebLogo200x50.png'
+HERO = 'FNFFront600x300.png'
+
+# Hand-written campaign body for base_email.html, with local images
+EMAIL_BODY = (
+    '<h1>Monday special</h1>'
+    f'<img src="/static/images/{LOGO}" width="200" alt="Logo">'
+    '<p>Half-price appetizers all night.</p>'
+    f'<img src="static/images/{HERO}" width="600" alt="Hero">'
+    f'<div style="background-image: url(\'{HERO}\'); padding: 40px">See you there</div>'
+)
+
+
+def legacy_base64(html_content):
+    img_pattern = r'<img\s+[^>]*src=["\']([^"\']+)["\'][^>]*>'
+
+    def replace_img(match):
+        img_tag = match.group(0)
+        src = match.group(1)
+        if src.startswith('data:') or src.startswith('http') or src.startswith(ImageHandler.PLACEHOLDER_PREFIXES):
+            return img_tag
+        file_path = ImageHandler._resolve_image_path(src)
+        if file_path:
+            try:
+                return img_tag.replace(src, ImageHandler._image_to_base64(file_path))
+            except Exception:
+                return img_tag
+        return img_tag
+
+    return re.sub(img_pattern, replace_img, html_content)
+
+
+def legacy_external(html_content):
+    img_pattern = r'<img\s+[^>]*src=["\']([^"\']+)["\'][^>]*>'
+
+    def replace_img(match):
+        img_tag = match.group(0)
+        src = match.group(1)
+        if src.startswith('http') or src.startswith('data:') or src.startswith(ImageHandler.PLACEHOLDER_PREFIXES):
+            return img_tag
+        if src.startswith('/static/'):
+            external_url = Config.get_full_url(src)
+        elif src.startswith('static/'):
+            external_url = Config.get_full_url('/' + src)
+        else:
+            external_url = Config.get_static_url(f"images/{src}")
+        return img_tag.replace(src, external_url)
+
+    return re.sub(img_pattern, replace_img, html_content)
+
+
+def documents():
+    """(label, html) for each bundled template and image style"""
+    base = {'customer_name': 'Jane & Co', 'unsubscribe_link': 'https://example.com/unsubscribe?t=1',
+            'business_name': 'Fric & Frac', 'business_address': '123 Main St', 'email_body': EMAIL_BODY}
+    inlined = dict(base, logo_base64=ImageHandler._image_to_base64(f'static/images/{LOGO}').split(',', 1)[1],
+                   hero_image_base64=ImageHandler._image_to_base64(f'static/images/{HERO}').split(',', 1)[1],
+                   qr_code_base64='iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg==')
+    hosted = dict(base, logo_url=f'https://example.com/static/images/{LOGO}',
+                  hero_image_url=f'https://example.com/static/images/{HERO}',
+                  qr_code_url=f'https://example.com/qr/{"0" * 64}.png?r=1-1')
+    local = dict(base, logo_url=f'/static/images/{LOGO}', hero_image_url=f'static/images/{HERO}',
+                 qr_code_url=LOGO)
+
+    for name in sorted(os.listdir(os.path.join(TEMPLATES_DIR, 'email'))):
+        template = template_cache.get_template_file(os.path.join(TEMPLATES_DIR, 'email', name))
+        for style, template_vars in (('inlined', inlined), ('hosted', hosted), ('local', local)):
+            yield f"{name} ({style})", template.render(template_vars)
+
+
+def timed(fn, html, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(html)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    docs = list(documents())
+    strategies = (('base64', legacy_base64, ImageHandler._convert_to_base64, ImageHandler._base64_url),
+                  ('external', legacy_external, ImageHandler._convert_to_external_urls, ImageHandler._external_url))
+    background = f"url('{HERO}')"
+
+    print(f"{'document':<34} {'strategy':<9} {'KB':>6} {'regex µs':>10} {'single µs':>10} {'speedup':>8}")
+    for label, html in docs:
+        for strategy, legacy, single, convert in strategies:
+            # Same output, except that CSS background images are now rewritten too
+            expected = legacy(html).replace(background, f"url('{convert(HERO)}')")
+            assert single(html) == expected, f"{label} / {strategy}: rewriters differ"
+            before = timed(legacy, html, args.repeat)
+            after = timed(single, html, args.repeat)
+            print(f"{label:<34} {strategy:<9} {len(html) / 1024:6.0f} {before * 1e6:10.1f} {after * 1e6:10.1f} "
+                  f"{before / after:7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
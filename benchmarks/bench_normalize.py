@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+"""
+Benchmark and parity check for contact normalization in the CSV importer
+
+  scalar      per-row is_valid_email + format_phone_number/validate_phone_number
+              (what the importer did before)
+  vectorized  csv_importer.normalize_contacts: whole-column passes - pandas
+              .str ops for emails, a numpy byte matrix for phones
+
+Both paths must agree row for row (email, E.164 phone and reason) on the
+bundled Square export plus a set of edge cases, or the script fails before
+timing anything.
+
+    python -m benchmarks.bench_normalize --repeat 100
+"""
+import argparse
+import os
+import time
+import pandas as pd
+from backend.csv_importer import (
+    COLUMN_MAPPING, REASON_MISSING_EMAIL, REASON_INVALID_EMAIL, REASON_INVALID_PHONE,
+    is_valid_email, clean_phone, normalize_contacts
+)
+
+EXPORT_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          'export-20251220-194036.csv')
+
+# (email, phone) pairs the export doesn't happen to cover
+EDGE_CASES = [
+    ('  John@Example.COM ', '(555) 123-4567'),
+    ('', '5551234567'),
+    ('   ', ''),
+    ('no-at-sign.com', ''),
+    ('a@b.c', '15551234567'),
+    ('a@b.co', '25551234567'),
+    ('first.last+tag@sub.example.org', '+1 555 123 4567 ext'),
+    ('x@y.io', '555-1234'),
+    ('x@y.io', '+44 20 7946 0958'),
+    ('x@y.io', 'nan'),
+    ('x@y.io', '555123456789012'),
+    ('x@y.io', '٥٥٥١٢٣٤٥٦٧'),  # Arabic-Indic digits: isdigit() but not [0-9]
+    ('x@y.io', '555²123456'),
+    ('ünïcode@example.com', '5551234567'),
+    ('double@@example.com', ''),
+    ('trailing.dot@example.', ''),
+]
+
+
+def scalar_normalize(emails, phones):
+    """Reference: the importer's original per-row logic"""
+    results = []
+    for email_raw, phone_raw in zip(emails, phones):
+        email = email_raw.strip().lower()
+        phone_raw = phone_raw.strip()
+        phone = clean_phone(phone_raw)
+
+        reason = None
+        if email == '':
+            reason = REASON_MISSING_EMAIL
+        elif not is_valid_email(email):
+            reason = REASON_INVALID_EMAIL
+        elif phone_raw and phone is None:
+            reason = REASON_INVALID_PHONE
+        results.append((email, phone, reason))
+    return results
+
+
+def vectorized_normalize(emails, phones):
+    df = normalize_contacts(pd.DataFrame({'email': emails, 'phone': phones}))
+    return list(zip(df['email'], df['phone'], df['reason']))
+
+
+def load_export():
+    df = pd.read_csv(EXPORT_CSV, dtype=str, keep_default_na=False).rename(columns=COLUMN_MAPPING)
+    return df['email'].tolist(), df['phone'].tolist()
+
+
+def check_parity(emails, phones):
+    expected = scalar_normalize(emails, phones)
+    actual = vectorized_normalize(emails, phones)
+    mismatches = [(e, p, want, got) for e, p, want, got in zip(emails, phones, expected, actual) if want != got]
+    for email, phone, want, got in mismatches[:10]:
+        print(f"MISMATCH {email!r} {phone!r}: scalar={want} vectorized={got}")
+    assert not mismatches, f"{len(mismatches)} rows differ"
+    return expected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=100,
+                        help='Copies of the export to stack for timing')
+    args = parser.parse_args()
+
+    emails, phones = load_export()
+
+    expected = check_parity(emails, phones)
+    # Non-ASCII phones send a whole column down the clean_phone fallback,
+    # so check the ASCII cases on their own as well
+    ascii_cases = [(e, p) for e, p in EDGE_CASES if p.isascii()]
+    for cases in (EDGE_CASES, ascii_cases):
+        check_parity([e for e, _ in cases], [p for _, p in cases])
+    reasons = pd.Series([reason for _, _, reason in expected]).value_counts(dropna=False)
+    print(f"parity ok on {len(emails)} export rows + {len(EDGE_CASES)} edge cases")
+    print("reasons: " + ", ".join(f"{reason or 'ok'}={count}" for reason, count in reasons.items()))
+
+    emails, phones = emails * args.repeat, phones * args.repeat
+    print(f"\n{len(emails)} rows (export x{args.repeat})")
+
+    # Time what the importer actually consumes: lists for the scalar loop,
+    # a DataFrame for the column pipeline
+    frame = pd.DataFrame({'email': emails, 'phone': phones})
+    paths = (
+        ('scalar', lambda: scalar_normalize(emails, phones)),
+        ('vectorized', lambda: normalize_contacts(frame)),
+    )
+
+    before = None
+    for label, normalize in paths:
+        start = time.perf_counter()
+        normalize()
+        elapsed = time.perf_counter() - start
+        before = before or elapsed
+        print(f"{label:<11} {elapsed:7.3f}s  {elapsed / len(emails) * 1e6:6.2f} µs/row  {before / elapsed:5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+"""
+Benchmark QR validation and redemption at the counter
+
+Issues --codes codes for one campaign into a scratch SQLite database,
+then times redeem_code per scan for:
+
+  junk        random strings and codes with a forged signature
+  unsigned    the same junk looked up in qr_codes directly (no pre-checks)
+  unissued    correctly signed codes that were never issued (Bloom filter)
+  redeem      first scan of an issued code
+  repeat      second scan of the same code (already_redeemed)
+
+It also races threads on one single-use code to check exactly one redeems.
+
+    python -m benchmarks.bench_qr_redeem --codes 20000 --scans 2000
+"""
+import argparse
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import insert
+from backend.database import init_db, SessionLocal
+from backend.models import Customer, Campaign, QRCode
+from backend.qr_generator import generate_token
+from backend.qr_redemption import (issue_codes, redeem_code, code_hash, issued_codes,
+                                   REDEEMED, ALREADY_REDEEMED, UNKNOWN)
+
+
+def setup(db, count):
+    db.execute(insert(Customer.__table__), [
+        {'email': f'enc-{i}', 'email_hash': f'{i:064x}', 'name': f'Customer {i}', 'subscribed': True}
+        for i in range(count)
+    ])
+    campaign = Campaign(name='Bench', subject='Bench', html_content='-', has_qr_code=True)
+    db.add(campaign)
+    db.commit()
+    ids = [row[0] for row in db.query(Customer.id).order_by(Customer.id)]
+    start = time.perf_counter()
+    issue_codes(db, campaign.id, ids)
+    db.commit()
+    print(f"issue   {time.perf_counter() - start:7.2f}s for {len(ids)} codes")
+    return campaign.id, ids
+
+
+def timed(label, scans, fn, expect):
+    start = time.perf_counter()
+    for code in scans:
+        status = fn(code)
+        assert status == expect, f"{label}: {code} -> {status}, expected {expect}"
+    elapsed = time.perf_counter() - start
+    print(f"{label:<9} {elapsed / len(scans) * 1e6:9.1f} µs/scan  ({len(scans)} scans)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--codes', type=int, default=20000)
+    parser.add_argument('--scans', type=int, default=2000)
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    campaign_id, ids = setup(db, args.codes)
+    scans = min(args.scans, len(ids) // 2)
+
+    junk = [secrets.token_urlsafe(24) if i % 2 else f"{campaign_id}-{ids[i]}-{secrets.token_hex(16).upper()}"
+            for i in range(scans)]
+    unissued = [generate_token(campaign_id + 1, customer_id) for customer_id in ids[:scans]]
+    issued = [generate_token(campaign_id, customer_id) for customer_id in ids[:scans]]
+
+    issued_codes.reset()
+    start = time.perf_counter()
+    redeem_code(db, junk[0])
+    redeem_code(db, issued[-1])  # Loads the filter
+    print(f"filter  {time.perf_counter() - start:7.2f}s first load")
+
+    def direct_lookup(code):
+        found = db.query(QRCode.id).filter(QRCode.code_hash == code_hash(code)).first()
+        return UNKNOWN if found is None else 'found'
+
+    timed('junk', junk, lambda code: redeem_code(db, code)['status'], UNKNOWN)
+    timed('unsigned', junk, direct_lookup, UNKNOWN)
+    passed = sum(1 for code in unissued if code_hash(code) in issued_codes._bloom)
+    timed('unissued', unissued, lambda code: redeem_code(db, code)['status'], UNKNOWN)
+    print(f"          {passed} of {len(unissued)} unissued codes got past the Bloom filter")
+    timed('redeem', issued[:-1], lambda code: redeem_code(db, code)['status'], REDEEMED)
+    timed('repeat', issued[:-1], lambda code: redeem_code(db, code)['status'], ALREADY_REDEEMED)
+    db.close()
+
+    # Eight scanners on one fresh code: exactly one redemption
+    race_code = generate_token(campaign_id, ids[-1])
+
+    def scan(_):
+        session = SessionLocal()
+        try:
+            return redeem_code(session, race_code)['status']
+        finally:
+            session.close()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        outcomes = list(pool.map(scan, range(8)))
+    assert outcomes.count(REDEEMED) == 1 and outcomes.count(ALREADY_REDEEMED) == 7, outcomes
+    print("race      8 concurrent scans of one code: 1 redeemed, 7 already_redeemed")
+
+
+if __name__ == '__main__':
+    main()
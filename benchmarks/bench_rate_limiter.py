@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""
+Check that separate processes share one send-rate budget
+
+Several worker processes each send as fast as their limiter lets them for
+a fixed time, recording when each send starts.
+
+  per-process  each process paces itself against its own bucket - what the
+               in-process pacer did, so N processes send at N x the limit
+  shared       all processes draw from one database-backed bucket
+
+The shared run must stay at the limit (plus the burst allowance) without
+falling well short of it, or the script fails.
+
+    python -m benchmarks.bench_rate_limiter --processes 4 --limit 1200 --seconds 5
+"""
+import argparse
+import multiprocessing
+import time
+from backend.database import SessionLocal, init_db
+from backend.rate_limiter import TokenBucket, get_rate_snapshot
+
+# The shared run must reach this fraction of the limit to count as not serial
+MIN_UTILIZATION = 0.9
+
+
+def sender(key, limit, batch, seconds, start_at, queue):
+    """Send (i.e. record a timestamp) whenever the bucket allows, for `seconds`"""
+    bucket = TokenBucket(key, limit)
+    starts = []
+    time.sleep(max(0.0, start_at - time.time()))
+    stop_at = start_at + seconds
+    while True:
+        slots = bucket.reserve_each(batch)
+        for slot in slots:
+            delay = slot - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            starts.append(time.time())
+        if time.time() >= stop_at:
+            break
+    queue.put(starts)
+
+
+def run(processes, key_for, limit, batch, seconds):
+    """
+    Returns:
+        list[float]: Every process's send start times, sorted
+    """
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    start_at = time.time() + 2.0  # Let every process finish importing first
+    workers = [
+        context.Process(target=sender, args=(key_for(n), limit, batch, seconds, start_at, queue))
+        for n in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    starts = sorted(t for _ in workers for t in queue.get())
+    for worker in workers:
+        worker.join()
+    return starts
+
+
+def measured_rate(starts, seconds):
+    """Sends per minute over the run, ignoring the trailing partial batch"""
+    first = starts[0]
+    in_window = [t for t in starts if t - first < seconds]
+    return len(in_window) / seconds * 60
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--limit', type=int, default=1200, help='Sends per minute')
+    parser.add_argument('--batch', type=int, default=10, help='Sends reserved per database round trip')
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+    init_db()
+
+    burst = TokenBucket('probe', args.limit).capacity
+    ceiling = args.limit + burst / args.seconds * 60
+    print(f"{args.processes} processes, limit {args.limit}/min "
+          f"(burst {burst:g}, so ≤ {ceiling:.0f}/min over {args.seconds:g}s)\n")
+
+    runs = (
+        ('per-process', lambda n: f'bench:own:{n}'),
+        ('shared', lambda n: 'bench:shared'),
+    )
+    for label, key_for in runs:
+        starts = run(args.processes, key_for, args.limit, args.batch, args.seconds)
+        rate = measured_rate(starts, args.seconds)
+        print(f"{label:<12} {len(starts):6d} sends  {rate:8.0f}/min  {rate / args.limit:5.2f}x limit")
+
+    if rate > ceiling * 1.02:
+        raise SystemExit("shared bucket let processes exceed the limit")
+    if rate < args.limit * MIN_UTILIZATION:
+        raise SystemExit("shared bucket held processes well below the limit")
+
+    db = SessionLocal()
+    try:
+        shared = next(b for b in get_rate_snapshot(db) if b['key'] == 'bench:shared')
+    finally:
+        db.close()
+    print(f"\n/send-rates velocity for the shared bucket: {shared['velocity_per_minute']:.0f}/min "
+          f"(sends in the last minute)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+"""
+Benchmark a whole campaign send: one worker process vs. partitioned processes
+
+Seeds --recipients customers into a scratch database and sends the same QR
+campaign once per --processes value through send_worker.process_job,
+against the local stand-in server. Every recipient must end up sent exactly
+once, with partitions covering the job's deliveries without overlap.
+
+    python -m benchmarks.bench_send_partitions --recipients 20000 --processes 1 4
+"""
+import argparse
+import os
+import time
+from collections import Counter
+from sqlalchemy import insert
+from backend.database import init_db, SessionLocal
+from backend.encryption import encrypt_string, email_blind_index
+from backend.models import Customer, Campaign, SendJob, SendPartition, CampaignDelivery
+from backend.config import Config
+from backend import send_worker
+from benchmarks.standin import StandInServer
+
+
+def seed(db, count):
+    emails = [f'customer{i}@example.com' for i in range(count)]
+    db.execute(insert(Customer.__table__), [
+        {'email': encrypt_string(email), 'email_hash': email_blind_index(email),
+         'name': f'Customer {i}', 'subscribed': True}
+        for i, email in enumerate(emails)
+    ])
+    db.commit()
+
+
+def send(db, server, processes, mode):
+    campaign = Campaign(name=f'Bench x{processes}', subject='Bench', html_content='-',
+                        template_name='email/monday_special.html', has_qr_code=True)
+    db.add(campaign)
+    db.commit()
+    job = send_worker.enqueue_campaign_send(db, campaign, 'all', channel='email')
+    job = send_worker.claim_next_job(db, 'bench')
+    received = len(server.requests)
+
+    start = time.perf_counter()
+    job = send_worker.process_job(db, job, 'bench', processes=processes)
+    elapsed = time.perf_counter() - start
+
+    statuses = Counter(status for (status,) in db.query(CampaignDelivery.status).filter_by(job_id=job.id))
+    assert statuses == {'sent': job.total_count} and job.sent_count == job.total_count, statuses
+    if mode == 'individual':
+        assert len(server.requests) - received == job.total_count, "a recipient was sent twice or not at all"
+
+    partitions = db.query(SendPartition).filter_by(job_id=job.id).order_by(SendPartition.position).all()
+    if partitions:
+        assert all(p.status == 'completed' for p in partitions)
+        assert all(a.max_customer_id < b.min_customer_id for a, b in zip(partitions, partitions[1:]))
+        assert sum(p.total_count for p in partitions) == sum(p.sent_count for p in partitions) == job.total_count
+    return elapsed, len(partitions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--recipients', type=int, default=20000)
+    parser.add_argument('--processes', type=int, nargs='+', default=[1, os.cpu_count() or 1])
+    parser.add_argument('--mode', choices=['individual', 'batch'], default='individual')
+    parser.add_argument('--latency', type=float, default=0.02, help='Simulated API latency (seconds)')
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    seed(db, args.recipients)
+    print(f"{args.recipients} recipients, {args.mode} mode, {os.cpu_count()} CPUs, "
+          f"{args.latency * 1000:.0f} ms simulated API latency\n")
+
+    with StandInServer(latency=args.latency) as server:
+        # Partition processes are spawned and configure themselves from the
+        # environment, so settings go there as well as on Config
+        settings = {'SENDGRID_API_HOST': server.url, 'EMAIL_SEND_MODE': args.mode,
+                    'EMAIL_RATE_LIMIT': '0', 'SEND_PARTITION_MIN': '1'}
+        os.environ.update(settings)
+        Config.SENDGRID_API_HOST = server.url
+        Config.EMAIL_SEND_MODE = args.mode
+        Config.EMAIL_RATE_LIMIT = 0
+        Config.SEND_PARTITION_MIN = 1
+
+        baseline = None
+        for processes in args.processes:
+            elapsed, partitions = send(db, server, processes, args.mode)
+            baseline = baseline or elapsed
+            print(f"{processes:2d} processes  {partitions:3d} partitions  {elapsed:7.2f}s  "
+                  f"{args.recipients / elapsed:8.1f} recipients/s  {baseline / elapsed:5.2f}x")
+    db.close()
+
+
+if __name__ == '__main__':
+    main()
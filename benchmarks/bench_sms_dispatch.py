@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+Benchmark serial send_sms-style sending vs. the pooled TwilioDispatcher
+
+Runs entirely against the local stand-in server. Besides throughput, the
+dispatcher run is checked against what carriers care about: each sender
+number's messages must arrive in input order and no closer together than
+its messages-per-second budget allows.
+
+    python -m benchmarks.bench_sms_dispatch --messages 200 --numbers 4 --mps 10
+"""
+import argparse
+import time
+from collections import defaultdict
+from urllib.parse import parse_qs
+from twilio.rest import Client
+from backend.sms_service import TwilioDispatcher
+from backend.database import init_db
+from benchmarks.standin import StandInServer
+
+# Arrival gaps are measured server-side, so allow a little scheduling jitter
+GAP_TOLERANCE = 0.9
+
+
+def recipients(count):
+    return [(f'+1555{i:07d}', f'Burger Monday! Message {i}') for i in range(count)]
+
+
+def bench_serial(server, count):
+    """One new twilio Client and connection per message, like the old send_sms()"""
+    start = time.perf_counter()
+    for to_phone, body in recipients(count):
+        client = Client('ACbench', 'bench')
+        client.api.base_url = server.url
+        client.messages.create(body=body, from_='+15550000000', to=to_phone)
+    return time.perf_counter() - start
+
+
+def bench_dispatcher(server, count, numbers, mps, workers):
+    dispatcher = TwilioDispatcher(account_sid='ACbench', auth_token='bench', host=server.url,
+                                  from_numbers=numbers, mps_per_number=mps, max_workers=workers)
+    try:
+        start = time.perf_counter()
+        results = dispatcher.send_batch(recipients(count))
+        elapsed = time.perf_counter() - start
+    finally:
+        dispatcher.close()
+
+    failed = sum(1 for r in results if not r['success'])
+    if failed:
+        raise SystemExit(f"{failed} dispatcher sends failed")
+    if any(not r.get('message_sid') for r in results):
+        raise SystemExit("dispatcher results are missing message SIDs")
+    return elapsed
+
+
+def check_pacing(server, mps):
+    """
+    Verify per-sender order and spacing from what the stand-in received
+
+    Returns:
+        dict: sender -> (message count, smallest gap between arrivals in seconds)
+    """
+    per_sender = defaultdict(list)
+    for (path, payload), arrived in zip(server.requests, server.arrivals):
+        form = {key: values[0] for key, values in parse_qs(payload.decode()).items()}
+        index = int(form['Body'].rsplit(' ', 1)[1])
+        per_sender[form['From']].append((arrived, index))
+
+    summary = {}
+    for sender, sends in per_sender.items():
+        sends.sort()
+        order = [index for _, index in sends]
+        if order != sorted(order):
+            raise SystemExit(f"{sender}: messages arrived out of input order")
+
+        gaps = [b[0] - a[0] for a, b in zip(sends, sends[1:])]
+        min_gap = min(gaps) if gaps else float('inf')
+        if mps and min_gap < GAP_TOLERANCE / mps:
+            raise SystemExit(f"{sender}: {min_gap * 1000:.0f} ms between messages exceeds {mps} MPS")
+        summary[sender] = (len(sends), min_gap)
+    return summary
+
+
+def report(label, count, elapsed, connections):
+    rate = count / elapsed
+    print(f"{label:<30} {elapsed:7.2f}s  {rate:8.1f} msg/s  {connections:5d} connections")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.08, help='Simulated API latency (seconds)')
+    parser.add_argument('--numbers', type=int, default=4, help='Sender numbers in the pool')
+    parser.add_argument('--mps', type=float, default=10, help='Messages per second per sender')
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+    init_db()  # Scratch database for the shared rate-limit buckets
+
+    numbers = [f'+1555000{i:04d}' for i in range(args.numbers)]
+    ceiling = min(args.numbers * args.mps, args.workers / args.latency)
+    print(f"{args.messages} messages, {args.latency * 1000:.0f} ms simulated API latency, "
+          f"{args.numbers} senders x {args.mps:g} MPS (ceiling ≈ {ceiling:.0f} msg/s)\n")
+
+    with StandInServer(latency=args.latency) as server:
+        elapsed = bench_serial(server, args.messages)
+        report('serial (new client each)', args.messages, elapsed, server.connections)
+
+        server.reset()
+        elapsed = bench_dispatcher(server, args.messages, numbers, args.mps, args.workers)
+        report(f'dispatcher ({args.workers} workers)', args.messages, elapsed, server.connections)
+
+        print("\nper-sender pacing (in input order, within budget):")
+        for sender, (count, min_gap) in sorted(check_pacing(server, args.mps).items()):
+            print(f"  {sender}  {count:4d} messages  min gap {min_gap * 1000:6.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
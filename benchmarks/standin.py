@@ -0,0 +1,118 @@
+"""
+Local stand-in for provider HTTP APIs (SendGrid mail send, Twilio messages)
+
+Accepts the same requests as the real services and answers after a fixed
+simulated latency, so send throughput can be measured without the network
+or real credentials. Speaks HTTP/1.1 keep-alive and counts TCP connections,
+which shows whether a client is actually pooling.
+
+Usage:
+    with StandInServer(latency=0.05) as server:
+        dispatcher = SendGridDispatcher(api_key='bench', host=server.url)
+        sms = TwilioDispatcher(account_sid='ACbench', auth_token='bench', host=server.url)
+"""
+import json
+import re
+import threading
+import time
+import uuid
+from urllib.parse import parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+TWILIO_MESSAGES_PATH = re.compile(r'^/2010-04-01/Accounts/(?P<sid>[^/]+)/Messages\.json$')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.record_connection()
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output clean
+
+    def _reply(self, status, body=b'', headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        if body:
+            self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = self.rfile.read(length) if length else b''
+        arrived = time.monotonic()
+        time.sleep(self.server.latency)
+
+        twilio = TWILIO_MESSAGES_PATH.match(self.path)
+        if self.path == '/v3/mail/send':
+            self.server.record_request(self.path, payload, arrived)
+            self._reply(202, headers={'X-Message-Id': uuid.uuid4().hex[:22]})
+        elif twilio:
+            self.server.record_request(self.path, payload, arrived)
+            form = {key: values[0] for key, values in parse_qs(payload.decode()).items()}
+            self._reply(201, json.dumps({
+                'sid': 'SM' + uuid.uuid4().hex,
+                'account_sid': twilio.group('sid'),
+                'to': form.get('To'),
+                'from': form.get('From'),
+                'body': form.get('Body'),
+                'status': 'queued'
+            }).encode())
+        else:
+            self._reply(404, json.dumps({'error': f'Unknown path {self.path}'}).encode())
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Threaded HTTP server on an ephemeral localhost port"""
+
+    daemon_threads = True
+
+    def __init__(self, latency=0.05, port=0):
+        super().__init__(('127.0.0.1', port), _Handler)
+        self.latency = latency
+        self.connections = 0
+        self.requests = []
+        self.arrivals = []  # time.monotonic() each recorded request arrived, same order as requests
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def record_connection(self):
+        with self._lock:
+            self.connections += 1
+
+    def record_request(self, path, payload, arrived=None):
+        with self._lock:
+            self.requests.append((path, payload))
+            self.arrivals.append(arrived if arrived is not None else time.monotonic())
+
+    def reset(self):
+        with self._lock:
+            self.connections = 0
+            self.requests = []
+            self.arrivals = []
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
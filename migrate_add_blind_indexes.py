@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Migration script to add email_hash / phone_hash blind index columns to
+the customers table and backfill them for existing rows.
+Safe to re-run: only rows with missing hashes are processed.
+
+Rows whose email or phone duplicates an earlier customer (possible because
+deduplication never matched before blind indexes) are left without that
+hash and reported so they can be merged by hand.
+"""
+
+from sqlalchemy import text, inspect
+from backend.database import get_db, engine
+from backend.encryption import decrypt_string, email_blind_index, phone_blind_index
+
+BATCH_SIZE = 1000
+
+
+def add_columns(db):
+    columns = [col['name'] for col in inspect(engine).get_columns('customers')]
+
+    for column in ('email_hash', 'phone_hash'):
+        if column not in columns:
+            print(f"Adding {column} column to customers table...")
+            db.execute(text(f"ALTER TABLE customers ADD COLUMN {column} VARCHAR(64)"))
+    db.commit()
+
+
+def backfill(db):
+    taken_email = {row[0] for row in db.execute(text(
+        "SELECT email_hash FROM customers WHERE email_hash IS NOT NULL"))}
+    taken_phone = {row[0] for row in db.execute(text(
+        "SELECT phone_hash FROM customers WHERE phone_hash IS NOT NULL"))}
+
+    updated = 0
+    duplicates = []
+    last_id = 0
+
+    while True:
+        rows = db.execute(text(
+            "SELECT id, email, phone, email_hash, phone_hash FROM customers "
+            "WHERE id > :last_id AND (email_hash IS NULL OR (phone IS NOT NULL AND phone_hash IS NULL)) "
+            "ORDER BY id LIMIT :limit"
+        ), {'last_id': last_id, 'limit': BATCH_SIZE}).fetchall()
+
+        if not rows:
+            break
+
+        updates = []
+        for row in rows:
+            email_hash = row.email_hash
+            phone_hash = row.phone_hash
+
+            if email_hash is None and row.email:
+                candidate = email_blind_index(decrypt_string(row.email))
+                if candidate in taken_email:
+                    duplicates.append((row.id, 'email'))
+                else:
+                    email_hash = candidate
+                    taken_email.add(candidate)
+
+            if phone_hash is None and row.phone:
+                candidate = phone_blind_index(decrypt_string(row.phone))
+                if candidate in taken_phone:
+                    duplicates.append((row.id, 'phone'))
+                else:
+                    phone_hash = candidate
+                    taken_phone.add(candidate)
+
+            if (email_hash, phone_hash) != (row.email_hash, row.phone_hash):
+                updates.append({'id': row.id, 'email_hash': email_hash, 'phone_hash': phone_hash})
+
+        last_id = rows[-1].id
+        if not updates:
+            continue
+
+        db.execute(text(
+            "UPDATE customers SET email_hash = :email_hash, phone_hash = :phone_hash WHERE id = :id"
+        ), updates)
+        db.commit()
+
+        updated += len(updates)
+        print(f"  ...{updated} customers indexed")
+
+    return updated, duplicates
+
+
+def create_indexes(db):
+    db.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_customers_email_hash ON customers (email_hash)"))
+    db.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_customers_phone_hash ON customers (phone_hash)"))
+    db.commit()
+
+
+def migrate():
+    db = get_db()
+    try:
+        add_columns(db)
+
+        print("Backfilling blind indexes...")
+        updated, duplicates = backfill(db)
+
+        create_indexes(db)
+        print(f"✓ Migration completed successfully! {updated} customers indexed.")
+
+        if duplicates:
+            print(f"⚠ {len(duplicates)} duplicate values were left unindexed (merge these customers):")
+            for customer_id, field in duplicates:
+                print(f"  - customer {customer_id}: duplicate {field}")
+
+    except Exception as e:
+        print(f"✗ Migration failed: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == '__main__':
+    migrate()
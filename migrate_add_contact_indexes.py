@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Migration script for keyset-paginated /contacts:
+- customers (created_at, id) index for the default "joined" order
+- customers (coalesce(name, ''), id) index for sorting by name
+Safe to re-run: indexes are created only if missing.
+"""
+
+from sqlalchemy import text
+from backend.database import get_db
+
+INDEXES = [
+    ('ix_customers_created_id', "created_at, id"),
+    ('ix_customers_name_sort', "coalesce(name, ''), id"),
+]
+
+
+def migrate():
+    db = get_db()
+    try:
+        # IF NOT EXISTS rather than inspection: SQLite can't reflect expression indexes
+        for name, columns in INDEXES:
+            print(f"Ensuring index {name}...")
+            db.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON customers ({columns})"))
+
+        db.commit()
+        print("✓ Migration completed successfully!")
+
+    except Exception as e:
+        print(f"✗ Migration failed: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Migration script for the campaign delivery ledger:
+- campaign_deliveries.last_attempt_at / sent_at timestamps
+- composite indexes for the worker drain, results page and customer history,
+  replacing the single-column job_id / campaign_id indexes they cover
+Safe to re-run: existing columns and indexes are skipped.
+"""
+
+from sqlalchemy import text, inspect
+from backend.database import get_db, engine, init_db
+import backend.models  # Registers the tables init_db() creates
+
+COLUMNS = [
+    ('campaign_deliveries', 'last_attempt_at', 'TIMESTAMP'),
+    ('campaign_deliveries', 'sent_at', 'TIMESTAMP'),
+]
+
+INDEXES = [
+    ('ix_delivery_job_status_id', 'job_id, status, id'),
+    ('ix_delivery_campaign_channel_status', 'campaign_id, channel, status, id'),
+    ('ix_delivery_customer_created', 'customer_id, created_at'),
+]
+
+# Prefixes of the composite indexes above
+REDUNDANT_INDEXES = ['ix_campaign_deliveries_job_id', 'ix_campaign_deliveries_campaign_id']
+
+
+def migrate():
+    init_db()  # Creates campaign_deliveries if this database predates the send queue
+    db = get_db()
+    try:
+        inspector = inspect(engine)
+        added = 0
+
+        for table, column, column_type in COLUMNS:
+            existing = [col['name'] for col in inspector.get_columns(table)]
+            if column not in existing:
+                print(f"Adding {column} column to {table} table...")
+                db.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}"))
+                added += 1
+
+        existing_indexes = [index['name'] for index in inspector.get_indexes('campaign_deliveries')]
+        for name, columns in INDEXES:
+            if name not in existing_indexes:
+                print(f"Creating index {name}...")
+                db.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON campaign_deliveries ({columns})"))
+                added += 1
+
+        for name in REDUNDANT_INDEXES:
+            if name in existing_indexes:
+                print(f"Dropping redundant index {name}...")
+                db.execute(text(f"DROP INDEX IF EXISTS {name}"))
+                added += 1
+
+        db.commit()
+
+        if added:
+            print("✓ Migration completed successfully!")
+        else:
+            print("✓ Ledger columns and indexes already exist, no migration needed.")
+
+    except Exception as e:
+        print(f"✗ Migration failed: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Migration script for import duplicate counts:
+- import_jobs.duplicate_count (new rows another writer created first)
+Safe to re-run: existing columns are skipped.
+"""
+
+from sqlalchemy import text, inspect
+from backend.database import get_db, engine, init_db
+import backend.models  # Registers the tables init_db() creates
+
+COLUMNS = [
+    ('import_jobs', 'duplicate_count', 'INTEGER DEFAULT 0'),
+]
+
+
+def migrate():
+    init_db()  # Creates import_jobs if this database predates background imports
+    db = get_db()
+    try:
+        inspector = inspect(engine)
+        added = 0
+
+        for table, column, column_type in COLUMNS:
+            existing = [col['name'] for col in inspector.get_columns(table)]
+            if column not in existing:
+                print(f"Adding {column} column to {table} table...")
+                db.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}"))
+                added += 1
+
+        db.commit()
+
+        if added:
+            print("✓ Migration completed successfully!")
+        else:
+            print("✓ Columns already exist, no migration needed.")
+
+    except Exception as e:
+        print(f"✗ Migration failed: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == '__main__':
+    migrate()
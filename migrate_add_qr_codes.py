@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+Migration script to create the qr_codes table used to validate and
+redeem QR codes at the counter. Safe to re-run.
+
+Codes mailed before this table existed aren't in it and will scan as
+unknown; re-send those campaigns' QR emails to issue them.
+"""
+
+from backend.database import get_db, engine
+from backend.models import QRCode
+
+
+def migrate():
+    db = get_db()
+    try:
+        print("Ensuring qr_codes table...")
+        QRCode.__table__.create(bind=engine, checkfirst=True)
+        print("✓ Migration completed successfully!")
+
+    except Exception as e:
+        print(f"✗ Migration failed: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == '__main__':
+    migrate()
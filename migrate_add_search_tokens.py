@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Migration script to create the customer_search_tokens table and build
+search tokens for existing customers, so /contacts search can find them.
+Safe to re-run: each batch replaces the tokens of the customers in it.
+
+Re-run this after changing ENCRYPTION_KEY or BLIND_INDEX_KEY.
+"""
+
+from sqlalchemy import text
+from backend.database import get_db, engine
+from backend.encryption import decrypt_string
+from backend.models import CustomerSearchToken
+from backend.contact_search import index_search_tokens
+
+BATCH_SIZE = 1000
+
+
+def create_table():
+    print("Ensuring customer_search_tokens table...")
+    CustomerSearchToken.__table__.create(bind=engine, checkfirst=True)
+
+
+def backfill(db):
+    indexed = 0
+    last_id = 0
+
+    while True:
+        rows = db.execute(text(
+            "SELECT id, email, phone FROM customers WHERE id > :last_id ORDER BY id LIMIT :limit"
+        ), {'last_id': last_id, 'limit': BATCH_SIZE}).fetchall()
+
+        if not rows:
+            break
+
+        index_search_tokens(db, 'email', {row.id: decrypt_string(row.email) for row in rows})
+        index_search_tokens(db, 'phone', {row.id: decrypt_string(row.phone) for row in rows})
+        db.commit()
+
+        last_id = rows[-1].id
+        indexed += len(rows)
+        print(f"  ...{indexed} customers indexed")
+
+    return indexed
+
+
+def migrate():
+    db = get_db()
+    try:
+        create_table()
+
+        print("Building search tokens...")
+        indexed = backfill(db)
+        print(f"✓ Migration completed successfully! {indexed} customers indexed.")
+
+    except Exception as e:
+        print(f"✗ Migration failed: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == '__main__':
+    migrate()
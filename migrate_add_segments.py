@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Migration script to move customer segment tags from the comma-separated
+customers.segments column into the segments / customer_segments tables.
+Safe to re-run: memberships that already exist are skipped. Tags that
+cannot be stored (over 100 characters, control characters) are listed and
+left in the old column - never dropped silently.
+
+The old column is left in place (and no longer written) so the move can
+be checked; drop it by hand afterwards.
+"""
+
+from collections import defaultdict
+from sqlalchemy import text, inspect
+from backend.database import get_db, engine
+from backend.models import Segment, CustomerSegment
+from backend.segment_manager import SegmentManager, validate_segment
+
+BATCH_SIZE = 5000
+
+
+def create_tables():
+    for table in (Segment.__table__, CustomerSegment.__table__):
+        print(f"Ensuring {table.name} table...")
+        table.create(bind=engine, checkfirst=True)
+
+
+def copy_tags(db):
+    manager = SegmentManager(db)
+    copied = 0
+    skipped = defaultdict(int)
+    last_id = 0
+
+    while True:
+        rows = db.execute(text(
+            "SELECT id, segments FROM customers "
+            "WHERE id > :last_id AND segments IS NOT NULL AND segments != '' "
+            "ORDER BY id LIMIT :limit"
+        ), {'last_id': last_id, 'limit': BATCH_SIZE}).fetchall()
+
+        if not rows:
+            break
+
+        # Group the batch by tag so each tag is one INSERT ... SELECT
+        members = defaultdict(set)
+        for row in rows:
+            for part in row.segments.split(','):
+                if not part.strip():
+                    continue
+                try:
+                    members[validate_segment(part)].add(row.id)
+                except ValueError:
+                    skipped[part.strip()] += 1
+
+        for tag, customer_ids in members.items():
+            manager.bulk_add_segment(sorted(customer_ids), tag)
+            copied += len(customer_ids)
+        db.commit()
+
+        last_id = rows[-1].id
+        print(f"  ...{copied} memberships processed")
+
+    return copied, skipped
+
+
+def migrate():
+    db = get_db()
+    try:
+        create_tables()
+
+        columns = [col['name'] for col in inspect(engine).get_columns('customers')]
+        if 'segments' not in columns:
+            print("✓ No customers.segments column - nothing to copy.")
+            return
+
+        print("Copying segment tags...")
+        copied, skipped = copy_tags(db)
+        print(f"  {copied} memberships processed (existing ones skipped).")
+
+        if skipped:
+            # Still in customers.segments: shorten/rename them there and re-run
+            print(f"⚠ {len(skipped)} tags could not be stored as segments and were not copied:")
+            for tag, count in sorted(skipped.items()):
+                print(f"  - '{tag}' ({count} customers)")
+            print(f"✗ Migration incomplete: {sum(skipped.values())} memberships left in customers.segments")
+        else:
+            print("✓ Migration completed successfully!")
+
+    except Exception as e:
+        print(f"✗ Migration failed: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == '__main__':
+    migrate()
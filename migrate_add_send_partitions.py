@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+Migration script to create the send_partitions table used to split large
+campaign sends across worker processes. Safe to re-run.
+"""
+
+from backend.database import get_db, engine
+from backend.models import SendPartition
+
+
+def migrate():
+    db = get_db()
+    try:
+        print("Ensuring send_partitions table...")
+        SendPartition.__table__.create(bind=engine, checkfirst=True)
+        print("✓ Migration completed successfully!")
+
+    except Exception as e:
+        print(f"✗ Migration failed: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Migration script for send retries:
+- campaign_deliveries.next_attempt_at (backoff deadline for 'retry' rows)
+- send_jobs.retrying_count / next_attempt_at (parked 'retrying' jobs)
+- send_jobs.error_count (runs that raised, before the job is failed)
+Safe to re-run: existing columns are skipped.
+"""
+
+from sqlalchemy import text, inspect
+from backend.database import get_db, engine, init_db
+import backend.models  # Registers the tables init_db() creates
+
+COLUMNS = [
+    ('campaign_deliveries', 'next_attempt_at', 'TIMESTAMP'),
+    ('send_jobs', 'retrying_count', 'INTEGER DEFAULT 0'),
+    ('send_jobs', 'next_attempt_at', 'TIMESTAMP'),
+    ('send_jobs', 'error_count', 'INTEGER DEFAULT 0'),
+]
+
+
+def migrate():
+    init_db()  # Creates the send queue tables if this database predates them
+    db = get_db()
+    try:
+        inspector = inspect(engine)
+        added = 0
+
+        for table, column, column_type in COLUMNS:
+            existing = [col['name'] for col in inspector.get_columns(table)]
+            if column not in existing:
+                print(f"Adding {column} column to {table} table...")
+                db.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}"))
+                added += 1
+
+        db.commit()
+
+        if added:
+            print("✓ Migration completed successfully!")
+        else:
+            print("✓ Columns already exist, no migration needed.")
+
+    except Exception as e:
+        print(f"✗ Migration failed: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Migration script for SMS campaign sends:
+- campaigns.sms_content (SMS message text)
+- campaign_deliveries.provider_message_id / provider_status (Twilio SID and status)
+Safe to re-run: existing columns are skipped.
+"""
+
+from sqlalchemy import text, inspect
+from backend.database import get_db, engine, init_db
+import backend.models  # Registers the tables init_db() creates
+
+COLUMNS = [
+    ('campaigns', 'sms_content', 'TEXT'),
+    ('campaign_deliveries', 'provider_message_id', 'VARCHAR(64)'),
+    ('campaign_deliveries', 'provider_status', 'VARCHAR(32)'),
+]
+
+
+def migrate():
+    init_db()  # Creates campaign_deliveries if this database predates the send queue
+    db = get_db()
+    try:
+        inspector = inspect(engine)
+        added = 0
+
+        for table, column, column_type in COLUMNS:
+            existing = [col['name'] for col in inspector.get_columns(table)]
+            if column not in existing:
+                print(f"Adding {column} column to {table} table...")
+                db.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}"))
+                added += 1
+
+        db.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_campaign_deliveries_provider_message_id "
+            "ON campaign_deliveries (provider_message_id)"
+        ))
+        db.commit()
+
+        if added:
+            print("✓ Migration completed successfully!")
+        else:
+            print("✓ Columns already exist, no migration needed.")
+
+    except Exception as e:
+        print(f"✗ Migration failed: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == '__main__':
+    migrate()
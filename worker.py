@@ -0,0 +1,15 @@
+#!/usr/bin/env python
+"""
+Background send worker
+
+Drains queued campaign sends and CSV imports from the database. Run alongside the web
+process (see Procfile):
+
+    python worker.py
+"""
+from backend.database import init_db
+from backend.send_worker import run_worker
+
+if __name__ == '__main__':
+    init_db()
+    run_worker()